@@ -0,0 +1,118 @@
+"""Migration 005: Partition audit_logs by month on PostgreSQL.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-12-02
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# Partitions created past the current month so inserts never land in the default partition
+MONTHS_AHEAD = 3
+
+AUDIT_INDEXES = {
+    'ix_audit_logs_entity': ['entity_type', 'entity_id'],
+    'ix_audit_logs_created_at': ['created_at'],
+    'ix_audit_logs_user_id': ['user_id'],
+    'ix_audit_logs_action': ['action'],
+}
+
+
+def _add_months(year: int, month: int, months: int) -> tuple:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite has no declarative partitioning; retention there is a rolling delete
+        # (see AuditRetentionService)
+        return
+
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_legacy')
+    for name in list(AUDIT_INDEXES) + ['ix_audit_logs_id']:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE')
+
+    # The partition key must be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            changes TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            reason VARCHAR(255),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min(created_at) FROM audit_logs_legacy')).scalar()
+    now = bind.execute(sa.text('SELECT now()')).scalar()
+    year, month = (oldest.year, oldest.month) if oldest is not None else (now.year, now.month)
+    last = _add_months(now.year, now.month, MONTHS_AHEAD)
+    while (year, month) <= last:
+        next_year, next_month = _add_months(year, month, 1)
+        op.execute(
+            f"CREATE TABLE audit_logs_p{year:04d}{month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')"
+        )
+        year, month = next_year, next_month
+
+    for name, columns in AUDIT_INDEXES.items():
+        op.create_index(name, 'audit_logs', columns)
+
+    op.execute('INSERT INTO audit_logs SELECT * FROM audit_logs_legacy')
+    op.execute('DROP TABLE audit_logs_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+    for name in AUDIT_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE')
+    op.execute(
+        """
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq') PRIMARY KEY,
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            changes TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            reason VARCHAR(255)
+        )
+        """
+    )
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('INSERT INTO audit_logs SELECT * FROM audit_logs_partitioned')
+    op.execute('DROP TABLE audit_logs_partitioned')
+    for name, columns in AUDIT_INDEXES.items():
+        op.create_index(name, 'audit_logs', columns)
+    op.create_index('ix_audit_logs_id', 'audit_logs', ['id'])
@@ -0,0 +1,137 @@
+"""Migration 006: Store audit_logs.changes as native JSON and index field-level queries.
+
+Entries written before this migration hold every old/new value as ``str(value)``: enums as
+"PaymentStatus.COMPLETED", numbers as "1000", booleans as "True" and datetimes with a space
+separator. They are rewritten to the form the audit listeners now store (enum values, JSON
+numbers and booleans, ISO 8601), so field-level queries match old and new rows alike.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-12-09
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Enum members as str() rendered them, and their values; frozen here rather than imported from
+# the models, which may change after this migration
+LEGACY_ENUM_VALUES = {
+    'PaymentStatus.PENDING': 'pending',
+    'PaymentStatus.COMPLETED': 'completed',
+    'PaymentStatus.FAILED': 'failed',
+    'PaymentStatus.REFUNDED': 'refunded',
+    'PlanType.BASIC': 'basic',
+    'PlanType.DETAILED': 'detailed',
+    'PlanType.PREMIUM': 'premium',
+}
+# Audited columns of users and payments by type; text columns such as book_title keep their values
+INTEGER_FIELDS = {'user_id', 'amount', 'created_by', 'updated_by'}
+BOOLEAN_FIELDS = {'is_active', 'is_verified', 'pdf_sent'}
+DATETIME_FIELDS = {'created_at', 'updated_at', 'deleted_at'}
+
+_INTEGER = re.compile(r'-?\d+')
+_DATETIME = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?')
+
+
+def _normalize_value(field, value):
+    """A legacy ``str(value)`` in the JSON form of the current serializer; other values are kept."""
+    if not isinstance(value, str):
+        return value
+    if value in LEGACY_ENUM_VALUES:
+        return LEGACY_ENUM_VALUES[value]
+    if field in INTEGER_FIELDS and _INTEGER.fullmatch(value):
+        return int(value)
+    if field in BOOLEAN_FIELDS and value in ('True', 'False'):
+        return value == 'True'
+    if field in DATETIME_FIELDS and _DATETIME.fullmatch(value):
+        return value.replace(' ', 'T')
+    return value
+
+
+def _normalize_changes(changes):
+    if not isinstance(changes, dict):
+        return changes
+    normalized = {}
+    for field, change in changes.items():
+        if isinstance(change, dict):
+            change = {key: _normalize_value(field, value) for key, value in change.items()}
+        normalized[field] = change
+    return normalized
+
+
+def _normalize_legacy_values(bind, json_type) -> None:
+    """Rewrite legacy values batch by batch, in id order, touching only rows that change."""
+    audit_logs = sa.table('audit_logs', sa.column('id', sa.Integer), sa.column('changes', json_type))
+    update = (
+        audit_logs.update()
+        .where(audit_logs.c.id == sa.bindparam('row_id'))
+        .values(changes=sa.bindparam('normalized'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(audit_logs.c.id, audit_logs.c.changes)
+            .where(audit_logs.c.id > last_id, audit_logs.c.changes.isnot(None))
+            .order_by(audit_logs.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        updates = []
+        for row_id, changes in rows:
+            normalized = _normalize_changes(changes)
+            if normalized != changes:
+                updates.append({'row_id': row_id, 'normalized': normalized})
+        if updates:
+            bind.execute(update, updates)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # Existing rows already hold json.dumps output, so the cast is lossless
+        op.alter_column(
+            'audit_logs',
+            'changes',
+            type_=postgresql.JSONB(),
+            postgresql_using='changes::jsonb',
+        )
+        _normalize_legacy_values(bind, postgresql.JSONB())
+        op.create_index('ix_audit_logs_changes', 'audit_logs', ['changes'], postgresql_using='gin')
+    else:
+        # SQLite's JSON type is TEXT with JSON1 functions; only the expression index is new
+        _normalize_legacy_values(bind, sa.JSON())
+        op.create_index(
+            'ix_audit_logs_status_change',
+            'audit_logs',
+            [sa.text("json_extract(changes, '$.status.new')"), 'created_at'],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade database schema (normalized values stay normalized; they are valid JSON either way)."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_audit_logs_changes', table_name='audit_logs')
+        op.alter_column(
+            'audit_logs',
+            'changes',
+            type_=sa.Text(),
+            postgresql_using='changes::text',
+        )
+    else:
+        op.drop_index('ix_audit_logs_status_change', table_name='audit_logs')
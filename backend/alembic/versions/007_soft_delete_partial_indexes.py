@@ -0,0 +1,70 @@
+"""Migration 007: Partial indexes for soft-deleted tables.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-12-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text('deleted_at IS NULL')
+DELETED = sa.text('deleted_at IS NOT NULL')
+
+# Hot lookups on rows that are not soft-deleted; email and stripe_payment_id lookups use their
+# UNIQUE constraints
+ACTIVE_INDEXES = [
+    ('ix_payments_user_id_created_at_active', 'payments', ['user_id', 'created_at']),
+    ('ix_payments_status_created_at_active', 'payments', ['status', 'created_at']),
+]
+
+# Full indexes replaced by their *_active twins above: soft-deleted rows are filtered out of all
+# ORM reads automatically
+FULL_INDEXES = [
+    ('ix_payments_user_id_created_at', 'payments', ['user_id', 'created_at']),
+    ('ix_payments_status_created_at', 'payments', ['status', 'created_at']),
+]
+
+# Unique indexes repeating the column's UNIQUE constraint from migration 001
+UNIQUE_INDEXES = [
+    ('ix_users_email', 'users', ['email']),
+    ('ix_payments_stripe_payment_id', 'payments', ['stripe_payment_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    for name, table, columns in ACTIVE_INDEXES:
+        op.create_index(name, table, columns, postgresql_where=ACTIVE, sqlite_where=ACTIVE)
+    for name, table, _ in FULL_INDEXES + UNIQUE_INDEXES:
+        op.drop_index(name, table_name=table)
+    # Only databases created from the models (create_all) have the single-column status index
+    op.execute('DROP INDEX IF EXISTS ix_payments_status')
+
+    # The full deleted_at indexes mostly held NULLs; only deleted rows are ever looked up by it
+    for table in ('users', 'payments'):
+        op.drop_index(f'ix_{table}_deleted_at', table_name=table)
+        op.create_index(
+            f'ix_{table}_deleted_at', table, ['deleted_at'], postgresql_where=DELETED, sqlite_where=DELETED
+        )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    for table in ('users', 'payments'):
+        op.drop_index(f'ix_{table}_deleted_at', table_name=table)
+        op.create_index(f'ix_{table}_deleted_at', table, ['deleted_at'])
+
+    for name, table, columns in reversed(UNIQUE_INDEXES):
+        op.create_index(name, table, columns, unique=True)
+    for name, table, columns in reversed(FULL_INDEXES):
+        op.create_index(name, table, columns)
+    for name, table, _ in reversed(ACTIVE_INDEXES):
+        op.drop_index(name, table_name=table)
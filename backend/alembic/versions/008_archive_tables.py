@@ -0,0 +1,69 @@
+"""Migration 008: Archive tables for soft-deleted users and payments.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-12-23
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    # Mirrors of users/payments without foreign keys or unique constraints, plus archived_at
+    op.create_table(
+        'users_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('email', sa.String(255), nullable=False),
+        sa.Column('hashed_password', sa.String(512), nullable=True),
+        sa.Column('full_name', sa.String(255), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_verified', sa.Boolean(), nullable=False),
+        sa.Column('google_id', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('updated_by', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_archive_email', 'users_archive', ['email'])
+
+    op.create_table(
+        'payments_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('stripe_payment_id', sa.String(255), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(3), nullable=False),
+        sa.Column('status', sa.String(50), nullable=False),
+        sa.Column('plan_type', sa.String(50), nullable=False),
+        sa.Column('book_title', sa.String(255), nullable=False),
+        sa.Column('book_author', sa.String(255), nullable=False),
+        sa.Column('pdf_sent', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('updated_by', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_payments_archive_user_id', 'payments_archive', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_payments_archive_user_id', table_name='payments_archive')
+    op.drop_table('payments_archive')
+    op.drop_index('ix_users_archive_email', table_name='users_archive')
+    op.drop_table('users_archive')
@@ -0,0 +1,59 @@
+"""Migration 009: Per-user payment summary table.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-01-06
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'user_payment_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('pending_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refunded_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_cents', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_purchase_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from active payments; from here on the application maintains the rows
+    op.execute(
+        """
+        INSERT INTO user_payment_stats (
+            user_id, pending_count, completed_count, failed_count, refunded_count,
+            total_cents, last_purchase_at, updated_at
+        )
+        SELECT
+            user_id,
+            SUM(CASE WHEN status = 'PENDING' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = 'COMPLETED' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = 'FAILED' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = 'REFUNDED' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = 'COMPLETED' THEN amount ELSE 0 END),
+            MAX(CASE WHEN status IN ('COMPLETED', 'REFUNDED') THEN created_at END),
+            MAX(updated_at)
+        FROM payments
+        WHERE deleted_at IS NULL
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_table('user_payment_stats')
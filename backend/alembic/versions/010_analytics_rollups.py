@@ -0,0 +1,53 @@
+"""Migration 010: Daily payment rollups and job watermarks.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-01-13
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'payment_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('plan_type', sa.String(50), nullable=False),
+        sa.Column('payments_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refunded_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_cents', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refunded_cents', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'plan_type')
+    )
+
+    # Last processed position of incremental jobs; the first refresh-analytics run is a full build
+    op.create_table(
+        'job_watermarks',
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    # The refresh job scans payments by updated_at
+    op.create_index('ix_payments_updated_at', 'payments', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_payments_updated_at', table_name='payments')
+    op.drop_table('job_watermarks')
+    op.drop_table('payment_daily_rollups')
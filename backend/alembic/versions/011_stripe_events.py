@@ -0,0 +1,49 @@
+"""Migration 011: Stripe webhook event inbox.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-01-20
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+UNPROCESSED = sa.text('processed_at IS NULL')
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'stripe_events',
+        sa.Column('id', sa.String(255), nullable=False),
+        sa.Column('type', sa.String(100), nullable=False),
+        sa.Column('payload', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # The consumer only ever scans unprocessed events
+    op.create_index(
+        'ix_stripe_events_unprocessed',
+        'stripe_events',
+        ['received_at'],
+        postgresql_where=UNPROCESSED,
+        sqlite_where=UNPROCESSED,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_stripe_events_unprocessed', table_name='stripe_events')
+    op.drop_table('stripe_events')
@@ -0,0 +1,45 @@
+"""Migration 012: Idempotency keys and client secrets on payments.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-01-22
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+PENDING_IDEMPOTENCY = sa.text("idempotency_key IS NOT NULL AND status = 'PENDING' AND deleted_at IS NULL")
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    for table in ('payments', 'payments_archive'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('idempotency_key', sa.String(255), nullable=True))
+            batch_op.add_column(sa.Column('client_secret', sa.String(255), nullable=True))
+
+    # Retried create-payment-intent requests resolve to the same pending payment
+    op.create_index(
+        'uq_payments_user_id_idempotency_key_pending',
+        'payments',
+        ['user_id', 'idempotency_key'],
+        unique=True,
+        postgresql_where=PENDING_IDEMPOTENCY,
+        sqlite_where=PENDING_IDEMPOTENCY,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('uq_payments_user_id_idempotency_key_pending', table_name='payments')
+    for table in ('payments_archive', 'payments'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('client_secret')
+            batch_op.drop_column('idempotency_key')
@@ -0,0 +1,30 @@
+"""Migration 013: Artifact-store digest of generated reports.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2025-01-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    for table in ('payments', 'payments_archive'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('report_sha256', sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    for table in ('payments_archive', 'payments'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('report_sha256')
@@ -0,0 +1,39 @@
+"""Migration 014: Rendered report cache index.
+
+Revision ID: 014
+Revises: 013
+Create Date: 2025-01-27
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table(
+        'report_cache_entries',
+        sa.Column('cache_key', sa.String(64), nullable=False),
+        sa.Column('report_sha256', sa.String(64), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('cache_key')
+    )
+
+    # Least recently used entries are evicted first
+    op.create_index('ix_report_cache_entries_last_used_at', 'report_cache_entries', ['last_used_at'])
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_report_cache_entries_last_used_at', table_name='report_cache_entries')
+    op.drop_table('report_cache_entries')
@@ -0,0 +1,54 @@
+"""Migration 015: Give payments_archive the enum column types of payments.
+
+Migration 008 created payments_archive.status and plan_type as VARCHAR. Where payments uses the
+PostgreSQL enum types of the models, restoring an archived payment with INSERT ... SELECT fails
+because there is no implicit cast from VARCHAR to an enum.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2025-01-29
+
+"""
+from typing import Dict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+ENUM_COLUMNS = ('status', 'plan_type')
+
+
+def _payment_enum_types() -> Dict[str, str]:
+    """Enum type of each payments column in ENUM_COLUMNS that uses one."""
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT column_name, udt_name FROM information_schema.columns "
+            "WHERE table_name = 'payments' AND data_type = 'USER-DEFINED' AND column_name IN :columns"
+        ).bindparams(sa.bindparam('columns', expanding=True)),
+        {'columns': list(ENUM_COLUMNS)},
+    )
+    return {column: udt_name for column, udt_name in rows}
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column, enum_type in _payment_enum_types().items():
+        op.execute(
+            f'ALTER TABLE payments_archive ALTER COLUMN {column} TYPE {enum_type} USING {column}::{enum_type}'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in ENUM_COLUMNS:
+        op.execute(f'ALTER TABLE payments_archive ALTER COLUMN {column} TYPE VARCHAR(50) USING {column}::text')
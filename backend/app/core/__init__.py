@@ -1,5 +1,14 @@
 from .config import settings
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, get_read_db
 from .security import create_access_token, get_password_hash, verify_password
 
-__all__ = ["settings", "get_db", "Base", "engine", "create_access_token", "verify_password", "get_password_hash"]
+__all__ = [
+    "settings",
+    "get_db",
+    "get_read_db",
+    "Base",
+    "engine",
+    "create_access_token",
+    "verify_password",
+    "get_password_hash",
+]
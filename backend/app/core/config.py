@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -6,12 +6,49 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database (default to local SQLite for development/testing)
     DATABASE_URL: str = "sqlite:///./app.db"
+    # Optional read replicas (JSON list of URLs); read-only sessions route SELECTs to them
+    DATABASE_REPLICA_URLS: List[str] = []
+
+    # Slow-query log: statements slower than the threshold are logged (0 disables);
+    # SLOW_QUERY_EXPLAIN also captures one query plan per distinct statement shape
+    SLOW_QUERY_THRESHOLD_MS: int = 500
+    SLOW_QUERY_EXPLAIN: bool = False
 
     # JWT
     SECRET_KEY: str = "change-me-in-prod"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Audit log writes: "transaction" writes each flush's entries in the same transaction;
+    # "background" queues committed entries for a batched writer thread
+    AUDIT_WRITE_MODE: str = "transaction"
+    AUDIT_QUEUE_MAX_ENTRIES: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # Write a full-state SNAPSHOT row after this many UPDATEs of one entity (0 disables)
+    AUDIT_SNAPSHOT_INTERVAL: int = 20
+
+    # Audit retention: entries older than AUDIT_RETENTION_DAYS are archived to gzip NDJSON files
+    # in AUDIT_ARCHIVE_DIR and removed from the hot table (``python manage.py audit-archive``)
+    AUDIT_RETENTION_DAYS: int = 365
+    AUDIT_ARCHIVE_DIR: str = "./archive/audit_logs"
+    AUDIT_ARCHIVE_BATCH_SIZE: int = 5000
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3
+
+    # Rows soft-deleted longer than the grace period move to the *_archive tables
+    # (``python manage.py archive-soft-deleted``)
+    SOFT_DELETE_ARCHIVE_GRACE_DAYS: int = 30
+    ARCHIVE_BATCH_SIZE: int = 500
+    # Rows (or ids) per statement in the bulk operations of AuditService and QueryHelper
+    BULK_BATCH_SIZE: int = 500
+
+    # Analytics rollups (``python manage.py refresh-analytics``): each run rescans payments updated
+    # since the previous watermark minus this overlap, to catch transactions that committed late
+    ANALYTICS_WATERMARK_OVERLAP_SECONDS: int = 300
+
+    # Accounts allowed to use the /api/v1/admin endpoints (JSON list of emails)
+    ADMIN_EMAILS: List[str] = []
+
     # Groq
     GROQ_API_KEY: Optional[str] = None
 
@@ -19,6 +56,47 @@ class Settings(BaseSettings):
     STRIPE_SECRET_KEY: Optional[str] = None
     STRIPE_PUBLISHABLE_KEY: Optional[str] = None
     STRIPE_WEBHOOK_SECRET: Optional[str] = None
+    # Async API client: point STRIPE_API_BASE at stripe-mock or fake_stripe.py for offline load tests
+    STRIPE_API_BASE: str = "https://api.stripe.com"
+    STRIPE_API_VERSION: Optional[str] = None
+    STRIPE_TIMEOUT_SECONDS: float = 10.0
+    STRIPE_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    STRIPE_MAX_CONNECTIONS: int = 20
+    # Retries after connection errors, timeouts and 409/429/5xx responses, with jittered backoff
+    STRIPE_MAX_RETRIES: int = 2
+    STRIPE_RETRY_BACKOFF_SECONDS: float = 0.5
+    # Webhook events are recorded by the endpoint and applied by a background consumer in batches;
+    # events failing STRIPE_EVENT_MAX_ATTEMPTS times stay in stripe_events with their last error
+    STRIPE_EVENT_BATCH_SIZE: int = 100
+    STRIPE_EVENT_POLL_SECONDS: float = 5.0
+    STRIPE_EVENT_MAX_ATTEMPTS: int = 5
+    # Threads generating and emailing reports for payments completed by webhook events
+    REPORT_DELIVERY_WORKERS: int = 2
+    # Completed payments whose report was not sent (generation or email failed) are retried by the
+    # consumer every REPORT_REDELIVERY_INTERVAL_SECONDS (0 disables) once they have been completed for
+    # REPORT_REDELIVERY_DELAY_SECONDS; ``python manage.py redeliver-reports`` does the same from cron
+    REPORT_REDELIVERY_INTERVAL_SECONDS: float = 300.0
+    REPORT_REDELIVERY_DELAY_SECONDS: int = 300
+    REPORT_REDELIVERY_BATCH_SIZE: int = 100
+    # Payment reconciliation (``python manage.py reconcile-payments``) lists Stripe intents per creation
+    # window from its watermark, reaching back to the oldest PENDING payment created in the last
+    # RECONCILE_PENDING_MAX_AGE_HOURS; older ones are abandoned checkouts, left to ``--full`` runs
+    RECONCILE_WINDOW_HOURS: int = 24
+    RECONCILE_LOOKBACK_DAYS: int = 30
+    RECONCILE_PENDING_MAX_AGE_HOURS: int = 168
+    RECONCILE_OVERLAP_SECONDS: int = 600
+
+    # Reports: generated PDFs are kept in a content-addressed store and emailed as signed download
+    # links valid for REPORT_LINK_TTL_HOURS; PUBLIC_API_URL is the base those links point at
+    REPORT_ARTIFACT_DIR: str = "./artifacts/reports"
+    REPORT_LINK_TTL_HOURS: int = 168
+    PUBLIC_API_URL: str = "http://localhost:8000"
+    # Rendered reports are reused for every buyer of the same book and plan: cache entries older than
+    # REPORT_CACHE_TTL_DAYS are regenerated, and least recently used ones are evicted once the cache
+    # holds more than REPORT_CACHE_MAX_BYTES (0 disables the cache). Payments keep their report only
+    # until their link expires, so files are deleted on eviction (or ``python manage.py evict-reports``)
+    REPORT_CACHE_MAX_BYTES: int = 2 * 1024**3
+    REPORT_CACHE_TTL_DAYS: int = 30
 
     # SendGrid
     SENDGRID_API_KEY: Optional[str] = None
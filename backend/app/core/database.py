@@ -1,41 +1,138 @@
-from typing import Generator
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Generator, Iterator, List, Optional
 
-from sqlalchemy import create_engine, event, pool
+from sqlalchemy import Select, create_engine, event, pool
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
 from .config import settings
+from .metrics import InstrumentedQueuePool, instrument_engine
+from .slow_query import slow_query_recorder
 
-# Configure engine with connection pooling for production
-if "sqlite" in settings.DATABASE_URL:
-    # SQLite configuration for development
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=pool.StaticPool,
-    )
-else:
+
+def set_sqlite_pragma(dbapi_conn, connection_record):  # type: ignore[no-untyped-def]
+    """Enable foreign key constraints for SQLite."""
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _create_engine(url: str, name: str) -> Engine:
+    """Create an instrumented engine for ``url`` with the pooling settings for its dialect."""
+    if "sqlite" in url:
+        # SQLite configuration for development
+        created = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=pool.StaticPool,
+        )
+        # Enable foreign keys on every SQLite connection, primary and replicas alike
+        event.listen(created, "connect", set_sqlite_pragma)
+        instrument_engine(created, name)
+        slow_query_recorder.install(created)
+        return created
     # PostgreSQL configuration for production with connection pooling
-    engine = create_engine(
-        settings.DATABASE_URL,
+    created = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=name,  # labels checkout-wait metrics
         pool_size=10,
         max_overflow=20,
         pool_pre_ping=True,  # Verify connections before using
         pool_recycle=3600,  # Recycle connections after 1 hour
         echo=settings.ENVIRONMENT == "development",  # Log SQL in development
     )
+    instrument_engine(created, name)
+    slow_query_recorder.install(created)
+    return created
+
+
+# Primary engine: every write and every read that is not explicitly marked read-only
+engine = _create_engine(settings.DATABASE_URL, "primary")
+
+# Optional read replicas, used round-robin by read-only sessions
+replica_engines: List[Engine] = [
+    _create_engine(url, f"replica{index}") for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+_replica_cycle = itertools.cycle(replica_engines) if replica_engines else None
+
+
+# Per-request routing state. The middleware installs a fresh dict for every request; a commit
+# that wrote anything flips ``pinned`` so later reads in the same request see their own writes.
+_request_routing: ContextVar[Optional[Dict[str, bool]]] = ContextVar("request_routing", default=None)
+
+
+def begin_request_routing() -> Token:
+    """Start read/write routing state for the current request."""
+    return _request_routing.set({"pinned": False})
+
+
+def end_request_routing(token: Token) -> None:
+    """Discard the routing state installed by :func:`begin_request_routing`."""
+    _request_routing.reset(token)
+
+
+def pin_request_to_primary() -> None:
+    """Send every remaining read in the current request to the primary."""
+    state = _request_routing.get()
+    if state is not None:
+        state["pinned"] = True
+
+
+def is_request_pinned_to_primary() -> bool:
+    """Whether the current request already committed a write."""
+    state = _request_routing.get()
+    return bool(state and state["pinned"])
 
-# Enable foreign keys for SQLite
-@event.listens_for(engine, "connect")
-def set_sqlite_pragma(dbapi_conn, connection_record):  # type: ignore[no-untyped-def]
-    """Enable foreign key constraints for SQLite."""
-    if "sqlite" in settings.DATABASE_URL:
-        cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
 
+class RoutingSession(Session):
+    """
+    Session that routes SELECTs from read-only sessions to a replica.
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    A session is read-only when it was created with ``info={"read_only": True}`` (see
+    :func:`get_read_db`). Writes, flushes and anything that is not a plain SELECT always use the
+    primary, as does every read once the session or the current request has committed a write.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Any:  # type: ignore[override]
+        if self._use_replica(clause):
+            replica = self.info.get("replica")
+            if replica is None:
+                # Stick to one replica per session so a transaction sees a single snapshot
+                replica = self.info["replica"] = next(_replica_cycle)  # type: ignore[arg-type]
+            return replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _use_replica(self, clause: Any) -> bool:
+        if _replica_cycle is None or not self.info.get("read_only"):
+            return False
+        if self._flushing or self.info.get("wrote") or is_request_pinned_to_primary():
+            return False
+        return isinstance(clause, Select)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_session_wrote(session: Session, flush_context: Any) -> None:
+    """Remember that this session has pending writes on the primary."""
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_after_commit(session: Session) -> None:
+    """Give the rest of the request read-your-writes consistency after a committed write."""
+    if session.info.get("wrote"):
+        pin_request_to_primary()
+
+
+# expire_on_commit=False: objects keep their flushed state after commit, so returning or
+# serializing them does not cost a refresh SELECT per object (ids and Python-side defaults
+# are already populated by the flush)
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 Base = declarative_base()
 
@@ -47,3 +144,28 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Read-only database session dependency for FastAPI.
+
+    SELECTs go to a read replica when ``DATABASE_REPLICA_URLS`` is configured, unless the
+    request has already committed a write. Without replicas this behaves exactly like
+    :func:`get_db`.
+    """
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def read_only_session() -> Iterator[Session]:
+    """Read-only session for code running outside a request (jobs, services, scripts)."""
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    finally:
+        db.close()
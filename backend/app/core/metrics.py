@@ -0,0 +1,270 @@
+"""In-process metrics with Prometheus text exposition, plus database pool/query instrumentation."""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, pool
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets sized for database work: sub-millisecond lookups up to multi-second scans
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding the name, help text and a lock shared by all metric types."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, usually refreshed by a collector right before rendering."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label key -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(_label_key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines: List[str] = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges before every render."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                # a broken collector must not take the whole endpoint down
+                continue
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+DB_POOL_CHECKOUTS = REGISTRY.register(Counter("db_pool_checkouts_total", "Connections checked out of the pool."))
+DB_POOL_CHECKINS = REGISTRY.register(Counter("db_pool_checkins_total", "Connections returned to the pool."))
+DB_POOL_OVERFLOW_CHECKOUTS = REGISTRY.register(
+    Counter("db_pool_overflow_checkouts_total", "Checkouts served while the pool was beyond pool_size.")
+)
+DB_POOL_CHECKOUT_WAIT = REGISTRY.register(
+    Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.")
+)
+DB_QUERY_DURATION = REGISTRY.register(
+    Histogram("db_query_duration_seconds", "Statement execution latency by operation.")
+)
+DB_POOL_SIZE = REGISTRY.register(Gauge("db_pool_size", "Configured number of persistent pool connections."))
+DB_POOL_MAX_OVERFLOW = REGISTRY.register(Gauge("db_pool_max_overflow", "Configured pool overflow allowance."))
+DB_POOL_CHECKED_OUT = REGISTRY.register(Gauge("db_pool_checked_out", "Connections currently in use."))
+DB_POOL_OVERFLOW = REGISTRY.register(Gauge("db_pool_overflow", "Overflow connections currently open."))
+DB_POOL_UTILIZATION = REGISTRY.register(
+    Gauge("db_pool_utilization", "Checked-out connections as a fraction of pool_size + max_overflow.")
+)
+
+_instrumented_engines: Dict[str, Engine] = {}
+
+# Start time of the statement, kept on its execution context: after_cursor_execute does not run
+# when a statement raises, so a per-connection stack would leak entries on pooled connections
+_QUERY_START_ATTR = "_metrics_query_start"
+
+
+class InstrumentedQueuePool(pool.QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, engine=self.logging_name or "default")
+
+
+def statement_operation(statement: str) -> str:
+    """Coarse operation label (SELECT, INSERT, ...) for a SQL statement."""
+    head = statement.lstrip().split(None, 1)
+    keyword = head[0].upper() if head else ""
+    return keyword if keyword in {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"} else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Attach pool and statement-timing event hooks to ``engine`` under the label ``name``."""
+    if name in _instrumented_engines:
+        return
+    _instrumented_engines[name] = engine
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn: Any, connection_record: Any, connection_proxy: Any) -> None:
+        DB_POOL_CHECKOUTS.inc(engine=name)
+        size = getattr(engine.pool, "size", None)
+        checked_out = getattr(engine.pool, "checkedout", None)
+        if callable(size) and callable(checked_out) and checked_out() > size():
+            DB_POOL_OVERFLOW_CHECKOUTS.inc(engine=name)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn: Any, connection_record: Any) -> None:
+        DB_POOL_CHECKINS.inc(engine=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        if context is not None:
+            setattr(context, _QUERY_START_ATTR, time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        start = getattr(context, _QUERY_START_ATTR, None)
+        if start is not None:
+            DB_QUERY_DURATION.observe(
+                time.perf_counter() - start, engine=name, operation=statement_operation(statement)
+            )
+
+
+def collect_pool_gauges() -> None:
+    """Refresh pool size/usage gauges for every instrumented engine."""
+    for name, engine in _instrumented_engines.items():
+        engine_pool = engine.pool
+        if not isinstance(engine_pool, pool.QueuePool):
+            continue
+        size = engine_pool.size()
+        max_overflow = engine_pool._max_overflow
+        checked_out = engine_pool.checkedout()
+        DB_POOL_SIZE.set(size, engine=name)
+        DB_POOL_MAX_OVERFLOW.set(max_overflow, engine=name)
+        DB_POOL_CHECKED_OUT.set(checked_out, engine=name)
+        DB_POOL_OVERFLOW.set(max(engine_pool.overflow(), 0), engine=name)
+        capacity = size + max(max_overflow, 0)
+        DB_POOL_UTILIZATION.set(checked_out / capacity if capacity else 0.0, engine=name)
+
+
+REGISTRY.add_collector(collect_pool_gauges)
@@ -0,0 +1,114 @@
+"""Keyset (cursor) pagination with opaque, signed cursors."""
+
+import enum
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from .exceptions import AppException
+from .security import load_signed_payload, sign_payload
+
+T = TypeVar("T")
+
+# (column, descending) pairs; the last column must be unique (normally the primary key)
+OrderSpec = Sequence[Tuple[Any, bool]]
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursorError(AppException):
+    """Raised when a cursor is malformed, tampered with or used on a different listing."""
+
+    def __init__(self) -> None:
+        super().__init__(status_code=400, detail="Invalid pagination cursor")
+
+
+@dataclass
+class Page(Generic[T]):
+    """One page of results plus the cursor for the next page (None on the last page)."""
+
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], scope: str) -> str:
+    """Sign the sort-key values of the last row seen; ``scope`` ties the cursor to one listing."""
+    return sign_payload({"s": scope, "v": [_encode_value(value) for value in values]})
+
+
+def decode_cursor(cursor: str, scope: str, width: int) -> List[Any]:
+    """Verify a cursor and return its sort-key values."""
+    payload = load_signed_payload(cursor)
+    if payload is None or payload.get("s") != scope:
+        raise InvalidCursorError()
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != width:
+        raise InvalidCursorError()
+    return [_decode_value(value) for value in values]
+
+
+def keyset_condition(order_by: OrderSpec, values: Sequence[Any]) -> Any:
+    """
+    Rows strictly after ``values`` in ``order_by`` order.
+
+    Expands to ``a <= :a AND (a < :a OR (a = :a AND b < :b) ...)`` rather than a row-value
+    comparison so mixed sort directions work. The redundant leading ``a <= :a`` (``>=`` when
+    ascending) is what lets the planner turn the predicate into a range scan on the matching
+    composite index; an OR alone would be applied as a filter to every earlier row.
+    """
+    clauses = []
+    for index, (column, descending) in enumerate(order_by):
+        equal_prefix = [order_by[i][0] == values[i] for i in range(index)]
+        step = column < values[index] if descending else column > values[index]
+        clauses.append(and_(*equal_prefix, step) if equal_prefix else step)
+    if len(order_by) == 1:
+        return clauses[0]
+    leading, descending = order_by[0]
+    bound = leading <= values[0] if descending else leading >= values[0]
+    return and_(bound, or_(*clauses))
+
+
+def keyset_paginate(
+    query: Query,
+    order_by: OrderSpec,
+    scope: str,
+    cursor: Optional[str] = None,
+    limit: int = MAX_PAGE_SIZE,
+) -> Page:
+    """
+    Fetch the page of ``query`` that follows ``cursor``.
+
+    The cost of a page is independent of its depth: the cursor becomes an indexed range
+    predicate instead of an OFFSET that has to walk every skipped row.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        values = decode_cursor(cursor, scope, len(order_by))
+        query = query.filter(keyset_condition(order_by, values))
+
+    ordering = [column.desc() if descending else column.asc() for column, descending in order_by]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order_by], scope)
+    return Page(items=rows, next_cursor=next_cursor)
@@ -1,14 +1,100 @@
 """Database query utilities for common patterns and optimizations."""
 
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
-from sqlalchemy import desc
+from sqlalchemy import desc, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload
 
+from .config import settings
 from .database import Base
+from .pagination import MAX_PAGE_SIZE, OrderSpec, Page, keyset_paginate
 
 T = TypeVar("T", bound=Base)
 
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+_UPSERT_INSERTS: Dict[str, Callable[[Any], Union[postgresql.Insert, sqlite.Insert]]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# (entity id, changes, user id) of one audit entry
+AuditItem = Tuple[Any, Optional[Dict[str, Any]], Optional[int]]
+
+
+class BulkAuditor(Protocol):
+    """
+    Audit trail for rows written by bulk statements, which bypass the ORM mapper events.
+
+    Core code cannot import the models, so ``app.models.audit_listeners`` installs the auditor
+    with :func:`set_bulk_auditor` when it is imported. Without one, bulk writes are not audited.
+    """
+
+    snapshot_action: str
+
+    def is_audited(self, model: Type[Any]) -> bool:
+        ...
+
+    def row_state(self, model: Type[Any], row: Mapping[Any, Any]) -> Dict[str, Any]:
+        """Audited state of a row keyed by column name."""
+        ...
+
+    def write(self, db: Session, model: Type[Any], action: str, items: Sequence[AuditItem]) -> None:
+        ...
+
+
+_bulk_auditor: Optional[BulkAuditor] = None
+
+
+def set_bulk_auditor(auditor: Optional[BulkAuditor]) -> None:
+    """Install the auditor used by the bulk write helpers."""
+    global _bulk_auditor
+    _bulk_auditor = auditor
+
+
+# Maintainers of data derived through mapper events, which bulk statements bypass. A listener is
+# called with the model and the ids about to be written (empty for inserts) and may return a
+# callback, run with the written ids after the statements and before the commit.
+BulkWriteListener = Callable[[Session, Type[Any], Sequence[Any]], Optional[Callable[[Sequence[Any]], None]]]
+
+_bulk_write_listeners: List[BulkWriteListener] = []
+
+
+def add_bulk_write_listener(listener: BulkWriteListener) -> None:
+    """Register a listener for the bulk write helpers."""
+    if listener not in _bulk_write_listeners:
+        _bulk_write_listeners.append(listener)
+
+
+def _before_bulk_write(db: Session, model: Type[Any], ids: Sequence[Any]) -> List[Callable[[Sequence[Any]], None]]:
+    callbacks = (listener(db, model, ids) for listener in _bulk_write_listeners)
+    return [callback for callback in callbacks if callback is not None]
+
+
+def _auditor_for(model: Type[Any]) -> Optional[BulkAuditor]:
+    auditor = _bulk_auditor
+    return auditor if auditor is not None and auditor.is_audited(model) else None
+
+
+def _batches(rows: Sequence[Dict[str, Any]], batch_size: Optional[int]) -> Iterator[List[Dict[str, Any]]]:
+    size = batch_size or settings.BULK_BATCH_SIZE
+    for start in range(0, len(rows), size):
+        yield list(rows[start : start + size])
+
 
 class QueryHelper:
     """Helper class for common database query patterns."""
@@ -54,13 +140,40 @@ class QueryHelper:
 
         return query.offset(skip).limit(limit).all()
 
+    @staticmethod
+    def get_page(
+        db: Session,
+        model: Type[T],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        cursor: Optional[str] = None,
+        limit: int = MAX_PAGE_SIZE,
+        order_by: Optional[OrderSpec] = None,
+    ) -> Page:
+        """
+        Get records matching optional filters with keyset pagination.
+
+        ``order_by`` is a list of ``(column, descending)`` pairs and defaults to the primary key;
+        the primary key is appended as a tie-breaker when missing so every cursor is unambiguous.
+        """
+        query = db.query(model)
+        for key, value in (filter_dict or {}).items():
+            if hasattr(model, key):
+                query = query.filter(getattr(model, key) == value)  # type: ignore[attr-defined]
+
+        ordering = list(order_by or [])
+        primary_key = model.id  # type: ignore[attr-defined]
+        if not any(column is primary_key for column, _ in ordering):
+            ordering.append((primary_key, ordering[-1][1] if ordering else False))
+
+        scope = f"{model.__tablename__}:{sorted((filter_dict or {}).items())}"  # type: ignore[attr-defined]
+        return keyset_paginate(query, ordering, scope, cursor=cursor, limit=limit)
+
     @staticmethod
     def create(db: Session, model: Type[T], **kwargs: Any) -> T:
         """Create a new record."""
         obj = model(**kwargs)
         db.add(obj)
         db.commit()
-        db.refresh(obj)
         return obj
 
     @staticmethod
@@ -70,9 +183,165 @@ class QueryHelper:
             if hasattr(obj, key):
                 setattr(obj, key, value)
         db.commit()
-        db.refresh(obj)
         return obj
 
+    @staticmethod
+    def _audit_rows(db: Session, model: Type[T], rows: Sequence[Any], user_field: str, snapshot: bool = False) -> None:
+        """Audit rows returned by a bulk statement as INSERT entries, or SNAPSHOT entries with ``snapshot``."""
+        auditor = _auditor_for(model)
+        if auditor is None:
+            return
+        items: List[AuditItem] = []
+        for row in rows:
+            state = auditor.row_state(model, row._mapping)
+            if not snapshot:
+                state = {name: {"old": None, "new": value} for name, value in state.items()}
+            items.append((row.id, state, row._mapping.get(user_field)))
+        auditor.write(db, model, auditor.snapshot_action if snapshot else "INSERT", items)
+
+    @staticmethod
+    def bulk_create(
+        db: Session, model: Type[T], rows: Sequence[Dict[str, Any]], batch_size: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Insert many records with executemany ``INSERT ... RETURNING``, one statement per batch.
+
+        All rows must supply the same columns. Column defaults are applied as for ``create`` and
+        audited models get their INSERT entries; bulk write listeners (e.g. payment stats) run
+        before the commit. Nothing is loaded into the session. Commits once at the end.
+
+        Args:
+            db: Database session
+            model: Model class
+            rows: Column values per record
+            batch_size: Records per statement (default BULK_BATCH_SIZE)
+
+        Returns:
+            Primary keys of the new records, in the order of ``rows``
+        """
+        table = model.__table__  # type: ignore[attr-defined]
+        after_write = _before_bulk_write(db, model, [])
+        ids: List[Any] = []
+        for batch in _batches(rows, batch_size):
+            statement = insert(table).returning(*table.c, sort_by_parameter_order=True)
+            created = db.execute(statement, batch).all()
+            QueryHelper._audit_rows(db, model, created, "created_by")
+            ids.extend(row.id for row in created)
+        for callback in after_write:
+            callback(ids)
+        db.commit()
+        return ids
+
+    @staticmethod
+    def bulk_update(
+        db: Session, model: Type[T], rows: Sequence[Dict[str, Any]], batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Update many records by primary key with one executemany UPDATE per batch.
+
+        Each row holds ``id`` plus the values to set; rows may set different columns. For audited
+        models the previous values are read with one SELECT per batch to build the diffs.
+        Objects already loaded in the session are not refreshed. Commits once at the end.
+
+        Args:
+            db: Database session
+            model: Model class
+            rows: ``{"id": ..., column: value, ...}`` per record
+            batch_size: Records per statement (default BULK_BATCH_SIZE)
+
+        Returns:
+            Number of updated records
+        """
+        table = model.__table__  # type: ignore[attr-defined]
+        auditor = _auditor_for(model)
+        ids = [row["id"] for row in rows]
+        after_write = _before_bulk_write(db, model, ids)
+        updated = 0
+        for batch in _batches(rows, batch_size):
+            if auditor is None:
+                db.execute(update(model), batch)
+                updated += len(batch)
+                continue
+            current = db.execute(select(table).where(table.c.id.in_([row["id"] for row in batch])))
+            previous = {old.id: auditor.row_state(model, old._mapping) for old in current}
+            batch = [row for row in batch if row["id"] in previous]
+            if batch:
+                db.execute(update(model), batch)
+            items: List[AuditItem] = []
+            for row in batch:
+                before = previous[row["id"]]
+                changes = {
+                    name: {"old": before[name], "new": value}
+                    for name, value in auditor.row_state(model, row).items()
+                    if before[name] != value
+                }
+                if changes:
+                    items.append((row["id"], changes, row.get("updated_by")))
+            auditor.write(db, model, "UPDATE", items)
+            updated += len(batch)
+        for callback in after_write:
+            callback(ids)
+        db.commit()
+        return updated
+
+    @staticmethod
+    def upsert(
+        db: Session,
+        model: Type[T],
+        rows: Sequence[Dict[str, Any]],
+        conflict_columns: Sequence[str],
+        update_columns: Optional[Sequence[str]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Insert many records, updating the existing ones, with ``INSERT ... ON CONFLICT DO UPDATE``.
+
+        Supported on PostgreSQL and SQLite. A batch must not contain the same conflict key twice.
+        Audited models get a SNAPSHOT entry with the resulting state of every row, since the
+        statement does not report which rows were inserted and which updated.
+
+        Args:
+            db: Database session
+            model: Model class
+            rows: Column values per record
+            conflict_columns: Columns of the unique constraint or index that detects existing rows
+            update_columns: Columns overwritten on conflict (default: every supplied non-key column)
+            batch_size: Records per statement (default BULK_BATCH_SIZE)
+
+        Returns:
+            Primary keys of the inserted or updated records, in the order of ``rows``
+
+        Raises:
+            ValueError: On databases without ON CONFLICT support
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect not in _UPSERT_INSERTS:
+            raise ValueError(f"upsert is not supported on {dialect}")
+        if not rows:
+            return []
+        table = model.__table__  # type: ignore[attr-defined]
+        if update_columns is None:
+            update_columns = [name for name in rows[0] if name not in conflict_columns and name != "id"]
+        upsert = _UPSERT_INSERTS[dialect](table)
+        assignments = {name: upsert.excluded[name] for name in update_columns}
+        if "updated_at" in table.c and "updated_at" not in assignments:
+            # onupdate defaults do not apply to ON CONFLICT; the proposed row carries a fresh value
+            assignments["updated_at"] = upsert.excluded.updated_at
+        statement = upsert.on_conflict_do_update(index_elements=list(conflict_columns), set_=assignments).returning(
+            *table.c, sort_by_parameter_order=True
+        )
+
+        after_write = _before_bulk_write(db, model, [])
+        ids: List[Any] = []
+        for batch in _batches(rows, batch_size):
+            written = db.execute(statement, batch).all()
+            QueryHelper._audit_rows(db, model, written, "updated_by", snapshot=True)
+            ids.extend(row.id for row in written)
+        for callback in after_write:
+            callback(ids)
+        db.commit()
+        return ids
+
     @staticmethod
     def delete(db: Session, obj: Any) -> None:
         """Delete a record."""
@@ -80,11 +349,59 @@ class QueryHelper:
         db.commit()
 
     @staticmethod
-    def count(db: Session, model: Type[T], filter_dict: Optional[Dict[str, Any]] = None) -> int:
-        """Count records matching optional filters."""
-        query = db.query(model)
-        if filter_dict:
-            for key, value in filter_dict.items():
-                if hasattr(model, key):
-                    query = query.filter(getattr(model, key) == value)  # type: ignore[attr-defined]
-        return query.count()
+    def count_where(db: Session, model: Type[Any], *conditions: Any, include_deleted: bool = False) -> int:
+        """
+        Count rows with a direct ``SELECT count(*) FROM table WHERE ...``.
+
+        Unlike ``Query.count()`` the statement is not wrapped in a subquery, so the database can
+        answer from an index. Soft-deleted rows are excluded unless ``include_deleted`` is set.
+        """
+        query = select(func.count()).select_from(model).where(*conditions)
+        return db.execute(query.execution_options(include_deleted=include_deleted)).scalar_one()
+
+    @staticmethod
+    def estimate_count(db: Session, model: Type[Any]) -> Optional[int]:
+        """
+        Planner estimate of the number of rows in ``model``'s table, including soft-deleted rows.
+
+        Reads ``pg_class.reltuples`` (summed over partitions for partitioned tables), which
+        ANALYZE and autovacuum keep current. Returns None on other databases or when the table
+        has never been analyzed.
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            return None
+        estimate = db.execute(
+            text(
+                "SELECT sum(greatest(c.reltuples, 0))::bigint, bool_or(c.reltuples >= 0) FROM pg_class c "
+                "WHERE c.oid = to_regclass(:name) "
+                "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:name))"
+            ),
+            {"name": model.__tablename__},  # type: ignore[attr-defined]
+        ).one()
+        return int(estimate[0]) if estimate[1] else None
+
+    @staticmethod
+    def count(
+        db: Session, model: Type[Any], filter_dict: Optional[Dict[str, Any]] = None, approximate: bool = False
+    ) -> int:
+        """
+        Count records matching optional filters.
+
+        With ``approximate`` and no filters, PostgreSQL answers from the planner statistics
+        instead of scanning: for soft-deletable models the deleted rows, which the partial
+        ``ix_*_deleted_at`` index covers, are counted exactly and subtracted. Elsewhere, or
+        before the first ANALYZE, the exact count is returned.
+        """
+        conditions = [
+            getattr(model, key) == value for key, value in (filter_dict or {}).items() if hasattr(model, key)
+        ]
+        if approximate and not conditions:
+            estimate = QueryHelper.estimate_count(db, model)
+            if estimate is not None:
+                if hasattr(model, "deleted_at"):
+                    deleted = QueryHelper.count_where(
+                        db, model, model.deleted_at.isnot(None), include_deleted=True  # type: ignore[attr-defined]
+                    )
+                    estimate -= deleted
+                return max(estimate, 0)
+        return QueryHelper.count_where(db, model, *conditions)
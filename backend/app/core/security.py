@@ -1,5 +1,9 @@
+import base64
+import hashlib
+import hmac
+import json
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -37,3 +41,31 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def sign_payload(data: Dict[str, Any]) -> str:
+    """Serialize ``data`` into a compact, URL-safe token signed with the app secret."""
+    body = _b64encode(json.dumps(data, separators=(",", ":"), sort_keys=True).encode())
+    signature = hmac.new(settings.SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def load_signed_payload(token: str) -> Optional[Dict[str, Any]]:
+    """Verify a token produced by :func:`sign_payload`; returns None if it was tampered with."""
+    try:
+        body, signature = token.split(".", 1)
+        expected = hmac.new(settings.SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        data = json.loads(_b64decode(body))
+    except (ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,191 @@
+"""Slow-query recording with optional one-time EXPLAIN capture per statement shape."""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar, Token
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app.slow_query")
+
+# Method and path of the request currently executing, set by the request middleware
+_current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+# Start time of the statement, kept on its execution context (see app.core.metrics)
+_START_ATTR = "_slow_query_start"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%\([^)]+\)s|%s|:\w+|\?")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+
+
+def set_current_route(route: Optional[str]) -> Token:
+    """Record the route whose queries are executing in this context."""
+    return _current_route.set(route)
+
+
+def reset_current_route(token: Token) -> None:
+    _current_route.reset(token)
+
+
+def normalize_sql(statement: str) -> str:
+    """Reduce a statement to its shape: literals and bind markers become ``?``, IN lists collapse."""
+    normalized = _STRING_RE.sub("?", statement)
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """Replace bound values with their type names so no user data reaches the log."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = redact_parameters(parameters[0]) if parameters else None
+        return {"rows": len(parameters), "first": first}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SlowQueryRecorder:
+    """
+    Records statements slower than a threshold and optionally captures their query plan.
+
+    Plans are captured at most once per normalized statement shape, on the connection that ran
+    the slow query, with ``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` elsewhere.
+    """
+
+    def __init__(
+        self, threshold_ms: float, explain: bool = False, max_records: int = 200, max_plans: int = 500
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_plans = max_plans
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def install(self, engine: Engine) -> None:
+        """Attach timing hooks to ``engine``."""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        if self.enabled and context is not None:
+            setattr(context, _START_ATTR, time.perf_counter())
+
+    def _after_execute(
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        start = getattr(context, _START_ATTR, None)
+        if not self.enabled or start is None:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        normalized = normalize_sql(statement)
+        shape = fingerprint(normalized)
+        record = {
+            "fingerprint": shape,
+            "sql": normalized,
+            "parameters": redact_parameters(parameters, executemany),
+            "duration_ms": round(duration_ms, 2),
+            "route": _current_route.get(),
+            "recorded_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self._records.append(record)
+        logger.warning(
+            "Slow query (%.1f ms) on %s [%s]: %s params=%s",
+            duration_ms,
+            record["route"] or "background",
+            shape,
+            normalized,
+            record["parameters"],
+        )
+
+        if self.explain and not executemany and shape not in self._plans:
+            self._capture_plan(conn, cursor, statement, parameters, shape, normalized)
+
+    def _capture_plan(
+        self, conn: Any, cursor: Any, statement: str, parameters: Any, shape: str, normalized: str
+    ) -> None:
+        if normalized.split(" ", 1)[0].upper() not in ("SELECT", "WITH"):
+            return
+        dialect = conn.dialect.name
+        prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+        # Postgres aborts the whole transaction on error, so guard the EXPLAIN with a savepoint
+        guarded = dialect == "postgresql"
+        explain_cursor = cursor.connection.cursor()
+        try:
+            if guarded:
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            explain_cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(" | ".join(str(col) for col in row) for row in explain_cursor.fetchall())
+            if guarded:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        except Exception as e:
+            if guarded:
+                try:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                except Exception:
+                    pass
+            logger.debug("Could not capture plan for %s: %s", shape, e)
+            # Remember the failure too, so the EXPLAIN is not retried on every slow execution
+            self._store_plan(shape, {"sql": normalized, "plan": None, "error": str(e)})
+            return
+        finally:
+            explain_cursor.close()
+
+        self._store_plan(shape, {"sql": normalized, "plan": plan})
+        logger.warning("Query plan for [%s]:\n%s", shape, plan)
+
+    def _store_plan(self, shape: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._plans[shape] = {**entry, "captured_at": datetime.utcnow().isoformat()}
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Most recent slow queries, oldest first."""
+        with self._lock:
+            return list(self._records)
+
+    def plan_for(self, shape: str) -> Optional[Dict[str, Any]]:
+        """Captured plan for a statement fingerprint, if any; ``plan`` is None and ``error`` set if EXPLAIN failed."""
+        return self._plans.get(shape)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._plans.clear()
+
+
+slow_query_recorder = SlowQueryRecorder(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+)
@@ -10,11 +10,14 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
 from .core.config import settings
-from .core.database import SessionLocal
-from .core.exceptions import global_exception_handler
+from .core.database import SessionLocal, begin_request_routing, end_request_routing
+from .core.exceptions import AppException, global_exception_handler
 from .core.logging import log_request_info, setup_logging
-from .models.audit_listeners import set_session_factory, register_audit_listeners
-from .routes import auth, books, payments
+from .core.slow_query import reset_current_route, set_current_route
+from .models.audit_listeners import audit_writer, set_session_factory, register_audit_listeners
+from .routes import admin, auth, books, metrics, payments
+from .services.stripe_client import stripe_client
+from .services.stripe_webhook_service import stripe_event_consumer
 
 # Set up logging
 logger = setup_logging()
@@ -35,6 +38,17 @@ async def startup_event() -> None:
     set_session_factory(SessionLocal)
     register_audit_listeners()
     logger.info("Audit listeners initialized")
+    if settings.STRIPE_WEBHOOK_SECRET:
+        stripe_event_consumer.start(SessionLocal)
+        logger.info("Stripe event consumer started")
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Flush buffered audit entries, stop background consumers and close pooled connections."""
+    stripe_event_consumer.stop()
+    await stripe_client.aclose()
+    audit_writer.stop()
 
 
 @app.get("/")
@@ -49,7 +63,7 @@ async def health_check():
     return {"status": "healthy"}
 
 
-public_paths = ["/", "/health", "/api/v1/docs", "/api/v1/redoc", "/api/v1/openapi.json"]
+public_paths = ["/", "/health", "/metrics", "/api/v1/docs", "/api/v1/redoc", "/api/v1/openapi.json"]
 
 
 @app.middleware("http")
@@ -67,11 +81,26 @@ async def log_requests(request: Request, call_next):
         # don't let logging break requests
         pass
 
-    if request.url.path in public_paths:
-        return await call_next(request)
+    # Tag queries issued while serving this request so slow-query logs name the route
+    route_token = set_current_route(f"{request.method} {request.url.path}")
+    try:
+        if request.url.path in public_paths:
+            return await call_next(request)
 
-    response = await call_next(request)
-    return response
+        response = await call_next(request)
+        return response
+    finally:
+        reset_current_route(route_token)
+
+
+@app.middleware("http")
+async def route_database_reads(request: Request, call_next):
+    """Scope read-replica routing (and read-your-writes stickiness) to a single request."""
+    token = begin_request_routing()
+    try:
+        return await call_next(request)
+    finally:
+        end_request_routing(token)
 
 
 # Security middlewares
@@ -112,7 +141,8 @@ async def add_security_headers(request: Request, call_next):
     return response
 
 
-# Exception handlers
+# Exception handlers; AppException gets its own entry so its 4xx responses skip the server-error middleware
+app.add_exception_handler(AppException, global_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
 
@@ -136,3 +166,5 @@ app.include_router(auth.router, prefix="/api/v1/auth")
 app.include_router(auth.router, prefix="/auth")
 app.include_router(books.router, prefix="/api/v1/books")
 app.include_router(payments.router, prefix="/api/v1/payments")
+app.include_router(admin.router, prefix="/api/v1/admin")
+app.include_router(metrics.router)
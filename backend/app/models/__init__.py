@@ -1,5 +1,23 @@
 from .payment import Payment, PaymentStatus, PlanType
 from .user import User
 from .audit import AuditLog
+from .archive import payments_archive, users_archive
+from .payment_stats import UserPaymentStats
+from .analytics import JobWatermark, PaymentDailyRollup
+from .stripe_event import StripeEvent
+from .report_cache import ReportCacheEntry
 
-__all__ = ["User", "Payment", "PlanType", "PaymentStatus", "AuditLog"]
+__all__ = [
+    "User",
+    "Payment",
+    "PlanType",
+    "PaymentStatus",
+    "AuditLog",
+    "users_archive",
+    "payments_archive",
+    "UserPaymentStats",
+    "PaymentDailyRollup",
+    "JobWatermark",
+    "StripeEvent",
+    "ReportCacheEntry",
+]
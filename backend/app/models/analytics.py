@@ -0,0 +1,44 @@
+"""Materialized analytics tables, refreshed by scheduled jobs instead of per request."""
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column, Date, DateTime
+from sqlalchemy import Enum as SQLEnum
+from sqlalchemy import Integer, String
+
+from ..core.database import Base
+from .payment import PlanType
+
+
+class PaymentDailyRollup(Base):
+    """
+    Active payments created on ``day`` for one plan type, bucketed by their current status.
+
+    Rows are recomputed per day by ``AnalyticsService.refresh_daily_rollups``; analytics reads
+    never touch the payments table.
+    """
+
+    __tablename__ = "payment_daily_rollups"
+
+    day: Any = Column(Date, primary_key=True)
+    plan_type: Any = Column(SQLEnum(PlanType), primary_key=True)
+    payments_count: Any = Column(Integer, default=0, nullable=False)
+    pending_count: Any = Column(Integer, default=0, nullable=False)
+    completed_count: Any = Column(Integer, default=0, nullable=False)
+    failed_count: Any = Column(Integer, default=0, nullable=False)
+    refunded_count: Any = Column(Integer, default=0, nullable=False)
+    # Amounts in cents
+    completed_cents: Any = Column(Integer, default=0, nullable=False)
+    refunded_cents: Any = Column(Integer, default=0, nullable=False)
+    refreshed_at: Any = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class JobWatermark(Base):
+    """High-water mark of an incremental job: everything up to ``watermark`` has been processed."""
+
+    __tablename__ = "job_watermarks"
+
+    name: Any = Column(String(100), primary_key=True)
+    watermark: Any = Column(DateTime, nullable=False)
+    updated_at: Any = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,30 @@
+"""Archive tables for soft-deleted rows moved out of the hot tables.
+
+Each ``*_archive`` table mirrors its source table column for column (same ids, so rows can be
+moved back) plus ``archived_at``. They carry no foreign keys or unique constraints: archived
+payments may reference archived users, and archived emails may be reused by new accounts.
+"""
+
+from sqlalchemy import Column, DateTime, Index, Table
+
+from ..core.database import Base
+from .payment import Payment
+from .user import User
+
+
+def _archive_table(source: Table, *indexes: Index) -> Table:
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+        for column in source.columns
+    ]
+    return Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *columns,
+        Column("archived_at", DateTime, nullable=False),
+        *indexes,
+    )
+
+
+users_archive = _archive_table(User.__table__, Index("ix_users_archive_email", "email"))
+payments_archive = _archive_table(Payment.__table__, Index("ix_payments_archive_user_id", "user_id"))
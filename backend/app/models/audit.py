@@ -3,13 +3,20 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from sqlalchemy import Column, DateTime, Integer, String, Text, Index
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 
 from ..core.database import Base
 
 
 class AuditLog(Base):
-    """Audit log entry for tracking all data modifications."""
+    """
+    Audit log entry for tracking all data modifications.
+
+    On PostgreSQL the table is range-partitioned by month on ``created_at`` (migration 005), with
+    a composite (id, created_at) primary key; ids still come from a single sequence, so the ORM
+    keeps ``id`` as the identity.
+    """
     
     __tablename__ = "audit_logs"
 
@@ -23,7 +30,8 @@ class AuditLog(Base):
     action: Any = Column(String(20), nullable=False)  # "INSERT", "UPDATE", "DELETE"
     
     # The changes
-    changes: Any = Column(Text, nullable=True)  # JSON string of field changes {old: value, new: value}
+    # Field changes as {field: {"old": value, "new": value}}; JSONB on Postgres, JSON1 text on SQLite
+    changes: Any = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)
     
     # Who modified it
     user_id: Any = Column(Integer, nullable=True)  # User who made the change (null for system)
@@ -42,6 +50,12 @@ class AuditLog(Base):
         Index("ix_audit_logs_created_at", "created_at"),
         Index("ix_audit_logs_user_id", "user_id"),
         Index("ix_audit_logs_action", "action"),
+        # Field-level queries (AuditService.find_changes): GIN serves ? and @> on Postgres;
+        # SQLite can only index fixed JSON paths, so the hottest one (status transitions) is indexed
+        Index("ix_audit_logs_changes", "changes", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_audit_logs_status_change", text("json_extract(changes, '$.status.new')"), "created_at"
+        ).ddl_if(dialect="sqlite"),
     )
     
     def __repr__(self) -> str:
@@ -1,38 +1,84 @@
-"""SQLAlchemy event listeners for automatic audit logging."""
+"""SQLAlchemy event listeners for automatic audit logging.
 
-import json
-from typing import Any, Dict, Optional, Callable
+Mapper listeners only queue audit entries on the flushing session. Once the flush has run, every
+queued entry is written with a single multi-row INSERT, either on the flushing connection (same
+transaction, the default) or, with ``AUDIT_WRITE_MODE="background"``, handed to a bounded
+in-memory queue after commit and drained by :class:`AuditWriter`.
+"""
 
-from sqlalchemy import event
-from sqlalchemy.orm import Session, sessionmaker
+import enum
+import logging
+import queue
+import random
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import ColumnDefault, event, insert, select
+from sqlalchemy.engine import Connection
 from sqlalchemy.inspection import inspect as sa_inspect
+from sqlalchemy.orm import Mapper, Session, SessionTransaction, class_mapper, object_session
 
+from app.core.config import settings
+from app.core.query_helpers import AuditItem, set_bulk_auditor
 from app.models.audit import AuditLog
-from app.models.user import User
 from app.models.payment import Payment
+from app.models.user import User
 
+logger = logging.getLogger(__name__)
 
 # Models to audit
 AUDITED_MODELS = {User, Payment}
 
+# Action of the periodic full-state rows used to reconstruct entities as of a point in time
+SNAPSHOT_ACTION = "SNAPSHOT"
+
+# session.info keys: entries queued during the current flush / flushed but awaiting commit /
+# number of awaiting entries when each open savepoint began
+_PENDING_KEY = "audit_pending"
+_AWAITING_COMMIT_KEY = "audit_awaiting_commit"
+_SAVEPOINT_MARKS_KEY = "audit_savepoint_marks"
+
 # Global session maker - will be set during app initialization
-_session_factory: Optional[sessionmaker[Session]] = None  # type: ignore[type-arg]
+_session_factory: Optional[Callable[[], Session]] = None
 
 
-def set_session_factory(factory: sessionmaker[Session]) -> None:  # type: ignore[type-arg]
-    """Set the session factory for audit logging."""
+def set_session_factory(factory: Callable[[], Session]) -> None:
+    """Set the session factory used by the background audit writer."""
     global _session_factory
     _session_factory = factory
 
 
 def get_audit_session() -> Session:
-    """Get a new session for audit logging."""
+    """Get a new session for background audit writes."""
     global _session_factory
     if _session_factory is None:
         raise RuntimeError("Session factory not initialized. Call set_session_factory() on app startup.")
     return _session_factory()
 
 
+def build_audit_entry(
+    entity_type: str,
+    entity_id: int,
+    action: str,
+    changes: Optional[Dict[str, Any]] = None,
+    user_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Build the column values of one audit_logs row."""
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "action": action,
+        "changes": changes or None,
+        "user_id": user_id,
+        "created_at": datetime.utcnow(),
+        "ip_address": None,
+        "user_agent": None,
+        "reason": None,
+    }
+
+
 def log_audit_event(
     session: Session,
     entity_type: str,
@@ -41,160 +87,416 @@ def log_audit_event(
     changes: Optional[Dict[str, Any]] = None,
     user_id: Optional[int] = None,
 ) -> None:
-    """Create an audit log entry."""
-    try:
-        audit_log = AuditLog(
-            entity_type=entity_type,
-            entity_id=entity_id,
-            action=action,
-            changes=json.dumps(changes) if changes else None,
-            user_id=user_id,
-        )
-        session.add(audit_log)
-        session.flush()
-    except Exception as e:
-        # Log but don't fail the main transaction
-        print(f"Error creating audit log: {e}")
+    """Queue an audit log entry; it is written in bulk when ``session`` finishes flushing."""
+    entry = build_audit_entry(entity_type, entity_id, action, changes, user_id)
+    session.info.setdefault(_PENDING_KEY, []).append(entry)
+
+
+def write_audit_entries(connection: Connection, entries: List[Dict[str, Any]]) -> None:
+    """
+    Write audit entries with one executemany INSERT.
+
+    SQLAlchemy's insertmanyvalues batching turns this into multi-row ``INSERT ... VALUES``
+    statements on both SQLite and psycopg2.
+    """
+    if entries:
+        connection.execute(insert(AuditLog.__table__), entries)
+
+
+class AuditWriter:
+    """
+    Background writer draining a bounded queue of audit entries in batches.
+
+    When the queue is full, the producer writes its overflow synchronously instead of dropping
+    entries, so memory stays bounded without losing audit records.
+    """
+
+    def __init__(self, max_entries: int, batch_size: int, flush_interval: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_entries)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the flusher thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, entries: List[Dict[str, Any]]) -> None:
+        """Queue committed entries for the flusher thread."""
+        self.start()
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                logger.warning("Audit queue full; writing %d entries synchronously", len(entries) - index)
+                self._write(entries[index:])
+                return
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Write everything currently queued."""
+        while True:
+            batch = self._drain(timeout=None)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the flusher thread and write any remaining entries."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _drain(self, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        try:
+            if timeout is None:
+                batch.append(self._queue.get_nowait())
+            else:
+                batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._drain(timeout=self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            session = get_audit_session()
+        except RuntimeError as e:
+            logger.error("Dropping %d audit entries: %s", len(batch), e)
+            return
+        try:
+            write_audit_entries(session.connection(), batch)
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.exception("Failed to write %d audit entries", len(batch))
+        finally:
+            session.close()
+
+
+audit_writer = AuditWriter(
+    max_entries=settings.AUDIT_QUEUE_MAX_ENTRIES,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _write_flushed_audit_entries(session: Session, flush_context: Any) -> None:
+    """Write (or stage for the background writer) everything queued during this flush."""
+    entries = session.info.pop(_PENDING_KEY, None)
+    if not entries:
+        return
+    if settings.AUDIT_WRITE_MODE == "background":
+        session.info.setdefault(_AWAITING_COMMIT_KEY, []).extend(entries)
+    else:
+        write_audit_entries(session.connection(), entries)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session: Session, transaction: SessionTransaction) -> None:
+    """Remember where a savepoint's entries start, so its rollback can drop just those."""
+    if transaction.nested:
+        marks = session.info.setdefault(_SAVEPOINT_MARKS_KEY, {})
+        marks[transaction] = len(session.info.get(_AWAITING_COMMIT_KEY, ()))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_savepoint(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.nested:
+        session.info.get(_SAVEPOINT_MARKS_KEY, {}).pop(transaction, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed_audit_entries(session: Session) -> None:
+    # Also fired when a savepoint is released; its entries then wait for the outer commit
+    if session.in_nested_transaction():
+        return
+    entries = session.info.pop(_AWAITING_COMMIT_KEY, None)
+    if entries:
+        audit_writer.enqueue(entries)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_audit_entries(session: Session) -> None:
+    # Entries of a failed flush belong to the transaction being rolled back
+    session.info.pop(_PENDING_KEY, None)
+    savepoint = session.get_nested_transaction()
+    if savepoint is None:
+        session.info.pop(_AWAITING_COMMIT_KEY, None)
+        return
+    # Only a savepoint rolled back: keep what the enclosing transaction flushed before it began
+    mark = session.info.get(_SAVEPOINT_MARKS_KEY, {}).get(savepoint)
+    if mark is not None and _AWAITING_COMMIT_KEY in session.info:
+        del session.info[_AWAITING_COMMIT_KEY][mark:]
+
+
+# Bookkeeping columns never recorded in audit entries
+EXCLUDED_COLUMNS = frozenset({"id", "created_at", "updated_at"})
+
+# Secrets kept out of every diff, INSERT and SNAPSHOT row of their model: password hashes, and
+# PaymentIntent client secrets, which can complete a payment client-side
+SECRET_COLUMNS: Dict[Any, frozenset] = {
+    User: frozenset({"hashed_password"}),
+    Payment: frozenset({"client_secret"}),
+}
+
+
+def excluded_columns(model: Any) -> frozenset:
+    """Column names of ``model`` (or its audited base classes) that never reach the audit trail."""
+    excluded = EXCLUDED_COLUMNS
+    for audited, secrets in SECRET_COLUMNS.items():
+        if issubclass(model, audited):
+            excluded = excluded | secrets
+    return excluded
+
+
+# mapper -> {attribute key: column name} of its audited columns, filled by register_audit_listeners()
+_audited_attributes: Dict[Mapper, Dict[str, str]] = {}
+
+
+def build_audited_attributes(mapper: Mapper) -> Dict[str, str]:
+    """Map each audited column attribute of ``mapper`` to the column name used in diffs."""
+    excluded = excluded_columns(mapper.class_)
+    return {prop.key: prop.columns[0].name for prop in mapper.column_attrs if prop.columns[0].name not in excluded}
+
+
+def _audited_attributes_for(mapper: Mapper) -> Dict[str, str]:
+    attributes = _audited_attributes.get(mapper)
+    if attributes is None:
+        # Subclasses of an audited model are registered lazily on their first update
+        attributes = _audited_attributes[mapper] = build_audited_attributes(mapper)
+    return attributes
+
+
+def serialize_value(value: Any) -> Any:
+    """Convert a column value to its JSON form: enums by value, datetimes as ISO 8601."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
 
 
 def extract_changes(instance: Any) -> Dict[str, Any]:
-    """Extract changed fields from an ORM instance."""
+    """
+    Extract changed fields from an ORM instance.
+
+    Only attributes present in the instance's committed state (the ones modified since load)
+    are examined, so the cost follows the number of changed columns rather than table width.
+    """
     changes: Dict[str, Any] = {}
-    insp = sa_inspect(instance)
-    
-    if insp is None:
+    state = sa_inspect(instance)
+    if state is None or not state.committed_state:
         return changes
-    
-    mapper = insp.mapper
-    for col in mapper.columns:
-        if col.name in ("created_at", "updated_at", "id"):
-            continue
-        
-        history = insp.get_attribute_history(col.name)
+
+    audited = _audited_attributes_for(state.mapper)
+    for key in state.committed_state.keys() & audited.keys():
+        history = state.attrs[key].history
         if history.has_changes():
-            old_value = history.deleted[0] if history.deleted else None
-            new_value = history.added[0] if history.added else None
-            
-            changes[col.name] = {
-                "old": str(old_value) if old_value is not None else None,
-                "new": str(new_value) if new_value is not None else None,
+            changes[audited[key]] = {
+                "old": serialize_value(history.deleted[0]) if history.deleted else None,
+                "new": serialize_value(history.added[0]) if history.added else None,
             }
-    
+
     return changes
 
 
-@event.listens_for(User, "after_insert", propagate=True)
-def receive_user_after_insert(mapper: Any, connection: Any, target: User) -> None:
-    """Audit log for user creation."""
-    try:
-        session = get_audit_session()
-        try:
-            entity_id: Optional[int] = getattr(target, "id", None)
-            user_id: Optional[int] = getattr(target, "created_by", None)
-            if entity_id is not None:
-                log_audit_event(
-                    session,
-                    entity_type="User",
-                    entity_id=entity_id,
-                    action="INSERT",
-                    user_id=user_id,
-                )
-                session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Audit log error: {e}")
-        finally:
-            session.close()
-    except Exception as e:
-        print(f"Failed to get audit session: {e}")
+def entity_state(mapper: Mapper, connection: Connection, target: Any) -> Dict[str, Any]:
+    """
+    Full audited state of ``target`` as {column name: value}.
 
+    Loaded attributes are read straight from the instance; if any are expired the row is read
+    on the flushing connection instead of triggering a lazy load mid-flush.
+    """
+    attributes = _audited_attributes_for(mapper)
+    loaded = sa_inspect(target).dict
+    if loaded.keys() >= attributes.keys():
+        return {name: serialize_value(loaded[key]) for key, name in attributes.items()}
 
-@event.listens_for(User, "after_update", propagate=True)
-def receive_user_after_update(mapper: Any, connection: Any, target: User) -> None:
-    """Audit log for user updates."""
-    try:
-        session = get_audit_session()
-        try:
-            changes = extract_changes(target)
-            entity_id: Optional[int] = getattr(target, "id", None)
-            user_id: Optional[int] = getattr(target, "updated_by", None)
-            
-            if changes and entity_id is not None:
-                log_audit_event(
-                    session,
-                    entity_type="User",
-                    entity_id=entity_id,
-                    action="UPDATE",
-                    changes=changes,
-                    user_id=user_id,
-                )
-                session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Audit log error: {e}")
-        finally:
-            session.close()
-    except Exception as e:
-        print(f"Failed to get audit session: {e}")
+    columns = [mapper.columns[key] for key in attributes]
+    row = connection.execute(select(*columns).where(mapper.primary_key[0] == target.id)).one()
+    return {name: serialize_value(value) for name, value in zip(attributes.values(), row)}
 
 
-@event.listens_for(Payment, "after_insert", propagate=True)
-def receive_payment_after_insert(mapper: Any, connection: Any, target: Payment) -> None:
-    """Audit log for payment creation."""
-    try:
-        session = get_audit_session()
-        try:
-            entity_id: Optional[int] = getattr(target, "id", None)
-            user_id: Optional[int] = getattr(target, "created_by", None)
-            if entity_id is not None:
-                log_audit_event(
-                    session,
-                    entity_type="Payment",
-                    entity_id=entity_id,
-                    action="INSERT",
-                    user_id=user_id,
-                )
-                session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Audit log error: {e}")
-        finally:
-            session.close()
-    except Exception as e:
-        print(f"Failed to get audit session: {e}")
+def inserted_state(mapper: Mapper, connection: Connection, target: Any) -> Dict[str, Any]:
+    """
+    Full audited state of a just-inserted ``target`` as {column name: value}, without a SELECT.
 
+    Attributes the INSERT did not set were written as their column's scalar default, or NULL.
+    Only a server-side default, which the flush does not fetch, needs the row read back.
+    """
+    attributes = _audited_attributes_for(mapper)
+    loaded = sa_inspect(target).dict
+    state = {}
+    for key, name in attributes.items():
+        if key in loaded:
+            value = loaded[key]
+        else:
+            column = mapper.columns[key]
+            if column.server_default is not None:
+                return entity_state(mapper, connection, target)
+            default = column.default
+            value = default.arg if isinstance(default, ColumnDefault) and default.is_scalar else None
+        state[name] = serialize_value(value)
+    return state
 
-@event.listens_for(Payment, "after_update", propagate=True)
-def receive_payment_after_update(mapper: Any, connection: Any, target: Payment) -> None:
-    """Audit log for payment updates."""
-    try:
-        session = get_audit_session()
-        try:
-            changes = extract_changes(target)
-            entity_id: Optional[int] = getattr(target, "id", None)
-            user_id: Optional[int] = getattr(target, "updated_by", None)
-            
-            if changes and entity_id is not None:
-                log_audit_event(
-                    session,
-                    entity_type="Payment",
-                    entity_id=entity_id,
-                    action="UPDATE",
-                    changes=changes,
-                    user_id=user_id,
-                )
-                session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Audit log error: {e}")
-        finally:
-            session.close()
-    except Exception as e:
-        print(f"Failed to get audit session: {e}")
+
+def is_audited(model: Any) -> bool:
+    """Whether writes to ``model`` (or an audited base class) belong in the audit trail."""
+    return any(issubclass(model, audited) for audited in AUDITED_MODELS)
+
+
+def row_state(mapper: Mapper, row: Mapping[Any, Any]) -> Dict[str, Any]:
+    """
+    Audited state of a row keyed by column name, e.g. from ``RETURNING``.
+
+    ORM bulk statements bypass the mapper events, so callers build their entries from this.
+    """
+    return {name: serialize_value(row[name]) for name in _audited_attributes_for(mapper).values() if name in row}
+
+
+class SnapshotCounter:
+    """
+    Counts UPDATE entries per entity since its last snapshot and says when the next one is due.
+
+    Counts live in a bounded LRU and cost no queries. An INSERT starts its entity at zero. An
+    entity first seen through an UPDATE (created before this process started, or evicted since)
+    starts at a random count below the interval: its real count is unknown, and a random start
+    keeps the expected gap between snapshots at one interval even if it is evicted again and again.
+    """
+
+    def __init__(self, interval: int, max_entities: int = 10000) -> None:
+        self.interval = interval
+        self.max_entities = max_entities
+        self._counts: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_insert(self, entity_type: str, entity_id: int) -> None:
+        """Start counting a new entity, whose INSERT carries its full state."""
+        if self.interval > 0:
+            self._store((entity_type, entity_id), 0)
+
+    def record_update(self, entity_type: str, entity_id: int) -> bool:
+        """Count one more UPDATE; True when a snapshot should be written now."""
+        if self.interval <= 0:
+            return False
+        key = (entity_type, entity_id)
+        with self._lock:
+            count = self._counts.pop(key, None)
+        if count is None:
+            count = random.randrange(self.interval)
+        count += 1
+        due = count >= self.interval
+        self._store(key, 0 if due else count)
+        return due
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def _store(self, key: Tuple[str, int], count: int) -> None:
+        with self._lock:
+            self._counts.pop(key, None)
+            self._counts[key] = count
+            while len(self._counts) > self.max_entities:
+                self._counts.popitem(last=False)
+
+
+snapshot_counter = SnapshotCounter(interval=settings.AUDIT_SNAPSHOT_INTERVAL)
+
+
+def _queue_for_target(target: Any, action: str, changes: Optional[Dict[str, Any]] = None) -> None:
+    session = object_session(target)
+    entity_id: Optional[int] = getattr(target, "id", None)
+    if session is None or entity_id is None:
+        return
+    user_field = "created_by" if action == "INSERT" else "updated_by"
+    log_audit_event(
+        session,
+        entity_type=sa_inspect(target).mapper.class_.__name__,
+        entity_id=entity_id,
+        action=action,
+        changes=changes,
+        user_id=getattr(target, user_field, None),
+    )
+
+
+def receive_after_insert(mapper: Mapper, connection: Any, target: Any) -> None:
+    """Audit log for creation of any audited model, carrying the full initial state."""
+    state = inserted_state(mapper, connection, target)
+    _queue_for_target(target, "INSERT", {name: {"old": None, "new": value} for name, value in state.items()})
+    snapshot_counter.record_insert(mapper.class_.__name__, target.id)
+
+
+def receive_after_update(mapper: Mapper, connection: Any, target: Any) -> None:
+    """Audit log for updates of any audited model, plus a snapshot every AUDIT_SNAPSHOT_INTERVAL updates."""
+    changes = extract_changes(target)
+    if changes:
+        _queue_for_target(target, "UPDATE", changes)
+        if snapshot_counter.record_update(mapper.class_.__name__, target.id):
+            _queue_for_target(target, SNAPSHOT_ACTION, entity_state(mapper, connection, target))
+
+
+def _register_mapper_listeners() -> None:
+    """Precompute each audited model's column set and attach the generic mapper listeners."""
+    for model in AUDITED_MODELS:
+        mapper = sa_inspect(model)
+        _audited_attributes[mapper] = build_audited_attributes(mapper)
+        if not event.contains(model, "after_insert", receive_after_insert):
+            event.listen(model, "after_insert", receive_after_insert, propagate=True)
+            event.listen(model, "after_update", receive_after_update, propagate=True)
+
+
+class BulkWriteAuditor:
+    """Audit trail of QueryHelper's bulk writes (see :class:`app.core.query_helpers.BulkAuditor`)."""
+
+    snapshot_action = SNAPSHOT_ACTION
+
+    def is_audited(self, model: Type[Any]) -> bool:
+        return is_audited(model)
+
+    def row_state(self, model: Type[Any], row: Mapping[Any, Any]) -> Dict[str, Any]:
+        return row_state(class_mapper(model), row)
+
+    def write(self, db: Session, model: Type[Any], action: str, items: Sequence[AuditItem]) -> None:
+        entries = [
+            build_audit_entry(model.__name__, entity_id, action, changes, user_id)
+            for entity_id, changes, user_id in items
+        ]
+        write_audit_entries(db.connection(), entries)
+
+
+# Mapper listeners and the bulk write auditor are active as soon as this module is imported, as
+# the decorators used to be
+_register_mapper_listeners()
+set_bulk_auditor(BulkWriteAuditor())
 
 
 def register_audit_listeners() -> None:
     """Register all audit event listeners. Call this on application startup."""
-    # Listeners are registered via decorators above
-    # This function can be expanded for additional setup
-    pass
+    _register_mapper_listeners()
+    # The background writer also starts on demand from the first committed entry
+    if settings.AUDIT_WRITE_MODE == "background":
+        audit_writer.start()
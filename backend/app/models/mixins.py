@@ -0,0 +1,65 @@
+"""Shared model mixins."""
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import DateTime, Index, event, text
+from sqlalchemy.orm import Mapped, ORMExecuteState, Session, mapped_column, with_loader_criteria
+
+# Execution option (or session.info key) that disables soft-delete filtering, for admin and audit access:
+#   db.query(User).execution_options(include_deleted=True)
+#   SessionLocal(info={"include_deleted": True})
+INCLUDE_DELETED = "include_deleted"
+
+_ACTIVE_ROWS = text("deleted_at IS NULL")
+_DELETED_ROWS = text("deleted_at IS NOT NULL")
+
+
+def active_rows_index(name: str, *columns: str) -> Index:
+    """Partial index over rows that are not soft-deleted, matching the automatic criteria."""
+    return Index(name, *columns, postgresql_where=_ACTIVE_ROWS, sqlite_where=_ACTIVE_ROWS)
+
+
+def deleted_rows_index(name: str) -> Index:
+    """Partial index on ``deleted_at`` covering only soft-deleted rows (deleted listings and counts)."""
+    return Index(name, "deleted_at", postgresql_where=_DELETED_ROWS, sqlite_where=_DELETED_ROWS)
+
+
+class SoftDeleteMixin:
+    """
+    Soft delete support: rows get a ``deleted_at`` timestamp instead of being removed.
+
+    Every ORM SELECT through a Session hides soft-deleted rows of mapped subclasses
+    automatically (see :func:`_exclude_soft_deleted`), including lazy and eager relationship
+    loads, so queries must not repeat ``deleted_at IS NULL`` by hand.
+    """
+
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=None)
+
+    @property
+    def is_deleted(self) -> bool:
+        """Check if the row is soft-deleted."""
+        return self.deleted_at is not None
+
+
+def _is_active(cls: Any) -> Any:
+    """Loader criteria for one SoftDeleteMixin entity."""
+    return cls.deleted_at.is_(None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_soft_deleted(execute_state: ORMExecuteState) -> None:
+    """Add ``deleted_at IS NULL`` criteria for every SoftDeleteMixin entity in a top-level SELECT."""
+    if (
+        not execute_state.is_select
+        or execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get(INCLUDE_DELETED, False)
+        or execute_state.session.info.get(INCLUDE_DELETED, False)
+    ):
+        return
+    # Relationship and column loads are skipped above: the criteria propagate to them from here
+    execute_state.statement = execute_state.statement.options(
+        # Callables taking the entity class are supported but missing from the stubs' signature
+        with_loader_criteria(SoftDeleteMixin, _is_active, include_aliases=True)  # type: ignore[arg-type]
+    )
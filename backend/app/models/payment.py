@@ -4,10 +4,11 @@ from typing import Any
 
 from sqlalchemy import Boolean, Column, DateTime, CheckConstraint, Index
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Float, ForeignKey, Integer, String
+from sqlalchemy import Float, ForeignKey, Integer, String, text
 from sqlalchemy.orm import relationship
 
 from ..core.database import Base
+from .mixins import SoftDeleteMixin, active_rows_index, deleted_rows_index
 
 
 class PlanType(str, enum.Enum):
@@ -23,25 +24,33 @@ class PaymentStatus(str, enum.Enum):
     REFUNDED = "refunded"
 
 
-class Payment(Base):
+# Rows an idempotency key can be reused against: active payments still awaiting payment
+PENDING_IDEMPOTENCY = text("idempotency_key IS NOT NULL AND status = 'PENDING' AND deleted_at IS NULL")
+
+
+class Payment(SoftDeleteMixin, Base):
     __tablename__ = "payments"
 
     id: Any = Column(Integer, primary_key=True, index=True)
-    user_id: Any = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    stripe_payment_id: Any = Column(String(255), unique=True, nullable=False, index=True)
+    # Full index (migration 001): ON DELETE CASCADE looks up soft-deleted payments too
+    user_id: Any = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    stripe_payment_id: Any = Column(String(255), unique=True, nullable=False)
     amount: Any = Column(Integer, nullable=False)  # Amount in cents for precision
     currency: Any = Column(String(3), default="usd", nullable=False)
-    status: Any = Column(SQLEnum(PaymentStatus), default=PaymentStatus.PENDING, nullable=False, index=True)
+    status: Any = Column(SQLEnum(PaymentStatus), default=PaymentStatus.PENDING, nullable=False)
     plan_type: Any = Column(SQLEnum(PlanType), nullable=False)
     book_title: Any = Column(String(255), nullable=False)
     book_author: Any = Column(String(255), nullable=False)
     pdf_sent: Any = Column(Boolean, default=False, nullable=False)
+    # SHA-256 of the generated report in the artifact store (app.services.artifact_store)
+    report_sha256: Any = Column(String(64), nullable=True)
+    # Client-supplied Idempotency-Key, or one derived from (user, plan, book); see PENDING_IDEMPOTENCY
+    idempotency_key: Any = Column(String(255), nullable=True)
+    # PaymentIntent client secret, returned again when a retried request reuses this pending payment
+    client_secret: Any = Column(String(255), nullable=True)
     created_at: Any = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Any = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-    
-    # Soft delete tracking
-    deleted_at: Any = Column(DateTime, nullable=True, default=None)
-    
+
     # Audit fields
     created_by: Any = Column(Integer, nullable=True)  # User ID who created this record
     updated_by: Any = Column(Integer, nullable=True)  # User ID who last updated this record
@@ -53,12 +62,19 @@ class Payment(Base):
         CheckConstraint("amount > 0", name="ck_payments_amount_positive"),
         CheckConstraint("book_title != ''", name="ck_payments_book_title_not_empty"),
         CheckConstraint("book_author != ''", name="ck_payments_book_author_not_empty"),
-        Index("ix_payments_user_id_created_at", "user_id", "created_at"),
-        Index("ix_payments_status_created_at", "status", "created_at"),
-        Index("ix_payments_deleted_at", "deleted_at"),  # For soft delete queries
+        # Watermark scans of the analytics refresh job
+        Index("ix_payments_updated_at", "updated_at"),
+        # Listings by user or status over active rows; soft-deleted rows never reach these queries
+        active_rows_index("ix_payments_user_id_created_at_active", "user_id", "created_at"),
+        active_rows_index("ix_payments_status_created_at_active", "status", "created_at"),
+        deleted_rows_index("ix_payments_deleted_at"),
+        # One pending payment per user and idempotency key; completed or failed ones free the key
+        Index(
+            "uq_payments_user_id_idempotency_key_pending",
+            "user_id",
+            "idempotency_key",
+            unique=True,
+            postgresql_where=PENDING_IDEMPOTENCY,
+            sqlite_where=PENDING_IDEMPOTENCY,
+        ),
     )
-    
-    @property
-    def is_deleted(self) -> bool:
-        """Check if payment is soft-deleted."""
-        return self.deleted_at is not None
@@ -0,0 +1,210 @@
+"""Per-user payment summary, maintained incrementally from Payment writes.
+
+Mapper listeners turn every payment insert, status/amount change, soft delete, restore and
+hard delete into a delta and apply it to the user's ``user_payment_stats`` row with one
+``INSERT ... ON CONFLICT DO UPDATE`` on the flushing connection, inside the same transaction.
+Only active (not soft-deleted) payments are counted.
+
+Bulk statements bypass mapper events, so the stats rows of the users they touch are recomputed
+with :func:`rebuild_stats` instead: ``QueryHelper.bulk_*`` through the bulk write listener
+registered below, ``AuditService.bulk_*`` through ``PaymentStatsService.rebuild``. Run
+``python manage.py rebuild-payment-stats`` after manual SQL.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Type, Union
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, case, event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapper, Session
+from sqlalchemy.orm.attributes import instance_state
+
+from ..core.database import Base
+from ..core.query_helpers import add_bulk_write_listener
+from .payment import Payment, PaymentStatus
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+_UPSERT_INSERTS: Dict[str, Callable[[Any], Union[postgresql.Insert, sqlite.Insert]]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Attributes whose change can move a payment between buckets
+_TRACKED = ("user_id", "status", "amount", "created_at", "deleted_at")
+
+
+def status_column(status: PaymentStatus) -> str:
+    """Name of the counter column for ``status``."""
+    return f"{status.value}_count"
+
+
+class UserPaymentStats(Base):
+    """Counts per status, completed spend and last purchase of one user's active payments."""
+
+    __tablename__ = "user_payment_stats"
+
+    user_id: Any = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pending_count: Any = Column(Integer, default=0, nullable=False)
+    completed_count: Any = Column(Integer, default=0, nullable=False)
+    failed_count: Any = Column(Integer, default=0, nullable=False)
+    refunded_count: Any = Column(Integer, default=0, nullable=False)
+    # Sum of COMPLETED payment amounts, in cents
+    total_cents: Any = Column(Integer, default=0, nullable=False)
+    # created_at of the newest payment that reached COMPLETED; refunds do not move it back
+    last_purchase_at: Any = Column(DateTime, nullable=True)
+    updated_at: Any = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    @property
+    def total_count(self) -> int:
+        return sum(getattr(self, status_column(status)) for status in PaymentStatus)
+
+
+def _contribution(values: Dict[str, Any], sign: int) -> Dict[str, Any]:
+    """Counter deltas of one payment in state ``values``; nothing for soft-deleted payments."""
+    if values["deleted_at"] is not None or values["status"] is None:
+        return {}
+    status = PaymentStatus(values["status"])
+    delta: Dict[str, Any] = {status_column(status): sign}
+    if status == PaymentStatus.COMPLETED:
+        delta["total_cents"] = sign * (values["amount"] or 0)
+        if sign > 0:
+            delta["last_purchase_at"] = values["created_at"]
+    return delta
+
+
+def apply_delta(connection: Connection, user_id: int, delta: Dict[str, Any]) -> None:
+    """Add ``delta`` to ``user_id``'s stats row, creating it on first use."""
+    counters = {name: value for name, value in delta.items() if name != "last_purchase_at" and value}
+    last_purchase = delta.get("last_purchase_at")
+    if not counters and last_purchase is None:
+        return
+    table = UserPaymentStats.__table__
+    statement = _UPSERT_INSERTS[connection.dialect.name](table).values(
+        user_id=user_id, last_purchase_at=last_purchase, updated_at=datetime.utcnow(), **counters
+    )
+    assignments: Dict[str, Any] = {name: table.c[name] + statement.excluded[name] for name in counters}
+    assignments["last_purchase_at"] = case(
+        (statement.excluded.last_purchase_at.is_(None), table.c.last_purchase_at),
+        (table.c.last_purchase_at.is_(None), statement.excluded.last_purchase_at),
+        (statement.excluded.last_purchase_at > table.c.last_purchase_at, statement.excluded.last_purchase_at),
+        else_=table.c.last_purchase_at,
+    )
+    assignments["updated_at"] = statement.excluded.updated_at
+    connection.execute(statement.on_conflict_do_update(index_elements=["user_id"], set_=assignments))
+
+
+def stats_query(user_ids: Optional[Sequence[int]] = None) -> Any:
+    """SELECT computing stats rows from the payments table, in user_payment_stats column order."""
+    payments = Payment.__table__
+    reached_completion = payments.c.status.in_((PaymentStatus.COMPLETED, PaymentStatus.REFUNDED))
+    columns: List[Any] = [payments.c.user_id]
+    for status in PaymentStatus:
+        columns.append(func.sum(case((payments.c.status == status, 1), else_=0)).label(status_column(status)))
+    columns += [
+        func.sum(case((payments.c.status == PaymentStatus.COMPLETED, payments.c.amount), else_=0)).label("total_cents"),
+        func.max(case((reached_completion, payments.c.created_at))).label("last_purchase_at"),
+        func.max(payments.c.updated_at).label("updated_at"),
+    ]
+    query = select(*columns).where(payments.c.deleted_at.is_(None)).group_by(payments.c.user_id)
+    if user_ids is not None:
+        query = query.where(payments.c.user_id.in_(user_ids))
+    return query
+
+
+def rebuild_stats(connection: Connection, user_ids: Optional[Sequence[int]] = None) -> int:
+    """Replace the stats rows of ``user_ids`` (default: everyone) with ones computed from payments."""
+    table = UserPaymentStats.__table__
+    delete = table.delete()
+    if user_ids is not None:
+        delete = delete.where(table.c.user_id.in_(user_ids))
+    connection.execute(delete)
+
+    query = stats_query(user_ids)
+    columns = [column.name for column in query.selected_columns]
+    return connection.execute(table.insert().from_select(columns, query)).rowcount
+
+
+def payment_owners(db: Session, payment_ids: Sequence[int]) -> Set[int]:
+    """Users owning ``payment_ids``, soft-deleted payments included."""
+    if not payment_ids:
+        return set()
+    payments = Payment.__table__
+    return set(db.execute(select(payments.c.user_id).where(payments.c.id.in_(payment_ids)).distinct()).scalars())
+
+
+def _rebuild_after_bulk_write(
+    db: Session, model: Type[Any], ids: Sequence[Any]
+) -> Optional[Callable[[Sequence[Any]], None]]:
+    """Bulk write listener: rebuild the stats of the users owning the payments before and after the write."""
+    if not issubclass(model, Payment):
+        return None
+    owners = payment_owners(db, ids)
+
+    def rebuild(written: Sequence[Any]) -> None:
+        affected = owners | payment_owners(db, written)
+        if affected:
+            rebuild_stats(db.connection(), sorted(affected))
+
+    return rebuild
+
+
+def _merge(*deltas: Dict[str, Any]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            merged[name] = value if name == "last_purchase_at" else merged.get(name, 0) + value
+    return merged
+
+
+def _current_values(target: Payment) -> Dict[str, Any]:
+    return {key: getattr(target, key) for key in _TRACKED}
+
+
+def _previous_values(target: Payment) -> Optional[Dict[str, Any]]:
+    """Tracked values before this flush, or None when none of them changed."""
+    state = instance_state(target)
+    previous = {}
+    changed = False
+    for key in _TRACKED:
+        history = state.attrs[key].history
+        if history.deleted:
+            previous[key] = history.deleted[0]
+            changed = True
+        else:
+            previous[key] = getattr(target, key)
+    return previous if changed else None
+
+
+def receive_payment_insert(mapper: Mapper, connection: Connection, target: Payment) -> None:
+    apply_delta(connection, target.user_id, _contribution(_current_values(target), 1))
+
+
+def receive_payment_update(mapper: Mapper, connection: Connection, target: Payment) -> None:
+    previous = _previous_values(target)
+    if previous is None:
+        return
+    current = _current_values(target)
+    if previous["user_id"] == current["user_id"]:
+        apply_delta(connection, current["user_id"], _merge(_contribution(previous, -1), _contribution(current, 1)))
+    else:
+        apply_delta(connection, previous["user_id"], _contribution(previous, -1))
+        apply_delta(connection, current["user_id"], _contribution(current, 1))
+
+
+def receive_payment_delete(mapper: Mapper, connection: Connection, target: Payment) -> None:
+    # before_delete: expired attributes can still be loaded from the row
+    apply_delta(connection, target.user_id, _contribution(_current_values(target), -1))
+
+
+def _track_previous_value(target: Payment, value: Any, oldvalue: Any, initiator: Any) -> None:
+    """No-op; registered with active_history so history keeps the old value of expired attributes."""
+
+
+if not event.contains(Payment, "after_insert", receive_payment_insert):
+    add_bulk_write_listener(_rebuild_after_bulk_write)
+    for _key in _TRACKED:
+        event.listen(getattr(Payment, _key), "set", _track_previous_value, active_history=True, propagate=True)
+    event.listen(Payment, "after_insert", receive_payment_insert, propagate=True)
+    event.listen(Payment, "after_update", receive_payment_update, propagate=True)
+    event.listen(Payment, "before_delete", receive_payment_delete, propagate=True)
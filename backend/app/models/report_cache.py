@@ -0,0 +1,30 @@
+"""Index of rendered report PDFs reusable across buyers."""
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column, DateTime, Integer, String
+
+from ..core.database import Base
+
+
+class ReportCacheEntry(Base):
+    """
+    Rendered report for one (book, author, plan, template version), stored in the artifact store.
+
+    Nothing buyer-specific is rendered into a report, so every purchase of the same book and plan
+    can reuse the same PDF. Entries are evicted least recently used first once their total size
+    exceeds REPORT_CACHE_MAX_BYTES, and are not served after REPORT_CACHE_TTL_DAYS. An evicted
+    entry's file lives on only while a payment's download link for it is valid.
+    """
+
+    __tablename__ = "report_cache_entries"
+
+    # SHA-256 of the normalized identity; see ReportCacheService.cache_key
+    cache_key: Any = Column(String(64), primary_key=True)
+    report_sha256: Any = Column(String(64), nullable=False)
+    size_bytes: Any = Column(Integer, nullable=False)
+    hits: Any = Column(Integer, default=0, nullable=False)
+    created_at: Any = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Eviction order
+    last_used_at: Any = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
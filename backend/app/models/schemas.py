@@ -1,6 +1,6 @@
 import re
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 
 from pydantic import BaseModel, EmailStr, field_validator
 
@@ -109,6 +109,26 @@ class PaymentResponse(BaseModel):
         from_attributes = True
 
 
+# Audit Schemas
+class AuditLogResponse(BaseModel):
+    id: int
+    entity_type: str
+    entity_id: int
+    action: str
+    changes: Optional[Any] = None
+    user_id: Optional[int] = None
+    created_at: datetime
+    reason: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
+
 # Report Generation
 class ReportRequest(BaseModel):
     payment_id: int
@@ -0,0 +1,40 @@
+"""Inbox of verified Stripe webhook events, deduplicated on the Stripe event id."""
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from ..core.database import Base
+
+
+class StripeEvent(Base):
+    """
+    One webhook delivery, stored as received before any processing.
+
+    Stripe retries deliveries and may send an event more than once; the primary key on the
+    event id makes every redelivery a no-op. ``processed_at`` stays NULL until the consumer
+    has applied the event.
+    """
+
+    __tablename__ = "stripe_events"
+
+    # Stripe event id (evt_...)
+    id: Any = Column(String(255), primary_key=True)
+    type: Any = Column(String(100), nullable=False)
+    payload: Any = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=False)
+    received_at: Any = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at: Any = Column(DateTime, nullable=True)
+    attempts: Any = Column(Integer, default=0, nullable=False)
+    last_error: Any = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # The consumer's queue: unprocessed events, oldest first
+        Index(
+            "ix_stripe_events_unprocessed",
+            "received_at",
+            postgresql_where=processed_at.is_(None),
+            sqlite_where=processed_at.is_(None),
+        ),
+    )
@@ -1,23 +1,67 @@
-"""Repository pattern for complex database queries with eager loading."""
+"""Repository pattern for complex database queries with eager loading.
 
-from typing import List, Optional
+Lookups on request hot paths run prebuilt ``select()`` statements with bound parameters.
+Building a Query per call costs a new statement object and a full cache-key walk every time;
+a module-level statement is constructed once and only its parameter values change.
+"""
 
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import Select, bindparam, select
 from sqlalchemy.orm import Session, joinedload
 
+from app.core.pagination import MAX_PAGE_SIZE, Page, keyset_paginate
+from app.core.query_helpers import QueryHelper
+from app.models.mixins import INCLUDE_DELETED
 from app.models.payment import Payment, PaymentStatus
 from app.models.user import User
 
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+_PAYMENT_BY_ID = select(Payment).where(Payment.id == bindparam("payment_id")).limit(1)
+_PAYMENT_WITH_USER_BY_ID = _PAYMENT_BY_ID.options(joinedload(Payment.user))
+_PAYMENT_WITH_USER_BY_STRIPE_ID = (
+    select(Payment)
+    .options(joinedload(Payment.user))
+    .where(Payment.stripe_payment_id == bindparam("stripe_payment_id"))
+    .limit(1)
+)
+_PENDING_PAYMENT_BY_IDEMPOTENCY_KEY = (
+    select(Payment)
+    .where(
+        Payment.user_id == bindparam("user_id"),
+        Payment.idempotency_key == bindparam("idempotency_key"),
+        Payment.status == PaymentStatus.PENDING,
+    )
+    .limit(1)
+)
+
+
+E = TypeVar("E")
+
+
+def _first(
+    db: Session, statement: "Select[Tuple[E]]", params: Dict[str, Any], include_deleted: bool = False
+) -> Optional[E]:
+    """First entity of a prebuilt statement; the soft-delete filter still applies at execution."""
+    options = {INCLUDE_DELETED: True} if include_deleted else {}
+    return db.execute(statement, params, execution_options=options).scalars().first()
+
 
 class UserRepository:
     """Repository for User-related queries with eager loading."""
 
+    @staticmethod
+    def get_by_email(db: Session, email: str, include_deleted: bool = False) -> Optional[User]:
+        """Get user by email (excludes soft-deleted unless ``include_deleted``)."""
+        return _first(db, _USER_BY_EMAIL, {"email": email}, include_deleted)
+
     @staticmethod
     def get_user_with_payments(db: Session, user_id: int) -> Optional[User]:
         """Get user with all their payments eagerly loaded (excludes soft-deleted)."""
         return (
             db.query(User)
             .options(joinedload(User.payments))
-            .filter(User.id == user_id, User.deleted_at == None)
+            .filter(User.id == user_id)
             .first()
         )
 
@@ -28,7 +72,7 @@ class UserRepository:
         """Get active users with payments eagerly loaded (excludes soft-deleted)."""
         return (
             db.query(User)
-            .filter(User.is_active == True, User.deleted_at == None)
+            .filter(User.is_active == True)
             .options(joinedload(User.payments))
             .offset(skip)
             .limit(limit)
@@ -41,7 +85,7 @@ class UserRepository:
         return (
             db.query(User)
             .options(joinedload(User.payments))
-            .filter(User.email == email, User.deleted_at == None)
+            .filter(User.email == email)
             .first()
         )
 
@@ -49,15 +93,29 @@ class UserRepository:
 class PaymentRepository:
     """Repository for Payment-related queries with eager loading."""
 
+    # Newest first; matches ix_payments_user_id_created_at_active / ix_payments_status_created_at_active
+    PAGE_ORDER = ((Payment.created_at, True), (Payment.id, True))
+
+    # Columns of PaymentResponse, for projection-based history reads
+    HISTORY_COLUMNS = (
+        Payment.id,
+        Payment.amount,
+        Payment.status,
+        Payment.plan_type,
+        Payment.book_title,
+        Payment.book_author,
+        Payment.created_at,
+    )
+
+    @staticmethod
+    def get_payment(db: Session, payment_id: int) -> Optional[Payment]:
+        """Get payment by ID (excludes soft-deleted)."""
+        return _first(db, _PAYMENT_BY_ID, {"payment_id": payment_id})
+
     @staticmethod
     def get_payment_with_user(db: Session, payment_id: int) -> Optional[Payment]:
         """Get payment with user details eagerly loaded (excludes soft-deleted)."""
-        return (
-            db.query(Payment)
-            .options(joinedload(Payment.user))
-            .filter(Payment.id == payment_id, Payment.deleted_at == None)
-            .first()
-        )
+        return _first(db, _PAYMENT_WITH_USER_BY_ID, {"payment_id": payment_id})
 
     @staticmethod
     def get_user_payments_with_user(
@@ -66,7 +124,7 @@ class PaymentRepository:
         """Get all payments for a user with user details eagerly loaded (excludes soft-deleted)."""
         return (
             db.query(Payment)
-            .filter(Payment.user_id == user_id, Payment.deleted_at == None)
+            .filter(Payment.user_id == user_id)
             .options(joinedload(Payment.user))
             .offset(skip)
             .limit(limit)
@@ -84,7 +142,7 @@ class PaymentRepository:
         """Get user payments filtered by status with user eagerly loaded (excludes soft-deleted)."""
         return (
             db.query(Payment)
-            .filter(Payment.user_id == user_id, Payment.status == status, Payment.deleted_at == None)
+            .filter(Payment.user_id == user_id, Payment.status == status)
             .options(joinedload(Payment.user))
             .offset(skip)
             .limit(limit)
@@ -98,29 +156,87 @@ class PaymentRepository:
         """Get all payments with a specific status (excludes soft-deleted)."""
         return (
             db.query(Payment)
-            .filter(Payment.status == status, Payment.deleted_at == None)
+            .filter(Payment.status == status)
             .options(joinedload(Payment.user))
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    @staticmethod
+    def get_user_payments_page(
+        db: Session,
+        user_id: int,
+        status: Optional[PaymentStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = MAX_PAGE_SIZE,
+    ) -> Page:
+        """Get a keyset page of a user's payments, newest first (excludes soft-deleted)."""
+        query = db.query(Payment).filter(Payment.user_id == user_id)
+        if status:
+            query = query.filter(Payment.status == status)
+        scope = PaymentRepository._user_scope(user_id, status)
+        return keyset_paginate(query, PaymentRepository.PAGE_ORDER, scope, cursor=cursor, limit=limit)
+
+    @staticmethod
+    def get_user_payment_history_page(
+        db: Session,
+        user_id: int,
+        status: Optional[PaymentStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = MAX_PAGE_SIZE,
+    ) -> Page:
+        """
+        Same page as ``get_user_payments_page``, projected to the PaymentResponse fields.
+
+        One narrow SELECT of the response columns; rows become plain dicts without passing
+        through ORM objects or the identity map. Cursors are interchangeable between the two.
+        """
+        query = db.query(*PaymentRepository.HISTORY_COLUMNS).filter(Payment.user_id == user_id)
+        if status:
+            query = query.filter(Payment.status == status)
+        scope = PaymentRepository._user_scope(user_id, status)
+        page = keyset_paginate(query, PaymentRepository.PAGE_ORDER, scope, cursor=cursor, limit=limit)
+        return Page(items=[row._asdict() for row in page.items], next_cursor=page.next_cursor)
+
+    @staticmethod
+    def _user_scope(user_id: int, status: Optional[PaymentStatus]) -> str:
+        scope = f"payments:user:{user_id}"
+        return f"{scope}:{status.value}" if status else scope
+
+    @staticmethod
+    def get_payments_by_status_page(
+        db: Session, status: PaymentStatus, cursor: Optional[str] = None, limit: int = MAX_PAGE_SIZE
+    ) -> Page:
+        """Get a keyset page of payments with a specific status, newest first (excludes soft-deleted)."""
+        query = db.query(Payment).filter(Payment.status == status)
+        return keyset_paginate(
+            query, PaymentRepository.PAGE_ORDER, f"payments:status:{status.value}", cursor=cursor, limit=limit
+        )
+
     @staticmethod
     def get_payment_by_stripe_id(db: Session, stripe_payment_id: str) -> Optional[Payment]:
         """Get payment by Stripe payment ID with user eagerly loaded (excludes soft-deleted)."""
-        return (
-            db.query(Payment)
-            .options(joinedload(Payment.user))
-            .filter(Payment.stripe_payment_id == stripe_payment_id, Payment.deleted_at == None)
-            .first()
-        )
+        return _first(db, _PAYMENT_WITH_USER_BY_STRIPE_ID, {"stripe_payment_id": stripe_payment_id})
+
+    @staticmethod
+    def get_pending_by_idempotency_key(db: Session, user_id: int, idempotency_key: str) -> Optional[Payment]:
+        """Get a user's pending payment created with ``idempotency_key`` (excludes soft-deleted)."""
+        params = {"user_id": user_id, "idempotency_key": idempotency_key}
+        return _first(db, _PENDING_PAYMENT_BY_IDEMPOTENCY_KEY, params)
+
+    @staticmethod
+    def count_by_idempotency_key(db: Session, user_id: int, idempotency_key: str) -> int:
+        """Count a user's payments, in any status and including soft-deleted, created with ``idempotency_key``."""
+        conditions = (Payment.user_id == user_id, Payment.idempotency_key == idempotency_key)
+        return QueryHelper.count_where(db, Payment, *conditions, include_deleted=True)
 
     @staticmethod
     def count_user_payments(
         db: Session, user_id: int, status: Optional[PaymentStatus] = None
     ) -> int:
         """Count user payments, optionally filtered by status (excludes soft-deleted)."""
-        query = db.query(Payment).filter(Payment.user_id == user_id, Payment.deleted_at == None)
+        conditions = [Payment.user_id == user_id]
         if status:
-            query = query.filter(Payment.status == status)
-        return query.count()
+            conditions.append(Payment.status == status)
+        return QueryHelper.count_where(db, Payment, *conditions)
@@ -0,0 +1,204 @@
+import json
+from datetime import date, datetime
+from typing import Any, Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..core.database import get_read_db, read_only_session
+from ..core.pagination import MAX_PAGE_SIZE
+from ..core.query_helpers import QueryHelper
+from ..models.audit import AuditLog
+from ..models.payment import Payment, PaymentStatus, PlanType
+from ..models.schemas import AuditLogPage
+from ..models.user import User
+from ..services.analytics_service import AnalyticsService
+from ..services.audit_service import AuditService
+from ..services.export_service import MEDIA_TYPES, ExportService, SessionFactory
+from ..utils.auth import get_current_admin_user
+
+router = APIRouter(tags=["admin"])
+
+
+def get_export_session_factory() -> SessionFactory:
+    """Sessions for streaming exports; the stream outlives the request-scoped session."""
+    return read_only_session
+
+
+def _export_response(chunks: Iterator[str], fmt: str, name: str) -> StreamingResponse:
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _parse_change_value(value: Optional[str]) -> Any:
+    """Query-string values are JSON when they parse as JSON (numbers, booleans), text otherwise."""
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+@router.get("/stats")
+async def get_stats(
+    exact: bool = False,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Dashboard totals; estimated from planner statistics unless ``exact`` is set."""
+    return {
+        "users": AuditService.count_active(db, User, approximate=not exact),
+        "deleted_users": AuditService.count_deleted(db, User),
+        "payments": AuditService.count_active(db, Payment, approximate=not exact),
+        "deleted_payments": AuditService.count_deleted(db, Payment),
+        "audit_logs": QueryHelper.count(db, AuditLog, approximate=not exact),
+        "approximate": not exact,
+    }
+
+
+@router.get("/analytics/revenue")
+async def get_daily_revenue(
+    since: date,
+    until: date,
+    plan_type: Optional[PlanType] = None,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Daily revenue, refunds and conversion per plan type, served from the rollup table."""
+    if until <= since:
+        raise HTTPException(status_code=400, detail="until must be after since")
+    return AnalyticsService.get_daily_revenue(db, since, until, plan_type=plan_type)
+
+
+@router.get("/audit-logs", response_model=AuditLogPage)
+async def list_recent_audit_logs(
+    days: int = Query(7, ge=1, le=3650),
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Page through recent audit log entries, newest first."""
+    return AuditService.get_recent_audit_logs_page(db, days=days, cursor=cursor, limit=limit)
+
+
+@router.get("/audit-logs/entity/{entity_type}/{entity_id}", response_model=AuditLogPage)
+async def list_entity_audit_logs(
+    entity_type: str,
+    entity_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Page through the audit history of one entity."""
+    return AuditService.get_entity_audit_history_page(
+        db, entity_type, entity_id, cursor=cursor, limit=limit, since=since, until=until
+    )
+
+
+@router.get("/audit-logs/entity/{entity_type}/{entity_id}/as-of")
+async def get_entity_as_of(
+    entity_type: str,
+    entity_id: int,
+    at: datetime,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Reconstruct an entity's audited fields as they were at ``at``."""
+    state = AuditService.get_entity_as_of(db, entity_type, entity_id, at)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"{entity_type} {entity_id} did not exist at {at.isoformat()}")
+    return state
+
+
+@router.get("/audit-logs/actor/{user_id}", response_model=AuditLogPage)
+async def list_actor_audit_logs(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Page through the changes made by one user."""
+    return AuditService.get_user_audit_history_page(db, user_id, cursor=cursor, limit=limit, since=since, until=until)
+
+
+@router.get("/audit-logs/changes", response_model=AuditLogPage)
+async def list_field_changes(
+    field: str,
+    new_value: Optional[str] = None,
+    old_value: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db),
+):
+    """Page through audit entries that changed one field, e.g. ``?field=status&new_value=refunded``."""
+    try:
+        return AuditService.find_changes(
+            db,
+            field,
+            new_value=_parse_change_value(new_value),
+            old_value=_parse_change_value(old_value),
+            entity_type=entity_type,
+            user_id=user_id,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/audit-logs")
+async def export_audit_logs(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    entity_type: Optional[str] = None,
+    admin: User = Depends(get_current_admin_user),
+    session_factory: SessionFactory = Depends(get_export_session_factory),
+):
+    """Stream audit log entries as CSV or NDJSON."""
+    chunks = ExportService.stream_audit_logs(
+        format, since=since, until=until, entity_type=entity_type, session_factory=session_factory
+    )
+    return _export_response(chunks, format, "audit-logs")
+
+
+@router.get("/export/payments")
+async def export_payments(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    status: Optional[PaymentStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_deleted: bool = False,
+    admin: User = Depends(get_current_admin_user),
+    session_factory: SessionFactory = Depends(get_export_session_factory),
+):
+    """Stream payments as CSV or NDJSON."""
+    chunks = ExportService.stream_payments(
+        format,
+        status=status,
+        since=since,
+        until=until,
+        include_deleted=include_deleted,
+        session_factory=session_factory,
+    )
+    return _export_response(chunks, format, "payments")
@@ -12,7 +12,9 @@ from ..core.database import get_db
 from ..core.security import create_access_token, get_password_hash, verify_password
 from ..models.schemas import Token, UserCreate, UserLogin, UserResponse
 from ..models.user import User
-from ..utils.auth import get_current_active_user
+from ..repositories import UserRepository
+from ..services.archive_service import ArchiveService
+from ..utils.auth import get_current_active_reader
 
 router = APIRouter(tags=["authentication"])
 limiter = Limiter(key_func=get_remote_address)
@@ -23,9 +25,9 @@ limiter = Limiter(key_func=get_remote_address)
 async def register(request: Request, user: UserCreate, db: Session = Depends(get_db)):
     """Register a new user with email and password."""
 
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
+    # Check if user already exists (soft-deleted and archived accounts still own their email)
+    existing_user = UserRepository.get_by_email(db, user.email, include_deleted=True)
+    if existing_user or ArchiveService.is_email_archived(db, user.email):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
     # Create new user
@@ -34,7 +36,6 @@ async def register(request: Request, user: UserCreate, db: Session = Depends(get
 
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
 
     return db_user
 
@@ -45,7 +46,7 @@ async def login(request: Request, user: UserLogin, db: Session = Depends(get_db)
     """Login with email and password."""
 
     # Find user
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = UserRepository.get_by_email(db, user.email)
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,7 +88,7 @@ async def login_for_access_token(
 ):
     """OAuth2 compatible token login (for Swagger UI)."""
 
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = UserRepository.get_by_email(db, form_data.username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -117,7 +118,7 @@ async def login_for_access_token(
 
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: User = Depends(get_current_active_reader)):
     """Get current user information."""
     return current_user
 
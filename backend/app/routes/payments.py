@@ -1,34 +1,80 @@
-import os
-from typing import Any, Dict, List
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
 
-import stripe
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..core.config import settings
-from ..core.database import get_db
+from ..core.database import get_db, get_read_db
+from ..core.pagination import MAX_PAGE_SIZE
 from ..models.payment import Payment, PaymentStatus, PlanType
 from ..models.schemas import PaymentCreate, PaymentResponse
 from ..models.user import User
 from ..repositories import PaymentRepository
-from ..services.email_service import EmailService
-from ..services.report_generator import ReportGeneratorService
-from ..utils.auth import get_current_active_user
+from ..services.artifact_store import report_store
+from ..services.payment_stats_service import PaymentStatsService
+from ..services.report_delivery_service import ReportDeliveryService
+from ..services.stripe_client import stripe_client
+from ..services.stripe_webhook_service import StripeWebhookService, stripe_event_consumer
+from ..utils.auth import get_current_active_reader, get_current_active_user
+from ..utils.file_responses import ranged_file_response
 
 router = APIRouter(tags=["payments"])
 
-# Initialize Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 # Pricing (in cents)
 PLAN_PRICES = {PlanType.BASIC: 499, PlanType.DETAILED: 1499, PlanType.PREMIUM: 2999}  # $4.99  # $14.99  # $29.99
 
 
+def _purchase(plan_type: PlanType, book_title: str, book_author: str) -> Tuple[str, str, str]:
+    """What a payment buys, normalized so case and stray whitespace do not make it a new purchase."""
+    return plan_type.value, book_title.strip().lower(), book_author.strip().lower()
+
+
+def _idempotency_key(user_id: int, payment_data: PaymentCreate, supplied: Optional[str]) -> str:
+    """The client's Idempotency-Key, or one derived from the purchase so reloads and double-clicks match."""
+    if supplied:
+        return supplied
+    purchase = _purchase(payment_data.plan_type, payment_data.book_title, payment_data.book_author)
+    return "derived:" + hashlib.sha256("|".join((str(user_id),) + purchase).encode()).hexdigest()
+
+
+def _stripe_idempotency_key(db: Session, user_id: int, key: str) -> str:
+    """
+    Stripe Idempotency-Key for the pending attempt of ``key``.
+
+    Scoped by the number of earlier payments under the same key, so a retry whose local insert
+    was lost (or that raced another request) gets the same intent back from Stripe, while the
+    purchase that follows a completed or failed one gets a new intent.
+    """
+    attempt = PaymentRepository.count_by_idempotency_key(db, user_id, key)
+    return "payment-intent:" + hashlib.sha256(f"{user_id}|{attempt}|{key}".encode()).hexdigest()
+
+
+def _reuse_pending(payment: Payment, payment_data: PaymentCreate) -> Dict[str, Any]:
+    """Response for a retried request: the existing pending payment's intent."""
+    if _purchase(payment.plan_type, payment.book_title, payment.book_author) != _purchase(
+        payment_data.plan_type, payment_data.book_title, payment_data.book_author
+    ):
+        raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different purchase")
+    return {"clientSecret": payment.client_secret, "paymentId": payment.id}
+
+
 @router.post("/create-payment-intent")
 async def create_payment_intent(
-    payment_data: PaymentCreate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)
+    payment_data: PaymentCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
 ):
-    """Create a Stripe payment intent for the selected plan."""
+    """
+    Create a Stripe payment intent for the selected plan.
+
+    Requests are idempotent per user: an ``Idempotency-Key`` header, or by default the plan and
+    book, maps to at most one pending payment, whose client secret is returned again without
+    another Stripe call. Once that payment completes or fails, the key starts a new purchase.
+    """
 
     try:
         # Get price for plan
@@ -36,6 +82,12 @@ async def create_payment_intent(
         if not amount:
             raise HTTPException(status_code=400, detail="Invalid plan type")
 
+        user_id: int = current_user.id  # type: ignore[assignment]
+        key = _idempotency_key(user_id, payment_data, idempotency_key)
+        existing = PaymentRepository.get_pending_by_idempotency_key(db, user_id, key)
+        if existing is not None:
+            return _reuse_pending(existing, payment_data)
+
         # Create Stripe payment intent
         metadata: Dict[str, Any] = {
             "user_id": str(current_user.id),
@@ -44,64 +96,45 @@ async def create_payment_intent(
             "book_title": payment_data.book_title,
             "book_author": payment_data.book_author,
         }
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe_client.create_payment_intent(
             amount=amount,
             currency="usd",
             metadata=metadata,
+            idempotency_key=_stripe_idempotency_key(db, user_id, key),
         )
 
         # Create payment record in database
         db_payment = Payment(
-            user_id=current_user.id,
-            stripe_payment_id=intent.id,
+            user_id=user_id,
+            stripe_payment_id=intent["id"],
             amount=amount,  # Already in cents from PLAN_PRICES
             status=PaymentStatus.PENDING,
             plan_type=payment_data.plan_type,
             book_title=payment_data.book_title,
             book_author=payment_data.book_author,
+            idempotency_key=key,
+            client_secret=intent["client_secret"],
         )
 
         db.add(db_payment)
-        db.commit()
-        db.refresh(db_payment)
-
-        return {"clientSecret": intent.client_secret, "paymentId": db_payment.id}
-
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request with the same key won the unique index; its intent is the one to use
+            db.rollback()
+            existing = PaymentRepository.get_pending_by_idempotency_key(db, user_id, key)
+            if existing is None:
+                raise
+            return _reuse_pending(existing, payment_data)
+
+        return {"clientSecret": intent["client_secret"], "paymentId": db_payment.id}
+
+    except HTTPException:
+        raise
     except Exception as e:  # type: ignore[misc]
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def generate_and_send_report(
-    payment_id: int, user_email: str, book_title: str, book_author: str, plan_type: PlanType, db: Session
-):
-    """Background task to generate report and send via email."""
-
-    try:
-        # Generate PDF report
-        report_service = ReportGeneratorService()
-        pdf_path = report_service.generate_report(book_title, book_author, plan_type)
-
-        # Send email with PDF
-        email_service = EmailService()
-        email_service.send_report_email(
-            to_email=user_email, book_title=book_title, author=book_author, pdf_path=pdf_path, plan_type=plan_type.value
-        )
-
-        # Update payment record
-        payment = db.query(Payment).filter(Payment.id == payment_id).first()
-        if payment:
-            payment.pdf_sent = True
-            db.commit()
-
-        # Clean up PDF file
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-
-    except Exception as e:
-        print(f"Error generating/sending report: {e}")
-        # TODO: Implement retry logic or notification
-
-
 @router.post("/confirm-payment/{payment_id}")
 async def confirm_payment(
     payment_id: int,
@@ -116,48 +149,139 @@ async def confirm_payment(
     if not payment or payment.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Payment not found")
 
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
+    # Usually the webhook consumer has already completed the payment and queued the report
+    if payment.status == PaymentStatus.COMPLETED:
+        return {
+            "status": "success",
+            "message": "Payment confirmed. Your report will be sent to your email shortly.",
+        }
 
-    # Verify payment with Stripe
+    if settings.STRIPE_WEBHOOK_SECRET:
+        # Completion arrives through the payment_intent.succeeded webhook; no Stripe call here
+        if payment.status == PaymentStatus.PENDING:
+            return {
+                "status": "processing",
+                "message": "Payment is being confirmed. Your report will be sent to your email shortly.",
+            }
+        raise HTTPException(status_code=400, detail=f"Payment not completed. Status: {payment.status.value}")
+
+    # Without webhooks, verify payment with Stripe
     try:
-        intent = stripe.PaymentIntent.retrieve(payment.stripe_payment_id)
+        intent = await stripe_client.retrieve_payment_intent(payment.stripe_payment_id)
 
-        if intent.status == "succeeded":
+        if intent["status"] == "succeeded":
             # Update payment status
             payment.status = PaymentStatus.COMPLETED
             db.commit()
 
             # Trigger background task to generate and send report
-            background_tasks.add_task(
-                generate_and_send_report,
-                payment_id=int(payment.id or 0),
-                user_email=str(current_user.email or ""),
-                book_title=str(payment.book_title or ""),
-                book_author=str(payment.book_author or ""),
-                plan_type=payment.plan_type,
-                db=db,
-            )
+            background_tasks.add_task(ReportDeliveryService.deliver, db, int(payment.id or 0))
 
             return {
                 "status": "success",
                 "message": "Payment confirmed. Your report will be sent to your email shortly.",
             }
         else:
-            raise HTTPException(status_code=400, detail=f"Payment not completed. Status: {intent.status}")
+            raise HTTPException(status_code=400, detail=f"Payment not completed. Status: {intent['status']}")
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/webhook")
+async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+    """
+    Receive a Stripe webhook event.
+
+    The event is verified, recorded once per event id and acknowledged straight away;
+    the background consumer applies it to the payment and sends the report.
+    """
+
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Stripe webhooks are not configured")
+
+    event = StripeWebhookService.verify(await request.body(), request.headers.get("Stripe-Signature"))
+    created = StripeWebhookService.record(db, event)
+    db.commit()
+    if created:
+        stripe_event_consumer.notify()
+
+    return {"received": True, "duplicate": not created}
+
+
+def _report_response(request: Request, payment: Payment) -> Response:
+    """The payment's stored report, resumable with Range requests."""
+    if not report_store.exists(payment.report_sha256):
+        raise HTTPException(status_code=404, detail="Report not available")
+    name = re.sub(r"[^A-Za-z0-9]+", "_", payment.book_title).strip("_") or "report"
+    return ranged_file_response(
+        request,
+        report_store.path(payment.report_sha256),
+        etag=payment.report_sha256,
+        media_type="application/pdf",
+        filename=f"{name}_{payment.plan_type.value}_report.pdf",
+        # Stored reports never change; the ETag is their content hash
+        cache_control="private, max-age=86400, immutable",
+    )
+
+
+@router.get("/reports/{token}")
+async def download_report_link(token: str, request: Request, db: Session = Depends(get_read_db)):
+    """Download a report through the signed link from the delivery email; no login needed."""
+
+    payment = ReportDeliveryService.resolve_token(db, token)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Download link is invalid or has expired")
+
+    return _report_response(request, payment)
+
+
+@router.get("/{payment_id}/report")
+async def download_report(
+    payment_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_active_reader),
+    db: Session = Depends(get_read_db),
+):
+    """Download the report of one of the user's completed payments."""
+
+    payment = PaymentRepository.get_payment(db, payment_id)
+    if not payment or payment.user_id != current_user.id or payment.status != PaymentStatus.COMPLETED:
+        raise HTTPException(status_code=404, detail="Payment not found")
+
+    return _report_response(request, payment)
+
+
 @router.get("/history", response_model=List[PaymentResponse])
-async def get_payment_history(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    """Get user's payment history with eager loading."""
+async def get_payment_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Get user's payment history, newest first.
+
+    Results are keyset-paginated: when more payments exist, the ``X-Next-Cursor`` response
+    header carries the cursor to pass back as ``?cursor=`` for the next page.
+    """
+
+    page = PaymentRepository.get_user_payment_history_page(db, current_user.id, cursor=cursor, limit=limit)  # type: ignore[arg-type]
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+
+    return page.items
 
-    # Use repository for optimized query with eager loading
-    payments = PaymentRepository.get_user_payments_with_user(db, current_user.id, skip=0, limit=100)  # type: ignore[arg-type]
 
-    return payments
+@router.get("/stats")
+async def get_payment_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db),
+):
+    """Get the user's payment summary: counts per status, spend in cents and last purchase."""
+
+    return PaymentStatsService.get_for_user(db, current_user.id)  # type: ignore[arg-type]
 
 
 @router.get("/plans")
@@ -0,0 +1,156 @@
+"""Revenue and usage analytics served from daily rollup tables.
+
+``refresh_daily_rollups`` finds the payments updated since the job's watermark, works out which
+creation days they belong to, and recomputes those days' ``payment_daily_rollups`` rows with one
+``INSERT ... SELECT ... GROUP BY``. Reads only touch the rollup table, never ``payments``.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, DateTime, and_, case, func, literal, or_, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.analytics import PaymentDailyRollup
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.services.watermark_service import WatermarkService
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_JOB = "payment_daily_rollups"
+
+# Days recomputed per INSERT ... SELECT
+_DAYS_PER_STATEMENT = 31
+
+
+def _day_range(day: date) -> Any:
+    start = datetime(day.year, day.month, day.day)
+    created_at = Payment.__table__.c.created_at
+    return and_(created_at >= start, created_at < start + timedelta(days=1))
+
+
+class AnalyticsService:
+    """Service for the analytics rollups and their refresh job."""
+
+    @staticmethod
+    def rollup_query(days: Sequence[date]) -> Any:
+        """SELECT computing the rollup rows of ``days`` from active payments."""
+        payments = Payment.__table__
+
+        def count_of(status: PaymentStatus) -> Any:
+            return func.sum(case((payments.c.status == status, 1), else_=0))
+
+        def cents_of(status: PaymentStatus) -> Any:
+            return func.sum(case((payments.c.status == status, payments.c.amount), else_=0))
+
+        day = type_coerce(func.date(payments.c.created_at), Date)
+        return (
+            select(
+                day.label("day"),
+                payments.c.plan_type,
+                func.count().label("payments_count"),
+                count_of(PaymentStatus.PENDING).label("pending_count"),
+                count_of(PaymentStatus.COMPLETED).label("completed_count"),
+                count_of(PaymentStatus.FAILED).label("failed_count"),
+                count_of(PaymentStatus.REFUNDED).label("refunded_count"),
+                cents_of(PaymentStatus.COMPLETED).label("completed_cents"),
+                cents_of(PaymentStatus.REFUNDED).label("refunded_cents"),
+            )
+            .where(payments.c.deleted_at.is_(None), or_(*[_day_range(d) for d in days]))
+            .group_by(day, payments.c.plan_type)
+        )
+
+    @staticmethod
+    def refresh_days(db: Session, days: Sequence[date], now: Optional[datetime] = None) -> None:
+        """Recompute the rollup rows of ``days``; the caller commits."""
+        rollups = PaymentDailyRollup.__table__
+        ordered = sorted(set(days))
+        for start in range(0, len(ordered), _DAYS_PER_STATEMENT):
+            batch = ordered[start : start + _DAYS_PER_STATEMENT]
+            db.execute(rollups.delete().where(rollups.c.day.in_(batch)))
+            refreshed_at = literal(now or datetime.utcnow(), type_=DateTime).label("refreshed_at")
+            query = AnalyticsService.rollup_query(batch).add_columns(refreshed_at)
+            db.execute(rollups.insert().from_select([column.name for column in query.selected_columns], query))
+
+    @staticmethod
+    def refresh_daily_rollups(db: Session, full: bool = False, now: Optional[datetime] = None) -> int:
+        """
+        Bring the daily rollups up to date with payments changed since the last run.
+
+        The scan starts ANALYTICS_WATERMARK_OVERLAP_SECONDS before the watermark, since
+        recomputing a day is idempotent and late-committing transactions are caught that way.
+        Hard deletes do not leave an updated_at behind; run with ``full`` after purges.
+
+        Args:
+            db: Database session
+            full: Recompute every day that has payments, ignoring the watermark
+            now: Reference time, mainly for tests
+
+        Returns:
+            Number of days recomputed
+        """
+        payments = Payment.__table__
+        watermark = None if full else WatermarkService.get(db, ROLLUP_JOB)
+        day = type_coerce(func.date(payments.c.created_at), Date)
+        # Soft-deleted payments are scanned too: deleting one changes its day's totals
+        changed = select(day, func.max(payments.c.updated_at)).group_by(day)
+        if watermark is not None:
+            overlap = timedelta(seconds=settings.ANALYTICS_WATERMARK_OVERLAP_SECONDS)
+            changed = changed.where(payments.c.updated_at > watermark - overlap)
+        rows = db.execute(changed).all()
+
+        days = {row[0] for row in rows}
+        if full:
+            # Days whose payments were all purged still need their rows cleared
+            days.update(db.execute(select(PaymentDailyRollup.day)).scalars())
+        if days:
+            AnalyticsService.refresh_days(db, list(days), now=now)
+        if rows:
+            WatermarkService.advance(db, ROLLUP_JOB, max(row[1] for row in rows))
+        db.commit()
+        logger.info("Refreshed payment rollups for %d day(s)", len(days))
+        return len(days)
+
+    @staticmethod
+    def get_daily_revenue(
+        db: Session,
+        since: date,
+        until: date,
+        plan_type: Optional[PlanType] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Daily revenue, refunds and conversion per plan type between ``since`` and ``until`` (exclusive).
+
+        Args:
+            db: Database session
+            since: First day
+            until: Day after the last day
+            plan_type: Only this plan type
+
+        Returns:
+            One entry per day and plan type, oldest first
+        """
+        query = db.query(PaymentDailyRollup).filter(PaymentDailyRollup.day >= since, PaymentDailyRollup.day < until)
+        if plan_type is not None:
+            query = query.filter(PaymentDailyRollup.plan_type == plan_type)
+        rows = query.order_by(PaymentDailyRollup.day, PaymentDailyRollup.plan_type).all()
+        return [
+            {
+                "day": row.day,
+                "plan_type": row.plan_type,
+                "payments": row.payments_count,
+                "pending": row.pending_count,
+                "completed": row.completed_count,
+                "failed": row.failed_count,
+                "refunded": row.refunded_count,
+                "revenue_cents": row.completed_cents,
+                "refunded_cents": row.refunded_cents,
+                # Share of the day's payments that reached COMPLETED (refunded ones did too)
+                "conversion_rate": (
+                    (row.completed_count + row.refunded_count) / row.payments_count if row.payments_count else 0.0
+                ),
+            }
+            for row in rows
+        ]
@@ -0,0 +1,166 @@
+"""Moves long soft-deleted users and payments out of the hot tables.
+
+Rows soft-deleted for longer than ``SOFT_DELETE_ARCHIVE_GRACE_DAYS`` are copied into the
+``*_archive`` tables with ``INSERT ... SELECT`` and removed with ``DELETE ... RETURNING``, one
+bounded batch per transaction. :meth:`ArchiveService.restore_from_archive` moves them back.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from sqlalchemy import Table, exists, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.models.archive import payments_archive, users_archive
+from app.models.audit_listeners import build_audit_entry, write_audit_entries
+from app.models.payment import Payment
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ACTION = "ARCHIVE"
+UNARCHIVE_ACTION = "UNARCHIVE"
+
+
+class ArchiveConflictError(AppException):
+    """Raised when an archived row cannot be restored because its unique values were reused."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(status_code=409, detail=detail)
+
+
+ARCHIVES: Dict[Type[Any], Table] = {User: users_archive, Payment: payments_archive}
+
+
+def _move_rows(db: Session, source: Table, target: Table, ids: Sequence[int], **extra: Any) -> List[int]:
+    """Copy ``ids`` from ``source`` to ``target`` and delete them from ``source``; returns the moved ids."""
+    columns = [column.name for column in target.columns if column.name in source.c]
+    values: List[Any] = [source.c[name] for name in columns]
+    for name, value in extra.items():
+        columns.append(name)
+        values.append(literal(value, type_=target.c[name].type))
+    db.execute(target.insert().from_select(columns, select(*values).where(source.c.id.in_(ids))))
+    deleted = db.execute(source.delete().where(source.c.id.in_(ids)).returning(source.c.id))
+    return sorted(deleted.scalars())
+
+
+class ArchiveService:
+    """Service for archiving soft-deleted rows and restoring them."""
+
+    @staticmethod
+    def archive_soft_deleted(
+        db: Session,
+        grace_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Archive users and payments soft-deleted before the grace period.
+
+        Payments go first, including the live payments of users being archived, so no archived
+        user leaves rows referencing it behind. Every batch is its own transaction and writes
+        one ARCHIVE audit entry per moved row.
+
+        Args:
+            db: Database session
+            grace_days: Days a soft-deleted row stays in the hot table (SOFT_DELETE_ARCHIVE_GRACE_DAYS)
+            batch_size: Rows moved per transaction (default ARCHIVE_BATCH_SIZE)
+            now: Reference time, mainly for tests
+
+        Returns:
+            Number of archived rows per table
+        """
+        grace_days = settings.SOFT_DELETE_ARCHIVE_GRACE_DAYS if grace_days is None else grace_days
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=grace_days)
+
+        users, payments = User.__table__, Payment.__table__
+        expired_users = select(users.c.id).where(users.c.deleted_at < cutoff)
+        payment_condition = (payments.c.deleted_at < cutoff) | payments.c.user_id.in_(expired_users)
+
+        return {
+            "payments": ArchiveService._archive_batches(db, Payment, payment_condition, batch_size, now),
+            "users": ArchiveService._archive_batches(db, User, users.c.deleted_at < cutoff, batch_size, now),
+        }
+
+    @staticmethod
+    def _archive_batches(db: Session, model: Type[Any], condition: Any, batch_size: int, now: datetime) -> int:
+        source, target = model.__table__, ARCHIVES[model]
+        archived = 0
+        while True:
+            batch = select(source.c.id).where(condition).order_by(source.c.id).limit(batch_size)
+            ids = db.execute(batch).scalars().all()
+            if not ids:
+                return archived
+            moved = _move_rows(db, source, target, ids, archived_at=now)
+            write_audit_entries(
+                db.connection(), [build_audit_entry(model.__name__, row_id, ARCHIVE_ACTION) for row_id in moved]
+            )
+            db.commit()
+            archived += len(moved)
+            logger.info("Archived %d %s rows", len(moved), source.name)
+
+    @staticmethod
+    def is_email_archived(db: Session, email: str) -> bool:
+        """Whether an archived user still holds ``email``."""
+        return bool(db.execute(select(exists().where(users_archive.c.email == email))).scalar())
+
+    @staticmethod
+    def restore_from_archive(db: Session, model: Type[Any], id: int) -> bool:
+        """
+        Move an archived row back into its hot table, still soft-deleted.
+
+        Restoring a user also brings back the payments archived together with it (the ones that
+        were not soft-deleted themselves); restoring a payment brings back its archived user.
+        The caller commits.
+
+        Args:
+            db: Database session
+            model: User or Payment
+            id: Entity ID to restore
+
+        Returns:
+            True if the row was found in the archive
+
+        Raises:
+            ArchiveConflictError: If a live user has taken the archived user's email
+        """
+        target = ARCHIVES.get(model)
+        if target is None:
+            return False
+        row = db.execute(select(target).where(target.c.id == id)).first()
+        if row is None:
+            return False
+
+        if model is Payment:
+            ArchiveService.restore_from_archive(db, User, row.user_id)
+        else:
+            ArchiveService._check_email_free(db, row.email)
+
+        moved = _move_rows(db, target, model.__table__, [id])
+        entries = [build_audit_entry(model.__name__, row_id, UNARCHIVE_ACTION) for row_id in moved]
+        if model is User:
+            payment_ids = (
+                db.execute(
+                    select(payments_archive.c.id).where(
+                        payments_archive.c.user_id == id, payments_archive.c.deleted_at.is_(None)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            if payment_ids:
+                restored = _move_rows(db, payments_archive, Payment.__table__, payment_ids)
+                entries += [build_audit_entry("Payment", row_id, UNARCHIVE_ACTION) for row_id in restored]
+        write_audit_entries(db.connection(), entries)
+        return True
+
+    @staticmethod
+    def _check_email_free(db: Session, email: str) -> None:
+        users = User.__table__
+        if db.execute(select(exists().where(users.c.email == email))).scalar():
+            raise ArchiveConflictError(f"Cannot restore archived user: {email} belongs to another account")
@@ -0,0 +1,78 @@
+"""Content-addressed store for generated report PDFs.
+
+Files live under ``REPORT_ARTIFACT_DIR`` as ``<sha256[:2]>/<sha256>.pdf``. Identical reports
+share one file, stored artifacts never change (so their hash doubles as an ETag), and a file
+is only ever visible once complete: it is hashed while being written to a temporary name in
+the same directory and then renamed into place.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional
+
+from app.core.config import settings
+
+_CHUNK_SIZE = 1024 * 1024
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ArtifactStore:
+    """Local filesystem artifact store."""
+
+    def __init__(self, root: str, suffix: str = ".pdf") -> None:
+        self.root = root
+        self.suffix = suffix
+
+    def path(self, digest: str) -> str:
+        """Location of the artifact with ``digest``; raises ValueError for anything but a sha256 hex digest."""
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid artifact digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest + self.suffix)
+
+    def exists(self, digest: Optional[str]) -> bool:
+        return bool(digest) and os.path.isfile(self.path(digest))  # type: ignore[arg-type]
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def remove(self, digest: str) -> bool:
+        """Delete the artifact with ``digest``; returns False if it was not stored."""
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_file(self, source: str) -> str:
+        """
+        Move ``source`` into the store and return its digest.
+
+        The file is copied in chunks while hashing, so memory use does not grow with its size.
+        If the same content is already stored, the existing file is kept. ``source`` is removed
+        either way.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with open(source, "rb") as src, os.fdopen(handle, "wb") as dst:
+                for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            target = self.path(digest.hexdigest())
+            if os.path.exists(target):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(source)
+        return digest.hexdigest()
+
+
+report_store = ArtifactStore(settings.REPORT_ARTIFACT_DIR)
@@ -0,0 +1,259 @@
+"""Retention and archival of audit_logs.
+
+On PostgreSQL audit_logs is range-partitioned by month (migration 005): expired months are
+exported and their partitions detached and dropped, so retention never issues row-by-row
+DELETEs against the hot table. Rows caught by the default partition are first moved into
+partitions of their own months. SQLite has no partitioning, so the table is kept as a rolling
+window instead: expired rows are exported and deleted in primary-key batches.
+
+Archives are gzip-compressed NDJSON, one file per month (``audit_logs_YYYYMM.ndjson.gz``).
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+
+# Catch-all partition from migration 005, holding rows for months that had no partition yet
+DEFAULT_PARTITION = "audit_logs_default"
+
+
+@dataclass
+class ArchiveResult:
+    """Outcome of one retention run."""
+
+    archived_rows: int = 0
+    files: List[str] = field(default_factory=list)
+    dropped_partitions: List[str] = field(default_factory=list)
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"audit_logs_p{month.year:04d}{month.month:02d}"
+
+
+def archive_path(archive_dir: str, month: datetime) -> str:
+    return os.path.join(archive_dir, f"audit_logs_{month.year:04d}{month.month:02d}.ndjson.gz")
+
+
+def _serialize_row(row: Any) -> str:
+    record: Dict[str, Any] = {}
+    for key, value in row._mapping.items():
+        record[key] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(record, separators=(",", ":"))
+
+
+class AuditRetentionService:
+    """Partition maintenance and archival for the audit log."""
+
+    @staticmethod
+    def is_partitioned(db: Session) -> bool:
+        """Whether audit_logs is a partitioned table (PostgreSQL after migration 005)."""
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        relkind = db.execute(text("SELECT relkind FROM pg_class WHERE relname = 'audit_logs'")).scalar()
+        return relkind == "p"
+
+    @staticmethod
+    def list_partitions(db: Session) -> List[Tuple[str, datetime]]:
+        """Monthly partitions of audit_logs with the month they hold, oldest first."""
+        names = db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'audit_logs'"
+            )
+        ).scalars()
+        partitions = []
+        for name in names:
+            match = _PARTITION_RE.match(name)
+            if match:
+                partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @staticmethod
+    def default_partition_months(db: Session) -> List[datetime]:
+        """Months with rows in the default partition, oldest first."""
+        months = db.execute(text(f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}")).scalars()
+        return sorted(month_start(month) for month in months)
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Create the monthly partitions from the current month through ``months_ahead``.
+
+        Rows that landed in the default partition because their month had no partition yet are
+        moved into newly created partitions for their months. PostgreSQL refuses to create a
+        partition whose range has rows in the default partition, so the default partition is
+        detached, the partitions are created, its rows are reinserted through audit_logs and
+        it is attached again, all in one transaction.
+
+        Args:
+            db: Database session
+            months_ahead: Future months to provision (defaults to AUDIT_PARTITION_MONTHS_AHEAD)
+
+        Returns:
+            Names of the partitions that were created
+        """
+        if not AuditRetentionService.is_partitioned(db):
+            return []
+        months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        existing = {name for name, _ in AuditRetentionService.list_partitions(db)}
+        current = month_start(datetime.utcnow())
+        stranded = AuditRetentionService.default_partition_months(db)
+        wanted = set(stranded) | {add_months(current, offset) for offset in range(months_ahead + 1)}
+
+        if stranded:
+            db.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {DEFAULT_PARTITION}"))
+        created = []
+        for month in sorted(wanted):
+            name = partition_name(month)
+            if name in existing:
+                continue
+            db.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF audit_logs "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                )
+            )
+            created.append(name)
+        if stranded:
+            columns = ", ".join(col.name for col in AuditLog.__table__.columns)
+            db.execute(text(f"INSERT INTO audit_logs ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION}"))
+            db.execute(text(f"DELETE FROM {DEFAULT_PARTITION}"))
+            db.execute(text(f"ALTER TABLE audit_logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+            logger.info("Moved audit rows of %d month(s) out of %s", len(stranded), DEFAULT_PARTITION)
+        db.commit()
+        return created
+
+    @staticmethod
+    def archive_expired(
+        db: Session,
+        retention_days: Optional[int] = None,
+        archive_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> ArchiveResult:
+        """
+        Export audit entries older than the retention window and remove them from the hot table.
+
+        Args:
+            db: Database session
+            retention_days: Days of audit history kept online (defaults to AUDIT_RETENTION_DAYS)
+            archive_dir: Directory for the NDJSON archives (defaults to AUDIT_ARCHIVE_DIR)
+            batch_size: Rows read (and, on SQLite, deleted) per round trip
+            now: Reference time, mainly for tests
+
+        Returns:
+            Summary of what was archived
+        """
+        retention_days = settings.AUDIT_RETENTION_DAYS if retention_days is None else retention_days
+        archive_dir = archive_dir or settings.AUDIT_ARCHIVE_DIR
+        batch_size = batch_size or settings.AUDIT_ARCHIVE_BATCH_SIZE
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        os.makedirs(archive_dir, exist_ok=True)
+
+        if AuditRetentionService.is_partitioned(db):
+            # Give rows stranded in the default partition a monthly partition, so they expire too
+            AuditRetentionService.ensure_partitions(db)
+            return AuditRetentionService._archive_partitions(db, cutoff, archive_dir, batch_size)
+        return AuditRetentionService._archive_rolling(db, cutoff, archive_dir, batch_size)
+
+    @staticmethod
+    def _archive_partitions(db: Session, cutoff: datetime, archive_dir: str, batch_size: int) -> ArchiveResult:
+        # Only whole months are dropped; a partially expired month waits for the next run
+        result = ArchiveResult()
+        for name, month in AuditRetentionService.list_partitions(db):
+            if add_months(month, 1) > cutoff:
+                break
+            partition = table(name, *[column(col.name) for col in AuditLog.__table__.columns])
+            path = archive_path(archive_dir, month)
+            tmp_path = path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as archive:
+                for rows in AuditRetentionService._batches(db, partition, None, batch_size):
+                    archive.writelines(_serialize_row(row) + "\n" for row in rows)
+                    result.archived_rows += len(rows)
+            os.replace(tmp_path, path)
+
+            db.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            result.files.append(path)
+            result.dropped_partitions.append(name)
+            logger.info("Archived audit partition %s to %s", name, path)
+        return result
+
+    @staticmethod
+    def _archive_rolling(db: Session, cutoff: datetime, archive_dir: str, batch_size: int) -> ArchiveResult:
+        result = ArchiveResult()
+        audit_table = AuditLog.__table__
+        oldest = db.execute(select(audit_table.c.created_at).order_by(audit_table.c.created_at).limit(1)).scalar()
+        if oldest is None or oldest >= cutoff:
+            return result
+
+        month = month_start(oldest)
+        while month < cutoff:
+            window_end = min(add_months(month, 1), cutoff)
+            window = (audit_table.c.created_at >= month, audit_table.c.created_at < window_end)
+            path = archive_path(archive_dir, month)
+            written = 0
+            archive = None
+            try:
+                for rows in AuditRetentionService._batches(db, audit_table, window, batch_size):
+                    if archive is None:
+                        # Appending adds a gzip member, so a month split across runs stays one file
+                        archive = gzip.open(path, "at", encoding="utf-8")
+                    archive.writelines(_serialize_row(row) + "\n" for row in rows)
+                    archive.flush()
+                    db.execute(audit_table.delete().where(audit_table.c.id.in_([row.id for row in rows])))
+                    db.commit()
+                    written += len(rows)
+            finally:
+                if archive is not None:
+                    archive.close()
+            if written:
+                result.archived_rows += written
+                result.files.append(path)
+            month = add_months(month, 1)
+        return result
+
+    @staticmethod
+    def _batches(
+        db: Session, source: Any, conditions: Optional[Tuple[Any, ...]], batch_size: int
+    ) -> Iterator[List[Any]]:
+        """Yield rows of ``source`` in primary-key order, one keyset batch at a time."""
+        last_id = None
+        while True:
+            query = select(*source.c)
+            if conditions:
+                query = query.where(*conditions)
+            if last_id is not None:
+                query = query.where(source.c.id > last_id)
+            rows = list(db.execute(query.order_by(source.c.id).limit(batch_size)).all())
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
@@ -1,7 +1,5 @@
-import base64
-
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Attachment, Disposition, FileContent, FileName, FileType, Mail
+from sendgrid.helpers.mail import Mail
 
 from ..core.config import settings
 
@@ -14,23 +12,8 @@ class EmailService:
         self.client = SendGridAPIClient(settings.SENDGRID_API_KEY)
         self.from_email = settings.FROM_EMAIL
 
-    def send_report_email(self, to_email: str, book_title: str, author: str, pdf_path: str, plan_type: str):
-        """Sends the generated report PDF to the user's email."""
-
-        # Read PDF file
-        with open(pdf_path, "rb") as f:
-            pdf_data = f.read()
-
-        # Encode PDF to base64
-        encoded_file = base64.b64encode(pdf_data).decode()
-
-        # Create attachment
-        attached_file = Attachment(
-            FileContent(encoded_file),
-            FileName(f"{book_title.replace(' ', '_')}_report.pdf"),
-            FileType("application/pdf"),
-            Disposition("attachment"),
-        )
+    def send_report_email(self, to_email: str, book_title: str, author: str, download_url: str, plan_type: str):
+        """Sends the user a signed download link to their report (no attachment, so the email stays small)."""
 
         # Create email
         message = Mail(
@@ -54,7 +37,14 @@ class EmailService:
                             <p style="margin: 5px 0; color: #7f8c8d;">by {author}</p>
                         </div>
                         
-                        <p>Your comprehensive report is attached to this email as a PDF document.</p>
+                        <p>Your comprehensive report is ready to download as a PDF document:</p>
+
+                        <p style="margin: 25px 0;">
+                            <a href="{download_url}" style="background-color: #3498db; color: #fff; padding: 12px 24px; text-decoration: none; border-radius: 4px;">Download your report</a>
+                        </p>
+                        <p style="color: #7f8c8d; font-size: 14px;">
+                            This link stays valid for {settings.REPORT_LINK_TTL_HOURS // 24} days.
+                        </p>
                         
                         <p style="margin-top: 30px;">
                             <strong>What's included in your report:</strong>
@@ -81,9 +71,6 @@ class EmailService:
             """,
         )
 
-        # Attach PDF
-        message.attachment = attached_file
-
         # Send email
         try:
             response = self.client.send(message)
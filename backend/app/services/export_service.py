@@ -0,0 +1,203 @@
+"""Streaming CSV/NDJSON exports of audit logs and payments.
+
+Exports select plain columns (no ORM hydration) with ``stream_results``/``yield_per``, which
+makes PostgreSQL use a server-side cursor, and render one chunk of rows at a time. Memory use
+therefore depends on the chunk size, not on the number of exported rows.
+"""
+
+import csv
+import enum
+import io
+import json
+from contextlib import AbstractContextManager
+from datetime import date, datetime
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Table, select
+
+from app.core.database import read_only_session
+from app.models.audit import AuditLog
+from app.models.payment import Payment, PaymentStatus
+
+SessionFactory = Callable[[], AbstractContextManager]
+
+EXPORT_FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+DEFAULT_CHUNK_ROWS = 1000
+
+# Exported payment columns; an allow-list so secrets (client_secret, idempotency_key) and columns
+# added later stay out of exports until they are listed here
+PAYMENT_EXPORT_COLUMNS = (
+    "id",
+    "user_id",
+    "stripe_payment_id",
+    "amount",
+    "currency",
+    "status",
+    "plan_type",
+    "book_title",
+    "book_author",
+    "pdf_sent",
+    "report_sha256",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+    "created_by",
+    "updated_by",
+)
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    value = _json_value(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _render_csv(columns: List[str], rows: Sequence[Any], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _render_ndjson(columns: List[str], rows: Sequence[Any]) -> str:
+    lines = (
+        json.dumps({name: _json_value(value) for name, value in zip(columns, row)}, separators=(",", ":"))
+        for row in rows
+    )
+    return "".join(line + "\n" for line in lines)
+
+
+class ExportService:
+    """Service for streaming bulk exports."""
+
+    @staticmethod
+    def stream_table(
+        table: Table,
+        conditions: Sequence[Any],
+        fmt: str,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        session_factory: SessionFactory = read_only_session,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Yield ``table`` rows matching ``conditions`` as CSV or NDJSON text chunks, in id order.
+
+        The generator opens its own (read-only) session, so it can outlive the request that
+        created it, and closes it when exhausted or when the client disconnects.
+
+        Args:
+            table: Table to export
+            conditions: WHERE clauses
+            fmt: "csv" or "ndjson"
+            chunk_rows: Rows fetched from the cursor and rendered per chunk
+            session_factory: Context manager factory providing the session
+            columns: Names of the exported columns (default: all of them)
+
+        Raises:
+            ValueError: If ``fmt`` is not a supported format
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt!r}")
+        selected = [table.c[name] for name in columns] if columns is not None else list(table.columns)
+        names = [column.name for column in selected]
+        query = (
+            select(*selected)
+            .where(*conditions)
+            .order_by(table.c.id)
+            .execution_options(stream_results=True, yield_per=chunk_rows)
+        )
+
+        render: Callable[[List[str], Sequence[Any]], str] = _render_ndjson
+        if fmt == "csv":
+            render = _render_csv
+
+        def generate() -> Iterator[str]:
+            with session_factory() as db:
+                if fmt == "csv":
+                    yield _render_csv(names, [], header=True)
+                result = db.execute(query)
+                try:
+                    for rows in result.partitions():
+                        yield render(names, rows)
+                finally:
+                    result.close()
+
+        return generate()
+
+    @staticmethod
+    def stream_audit_logs(
+        fmt: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        entity_type: Optional[str] = None,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        session_factory: SessionFactory = read_only_session,
+    ) -> Iterator[str]:
+        """
+        Stream audit log entries, optionally restricted to a created_at window and entity type.
+
+        Args:
+            fmt: "csv" or "ndjson"
+            since: Only entries created at or after this time
+            until: Only entries created before this time
+            entity_type: Type of entity (e.g., "User", "Payment")
+            chunk_rows: Rows fetched and rendered per chunk
+            session_factory: Context manager factory providing the session
+        """
+        table = AuditLog.__table__
+        conditions = []
+        if since is not None:
+            conditions.append(table.c.created_at >= since)
+        if until is not None:
+            conditions.append(table.c.created_at < until)
+        if entity_type is not None:
+            conditions.append(table.c.entity_type == entity_type)
+        return ExportService.stream_table(table, conditions, fmt, chunk_rows, session_factory)
+
+    @staticmethod
+    def stream_payments(
+        fmt: str,
+        status: Optional[PaymentStatus] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        include_deleted: bool = False,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        session_factory: SessionFactory = read_only_session,
+    ) -> Iterator[str]:
+        """
+        Stream the PAYMENT_EXPORT_COLUMNS of payments, optionally filtered by status and created_at window.
+
+        Args:
+            fmt: "csv" or "ndjson"
+            status: Only payments in this status
+            since: Only payments created at or after this time
+            until: Only payments created before this time
+            include_deleted: Also export soft-deleted payments
+            chunk_rows: Rows fetched and rendered per chunk
+            session_factory: Context manager factory providing the session
+        """
+        table = Payment.__table__
+        conditions = []
+        if status is not None:
+            conditions.append(table.c.status == status)
+        if since is not None:
+            conditions.append(table.c.created_at >= since)
+        if until is not None:
+            conditions.append(table.c.created_at < until)
+        if not include_deleted:
+            conditions.append(table.c.deleted_at.is_(None))
+        return ExportService.stream_table(
+            table, conditions, fmt, chunk_rows, session_factory, columns=PAYMENT_EXPORT_COLUMNS
+        )
@@ -0,0 +1,56 @@
+"""Reads and repairs of the per-user payment summary."""
+
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.models.payment import PaymentStatus
+from app.models.payment_stats import UserPaymentStats, rebuild_stats, status_column
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentStatsService:
+    """Service for the incrementally maintained user_payment_stats table."""
+
+    @staticmethod
+    def get_for_user(db: Session, user_id: int) -> Dict[str, Any]:
+        """
+        Summary of a user's active payments, read from their single stats row.
+
+        Args:
+            db: Database session
+            user_id: User ID
+
+        Returns:
+            Counts per status, total, completed spend in cents and last purchase time
+        """
+        stats = db.get(UserPaymentStats, user_id)
+        summary: Dict[str, Any] = {status.value: 0 for status in PaymentStatus}
+        summary.update(total=0, total_cents=0, last_purchase_at=None)
+        if stats is not None:
+            summary.update({status.value: getattr(stats, status_column(status)) for status in PaymentStatus})
+            summary.update(
+                total=stats.total_count, total_cents=stats.total_cents, last_purchase_at=stats.last_purchase_at
+            )
+        return summary
+
+    @staticmethod
+    def rebuild(db: Session, user_ids: Optional[Sequence[int]] = None) -> int:
+        """
+        Recompute stats rows from the payments table, repairing any drift, and commit.
+
+        Needed after bulk statements, which bypass the incremental listeners, or manual SQL.
+
+        Args:
+            db: Database session
+            user_ids: Only rebuild these users (default: everyone)
+
+        Returns:
+            Number of stats rows written
+        """
+        rebuilt = rebuild_stats(db.connection(), user_ids)
+        db.commit()
+        logger.info("Rebuilt %d user payment stats rows", rebuilt)
+        return rebuilt
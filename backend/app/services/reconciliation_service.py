@@ -0,0 +1,169 @@
+"""Reconciliation of local payments against Stripe's PaymentIntent list.
+
+Instead of one ``PaymentIntent.retrieve`` per stale row, the job pages through Stripe's list
+API one creation window at a time (100 intents per call), matches each page against
+``payments.stripe_payment_id`` with a single ``IN`` query and applies status changes in one
+flush per page. The ``job_watermarks`` row advances after every window, so an interrupted run
+resumes where it stopped.
+"""
+
+import calendar
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.payment import Payment, PaymentStatus
+from app.services.stripe_client import StripeClient, stripe_client
+from app.services.stripe_webhook_service import TRANSITIONS
+from app.services.watermark_service import WatermarkService
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_JOB = "stripe_reconciliation"
+
+# PaymentIntent status -> webhook event type whose transition it implies
+_INTENT_EVENTS = {"succeeded": "payment_intent.succeeded", "canceled": "payment_intent.canceled"}
+
+_PAGE_SIZE = 100
+
+
+@dataclass
+class ReconcileResult:
+    """Outcome of one reconciliation run."""
+
+    windows: int = 0
+    api_calls: int = 0
+    intents: int = 0
+    updated: int = 0
+    completed_payment_ids: List[int] = field(default_factory=list)
+
+
+def _unix(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+class ReconciliationService:
+    """Service bringing payment statuses in line with Stripe."""
+
+    @staticmethod
+    def window_start(db: Session, now: datetime, full: bool = False) -> datetime:
+        """
+        Creation time the next run starts from.
+
+        That is the watermark (minus RECONCILE_OVERLAP_SECONDS for clock skew), moved back to the
+        oldest payment still PENDING, and never earlier than RECONCILE_LOOKBACK_DAYS ago. Only
+        PENDING payments younger than RECONCILE_PENDING_MAX_AGE_HOURS count, so abandoned checkouts
+        do not pin every run to the lookback. Without a watermark only the PENDING payments bound
+        the window; ``full`` scans the whole lookback.
+        """
+        lookback = now - timedelta(days=settings.RECONCILE_LOOKBACK_DAYS)
+        if full:
+            return lookback
+        overlap = timedelta(seconds=settings.RECONCILE_OVERLAP_SECONDS)
+        watermark = WatermarkService.get(db, RECONCILE_JOB)
+        candidates = [now] if watermark is None else [watermark - overlap]
+        pending_since = max(lookback, now - timedelta(hours=settings.RECONCILE_PENDING_MAX_AGE_HOURS))
+        oldest_pending = db.execute(
+            select(func.min(Payment.created_at)).where(
+                Payment.status == PaymentStatus.PENDING, Payment.created_at >= pending_since
+            )
+        ).scalar()
+        if oldest_pending is not None:
+            candidates.append(oldest_pending - overlap)
+        return max(lookback, min(candidates))
+
+    @staticmethod
+    def apply_page(db: Session, intents: Sequence[Dict[str, Any]]) -> List[Payment]:
+        """
+        Apply the final statuses of one page of intents with one lookup query; the caller commits.
+
+        Returns:
+            Payments whose status changed
+        """
+        final = {
+            intent["id"]: _INTENT_EVENTS[intent["status"]] for intent in intents if intent["status"] in _INTENT_EVENTS
+        }
+        if not final:
+            return []
+        changed = []
+        for payment in db.execute(select(Payment).where(Payment.stripe_payment_id.in_(final))).scalars():
+            status, allowed = TRANSITIONS[final[payment.stripe_payment_id]]
+            if payment.status in allowed:
+                payment.status = status
+                changed.append(payment)
+        db.flush()
+        return changed
+
+    @staticmethod
+    async def reconcile(
+        db: Session,
+        client: Optional[StripeClient] = None,
+        now: Optional[datetime] = None,
+        full: bool = False,
+        on_window: Optional[Callable[[List[int]], None]] = None,
+    ) -> ReconcileResult:
+        """
+        Reconcile payments created since the window start (see :meth:`window_start`) up to now.
+
+        Windows of RECONCILE_WINDOW_HOURS are processed oldest first; each is committed together
+        with the watermark advancing to its end.
+
+        Args:
+            db: Database session
+            client: Stripe client (default: the shared one)
+            now: Reference time, mainly for tests
+            full: Ignore the watermark and scan the whole lookback period
+            on_window: Called after each window is committed with the payments it COMPLETED
+
+        Returns:
+            Windows, API calls and intents scanned, payments updated and the ones newly COMPLETED
+        """
+        client = client or stripe_client
+        now = now or datetime.utcnow()
+        step = timedelta(hours=settings.RECONCILE_WINDOW_HOURS)
+        result = ReconcileResult()
+
+        start = ReconciliationService.window_start(db, now, full=full)
+        while start < now:
+            end = min(start + step, now)
+            starting_after = None
+            completed: List[int] = []
+            while True:
+                page = await client.list_payment_intents(
+                    _unix(start), _unix(end), limit=_PAGE_SIZE, starting_after=starting_after
+                )
+                result.api_calls += 1
+                intents = page.get("data", [])
+                result.intents += len(intents)
+                for payment in ReconciliationService.apply_page(db, intents):
+                    result.updated += 1
+                    if payment.status == PaymentStatus.COMPLETED:
+                        completed.append(payment.id)
+                if not page.get("has_more") or not intents:
+                    break
+                starting_after = intents[-1]["id"]
+            WatermarkService.advance(db, RECONCILE_JOB, end)
+            db.commit()
+            result.windows += 1
+            result.completed_payment_ids.extend(completed)
+            if on_window is not None and completed:
+                on_window(completed)
+            start = end
+        if result.windows == 0:
+            # Nothing to scan yet; later runs start from here
+            WatermarkService.advance(db, RECONCILE_JOB, now)
+            db.commit()
+
+        logger.info(
+            "Reconciled %d intent(s) in %d window(s) with %d API call(s); %d payment(s) updated",
+            result.intents,
+            result.windows,
+            result.api_calls,
+            result.updated,
+        )
+        return result
@@ -0,0 +1,247 @@
+"""Reuse of rendered report PDFs across buyers.
+
+A report depends only on the book, the author, the plan and the report template, never on the
+buyer, so the first purchase of a book renders it and later purchases point their payment at the
+same artifact: one primary-key lookup instead of a dozen LLM calls and a reportlab layout.
+Entries expire after REPORT_CACHE_TTL_DAYS so content is refreshed now and then, and the least
+recently used ones are evicted once the cached PDFs take more than REPORT_CACHE_MAX_BYTES.
+
+Payments pin their report only while their download link is valid: once REPORT_LINK_TTL_HOURS
+have passed since delivery, eviction clears ``report_sha256`` and deletes files nothing else uses,
+so disk usage stays within the cache budget plus the reports of recent deliveries. A later
+redelivery renders (or reuses) the report again.
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set, Union, cast
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.mixins import INCLUDE_DELETED
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.report_cache import ReportCacheEntry
+from app.services.artifact_store import ArtifactStore, report_store
+from app.services.report_generator import TEMPLATE_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+_UPSERT_INSERTS: Dict[str, Callable[[Any], Union[postgresql.Insert, sqlite.Insert]]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+@dataclass
+class EvictionResult:
+    """Outcome of one eviction pass."""
+
+    entries: int = 0
+    payments: int = 0
+    files: int = 0
+    freed_bytes: int = 0
+
+
+def _normalize(value: str) -> str:
+    """Case-, width- and whitespace-insensitive form of a title or author name."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", value)).strip().casefold()
+
+
+def _release(db: Session, store: ArtifactStore, digests: Set[str]) -> Set[str]:
+    """Delete the files of ``digests`` no payment (even soft-deleted) or cache entry uses; returns those deleted."""
+    db.flush()
+    in_use = set(
+        db.execute(
+            select(Payment.report_sha256)
+            .where(Payment.report_sha256.in_(digests))
+            .execution_options(**{INCLUDE_DELETED: True})
+        ).scalars()
+    )
+    in_use.update(
+        db.execute(select(ReportCacheEntry.report_sha256).where(ReportCacheEntry.report_sha256.in_(digests))).scalars()
+    )
+    return {digest for digest in digests - in_use if store.remove(digest)}
+
+
+class ReportCacheService:
+    """Service for the rendered report cache."""
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.REPORT_CACHE_MAX_BYTES > 0
+
+    @staticmethod
+    def cache_key(book: str, author: str, plan_type: PlanType, template_version: int = TEMPLATE_VERSION) -> str:
+        """Cache key of a report: "Dune" by "frank  herbert" shares the entry of "DUNE" by "Frank Herbert"."""
+        identity = "\x1f".join((str(template_version), plan_type.value, _normalize(book), _normalize(author)))
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    @staticmethod
+    def lookup(
+        db: Session,
+        book: str,
+        author: str,
+        plan_type: PlanType,
+        store: ArtifactStore = report_store,
+        now: Optional[datetime] = None,
+    ) -> Optional[str]:
+        """
+        Digest of a fresh cached report, recording the hit; the caller commits.
+
+        Returns:
+            Artifact digest, or None on a miss (no entry, expired, or its file is gone)
+        """
+        if not ReportCacheService.enabled():
+            return None
+        now = now or datetime.utcnow()
+        entry = db.get(ReportCacheEntry, ReportCacheService.cache_key(book, author, plan_type))
+        if entry is None:
+            return None
+        if entry.created_at < now - timedelta(days=settings.REPORT_CACHE_TTL_DAYS) or not store.exists(
+            entry.report_sha256
+        ):
+            # Stale; the next store() replaces the entry
+            return None
+        entry.hits += 1
+        entry.last_used_at = now
+        return cast(str, entry.report_sha256)
+
+    @staticmethod
+    def store(
+        db: Session,
+        book: str,
+        author: str,
+        plan_type: PlanType,
+        digest: str,
+        store: ArtifactStore = report_store,
+        now: Optional[datetime] = None,
+    ) -> None:
+        """
+        Cache a freshly rendered report, replacing any stale entry, then evict down to the budget.
+
+        Concurrent renders of the same book resolve to whichever stored last. The caller commits.
+        """
+        if not ReportCacheService.enabled():
+            return
+        now = now or datetime.utcnow()
+        key = ReportCacheService.cache_key(book, author, plan_type)
+        replaced = db.execute(select(ReportCacheEntry.report_sha256).where(ReportCacheEntry.cache_key == key)).scalar()
+        values = dict(report_sha256=digest, size_bytes=store.size(digest), created_at=now, last_used_at=now)
+        insert = _UPSERT_INSERTS[db.get_bind().dialect.name](ReportCacheEntry.__table__)
+        db.execute(
+            insert.values(cache_key=key, hits=0, **values).on_conflict_do_update(
+                index_elements=["cache_key"], set_={**values, "hits": 0}
+            )
+        )
+        if replaced is not None and replaced != digest:
+            _release(db, store, {replaced})
+        ReportCacheService.evict(db, store=store, now=now)
+
+    @staticmethod
+    def expire_payment_reports(db: Session, now: Optional[datetime] = None) -> Dict[int, str]:
+        """
+        Unpin the reports of payments whose download link has expired; the caller commits.
+
+        A payment keeps its report for REPORT_LINK_TTL_HOURS after its last update, which for a
+        delivered payment is the delivery that issued the link. Payments still awaiting delivery
+        keep theirs. Soft-deleted payments are included.
+
+        Returns:
+            Digest each unpinned payment referenced, by payment id
+        """
+        link_issued_before = (now or datetime.utcnow()) - timedelta(hours=settings.REPORT_LINK_TTL_HOURS)
+        expired = list(
+            db.execute(
+                select(Payment)
+                .where(
+                    Payment.report_sha256.is_not(None),
+                    Payment.updated_at < link_issued_before,
+                    or_(Payment.pdf_sent.is_(True), Payment.status != PaymentStatus.COMPLETED),
+                )
+                .execution_options(**{INCLUDE_DELETED: True})
+            ).scalars()
+        )
+        unpinned = {payment.id: payment.report_sha256 for payment in expired}
+        for payment in expired:
+            payment.report_sha256 = None
+        return unpinned
+
+    @staticmethod
+    def evict(
+        db: Session,
+        max_bytes: Optional[int] = None,
+        store: ArtifactStore = report_store,
+        now: Optional[datetime] = None,
+    ) -> EvictionResult:
+        """
+        Drop expired entries, then least recently used ones until the cache fits ``max_bytes``.
+
+        Payments whose download link has expired release their report first (see
+        :meth:`expire_payment_reports`). A file is deleted once neither a payment (including
+        soft-deleted ones) nor an entry uses it. The caller commits.
+
+        Args:
+            db: Database session
+            max_bytes: Size budget (default: REPORT_CACHE_MAX_BYTES)
+            store: Artifact store holding the reports
+            now: Reference time, mainly for tests
+
+        Returns:
+            Entries dropped, payments unpinned, files deleted and bytes freed
+        """
+        max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        now = now or datetime.utcnow()
+        expired_before = now - timedelta(days=settings.REPORT_CACHE_TTL_DAYS)
+        # Write pending hits before entries are read back below
+        db.flush()
+        unpinned = ReportCacheService.expire_payment_reports(db, now=now)
+
+        fresh = ReportCacheEntry.created_at >= expired_before
+        # populate_existing: store() may just have overwritten a row this session already loaded
+        victims = list(
+            db.execute(select(ReportCacheEntry).where(~fresh).execution_options(populate_existing=True)).scalars()
+        )
+        total = db.execute(select(func.coalesce(func.sum(ReportCacheEntry.size_bytes), 0)).where(fresh)).scalar_one()
+        if total > max_bytes:
+            least_recent = select(ReportCacheEntry).where(fresh).order_by(ReportCacheEntry.last_used_at)
+            for entry in db.execute(least_recent.execution_options(populate_existing=True)).scalars():
+                if total <= max_bytes:
+                    break
+                victims.append(entry)
+                total -= entry.size_bytes
+        if not victims and not unpinned:
+            return EvictionResult()
+
+        db.execute(
+            delete(ReportCacheEntry)
+            .where(ReportCacheEntry.cache_key.in_([entry.cache_key for entry in victims]))
+            .execution_options(synchronize_session=False)
+        )
+        for entry in victims:
+            db.expunge(entry)
+        sizes = {digest: store.size(digest) for digest in set(unpinned.values()) if store.exists(digest)}
+        sizes.update({entry.report_sha256: entry.size_bytes for entry in victims})
+        deleted = _release(db, store, set(sizes))
+        result = EvictionResult(
+            entries=len(victims),
+            payments=len(unpinned),
+            files=len(deleted),
+            freed_bytes=sum(sizes[digest] for digest in deleted),
+        )
+
+        logger.info(
+            "Evicted %d report cache entries and %d expired payment report(s); deleted %d file(s), %d bytes",
+            result.entries,
+            result.payments,
+            result.files,
+            result.freed_bytes,
+        )
+        return result
@@ -0,0 +1,181 @@
+"""Generation and email delivery of purchased reports.
+
+Reports are kept in the artifact store (app.services.artifact_store) and referenced from the
+payment by digest; the email carries a signed download link instead of the PDF itself. A
+redelivery reuses the stored file, and a purchase of an already rendered book and plan reuses
+the cached one (app.services.report_cache_service) instead of generating the report again.
+"""
+
+import calendar
+import logging
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, cast
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import load_signed_payload, sign_payload
+from app.models.payment import Payment, PaymentStatus
+from app.repositories import PaymentRepository
+from app.services.artifact_store import report_store
+from app.services.email_service import EmailService
+from app.services.report_cache_service import ReportCacheService
+from app.services.report_generator import ReportGeneratorService
+
+logger = logging.getLogger(__name__)
+
+_LINK_KIND = "report"
+
+
+def _unix(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+class ReportDeliveryService:
+    """Service turning a completed payment into an emailed report."""
+
+    @staticmethod
+    def store_report(db: Session, payment: Payment) -> str:
+        """
+        Make sure the payment's report is in the artifact store.
+
+        A report already rendered for the same book and plan is reused from the report cache;
+        only a miss generates one, which is then cached for later buyers.
+
+        Args:
+            db: Database session
+            payment: Completed payment; ``report_sha256`` is set on it (the caller commits)
+
+        Returns:
+            Artifact digest
+        """
+        if report_store.exists(payment.report_sha256):
+            return cast(str, payment.report_sha256)
+
+        book, author, plan_type = payment.book_title, payment.book_author, payment.plan_type
+        digest = ReportCacheService.lookup(db, book, author, plan_type)
+        if digest is not None:
+            payment.report_sha256 = digest
+            return digest
+
+        report_service = ReportGeneratorService()
+        pdf_path = report_service.generate_report(book, author, plan_type)
+        digest = report_store.put_file(pdf_path)
+        payment.report_sha256 = digest
+        ReportCacheService.store(db, book, author, plan_type, digest)
+        return digest
+
+    @staticmethod
+    def download_token(payment: Payment, now: Optional[datetime] = None) -> str:
+        """Signed token granting REPORT_LINK_TTL_HOURS of access to the payment's stored report."""
+        expires = (now or datetime.utcnow()) + timedelta(hours=settings.REPORT_LINK_TTL_HOURS)
+        return sign_payload({"k": _LINK_KIND, "p": payment.id, "d": payment.report_sha256, "e": _unix(expires)})
+
+    @staticmethod
+    def download_url(payment: Payment, now: Optional[datetime] = None) -> str:
+        """Absolute signed download link for the report email."""
+        token = ReportDeliveryService.download_token(payment, now=now)
+        return f"{settings.PUBLIC_API_URL.rstrip('/')}/api/v1/payments/reports/{token}"
+
+    @staticmethod
+    def resolve_token(db: Session, token: str, now: Optional[datetime] = None) -> Optional[Payment]:
+        """
+        Payment a download token is valid for.
+
+        Returns:
+            The payment, or None if the token is forged or expired, or the payment was deleted,
+            refunded or has a different report since the link was issued
+        """
+        data = load_signed_payload(token)
+        if not data or data.get("k") != _LINK_KIND or not isinstance(data.get("p"), int):
+            return None
+        if not isinstance(data.get("e"), int) or data["e"] <= _unix(now or datetime.utcnow()):
+            return None
+        payment = PaymentRepository.get_payment(db, data["p"])
+        if payment is None or payment.status != PaymentStatus.COMPLETED or payment.report_sha256 != data.get("d"):
+            return None
+        return payment
+
+    @staticmethod
+    def deliver(db: Session, payment_id: int) -> bool:
+        """
+        Store the report of a completed payment and email the buyer a link to it.
+
+        Already delivered payments are skipped, so redelivered webhooks and a client
+        confirmation racing the webhook consumer send one email.
+
+        Args:
+            db: Database session
+            payment_id: Payment ID
+
+        Returns:
+            True if a report was sent
+        """
+        payment = PaymentRepository.get_payment_with_user(db, payment_id)
+        if payment is None or payment.status != PaymentStatus.COMPLETED or payment.pdf_sent:
+            return False
+
+        try:
+            ReportDeliveryService.store_report(db, payment)
+            # Keep the stored report even if the email fails, so a retry only resends the link
+            db.commit()
+
+            buyer: Any = payment.user
+            email_service = EmailService()
+            email_service.send_report_email(
+                to_email=buyer.email,
+                book_title=payment.book_title,
+                author=payment.book_author,
+                download_url=ReportDeliveryService.download_url(payment),
+                plan_type=payment.plan_type.value,
+            )
+
+            payment.pdf_sent = True
+            db.commit()
+            return True
+
+        except Exception:
+            db.rollback()
+            # pdf_sent stays False, so redeliver_pending picks the payment up again
+            logger.exception("Error generating/sending report for payment %s", payment_id)
+            return False
+
+    @staticmethod
+    def undelivered_payment_ids(
+        db: Session, completed_before: Optional[datetime] = None, limit: Optional[int] = None
+    ) -> List[int]:
+        """
+        Completed payments whose report has not been sent, least recently updated first.
+
+        Args:
+            db: Database session
+            completed_before: Skip payments updated after this time, which may still be in flight
+            limit: Maximum number of ids (default REPORT_REDELIVERY_BATCH_SIZE)
+        """
+        query = select(Payment.id).where(Payment.status == PaymentStatus.COMPLETED, Payment.pdf_sent.is_(False))
+        if completed_before is not None:
+            query = query.where(Payment.updated_at < completed_before)
+        query = query.order_by(Payment.updated_at).limit(limit or settings.REPORT_REDELIVERY_BATCH_SIZE)
+        return list(db.execute(query).scalars())
+
+    @staticmethod
+    def redeliver_pending(db: Session, delay_seconds: Optional[int] = None, limit: Optional[int] = None) -> int:
+        """
+        Retry delivery for completed payments left with ``pdf_sent`` False by a failed attempt.
+
+        Args:
+            db: Database session
+            delay_seconds: Only payments completed at least this long ago (REPORT_REDELIVERY_DELAY_SECONDS)
+            limit: Payments retried per call (default REPORT_REDELIVERY_BATCH_SIZE)
+
+        Returns:
+            Number of reports sent
+        """
+        delay = settings.REPORT_REDELIVERY_DELAY_SECONDS if delay_seconds is None else delay_seconds
+        completed_before = datetime.utcnow() - timedelta(seconds=delay)
+        payment_ids = ReportDeliveryService.undelivered_payment_ids(db, completed_before, limit)
+        sent = sum(ReportDeliveryService.deliver(db, payment_id) for payment_id in payment_ids)
+        if payment_ids:
+            logger.info("Redelivered %d of %d undelivered report(s)", sent, len(payment_ids))
+        return sent
@@ -18,6 +18,9 @@ from ..models.payment import PlanType
 
 logger = logging.getLogger(__name__)
 
+# Part of the rendered-report cache key: bump whenever sections, prompts, the model or the layout change
+TEMPLATE_VERSION = 1
+
 
 class ReportGeneratorService:
     def __init__(self):
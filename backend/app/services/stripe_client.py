@@ -0,0 +1,210 @@
+"""Async Stripe API client with a persistent connection pool, timeouts and bounded retries.
+
+The blocking ``stripe`` SDK would stall the event loop inside ``async def`` handlers; this
+client talks to the REST API over ``httpx.AsyncClient`` instead. ``STRIPE_API_BASE`` can point
+it at stripe-mock or ``fake_stripe.py`` for offline load tests.
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from typing import Any, Dict, Optional, cast
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses Stripe documents as safe to retry (lock timeouts, rate limits, server errors)
+_RETRYABLE_STATUSES = {409, 429}
+_MAX_BACKOFF_SECONDS = 2.0
+
+
+class StripeAPIError(Exception):
+    """Raised when Stripe rejects a request or cannot be reached within the retry budget."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, code: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+def encode_form(params: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    """Flatten nested params into Stripe's bracketed form keys (``metadata[user_id]``)."""
+    encoded: Dict[str, str] = {}
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, dict):
+            encoded.update(encode_form(value, name))
+        elif value is not None:
+            encoded[name] = str(value)
+    return encoded
+
+
+class StripeClient:
+    """
+    Minimal async client for the PaymentIntent endpoints used by the payment routes and jobs.
+
+    Every POST carries an Idempotency-Key, so retried requests never create a second
+    intent. Connection failures, timeouts and 409/429/5xx responses are retried up to
+    ``max_retries`` times with jittered exponential backoff; Stripe's ``Stripe-Should-Retry``
+    header overrides the status-based decision when present.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        backoff: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url or settings.STRIPE_API_BASE
+        self.api_key = api_key if api_key is not None else settings.STRIPE_SECRET_KEY
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else settings.STRIPE_TIMEOUT_SECONDS,
+            connect=connect_timeout if connect_timeout is not None else settings.STRIPE_CONNECT_TIMEOUT_SECONDS,
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.STRIPE_MAX_RETRIES
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.STRIPE_MAX_CONNECTIONS,
+            max_keepalive_connections=max_connections or settings.STRIPE_MAX_CONNECTIONS,
+        )
+        self.backoff = backoff if backoff is not None else settings.STRIPE_RETRY_BACKOFF_SECONDS
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created on first use so the pool belongs to the running event loop
+        if self._client is None or self._client.is_closed:
+            headers = {"Stripe-Version": settings.STRIPE_API_VERSION} if settings.STRIPE_API_VERSION else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.api_key or "", ""),
+                headers=headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close pooled connections (app shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def create_payment_intent(
+        self,
+        amount: int,
+        currency: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Create a PaymentIntent.
+
+        Args:
+            amount: Amount in cents
+            currency: Three-letter ISO currency code
+            metadata: Key-value pairs stored on the intent
+            idempotency_key: Key deduplicating this request on Stripe's side (default: random per call)
+
+        Returns:
+            The PaymentIntent object
+        """
+        params = {"amount": amount, "currency": currency, "metadata": metadata or {}}
+        return await self._request("POST", "/v1/payment_intents", params, idempotency_key=idempotency_key)
+
+    async def retrieve_payment_intent(self, payment_intent_id: str) -> Dict[str, Any]:
+        """Fetch a PaymentIntent by id."""
+        return await self._request("GET", f"/v1/payment_intents/{payment_intent_id}")
+
+    async def list_payment_intents(
+        self,
+        created_gte: int,
+        created_lt: int,
+        limit: int = 100,
+        starting_after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        One page of PaymentIntents created in ``[created_gte, created_lt)``, newest first.
+
+        Args:
+            created_gte: Window start, Unix seconds
+            created_lt: Window end, Unix seconds
+            limit: Page size (Stripe allows up to 100)
+            starting_after: Id of the last intent of the previous page
+
+        Returns:
+            Stripe list object: ``data`` and ``has_more``
+        """
+        params = {
+            "created": {"gte": created_gte, "lt": created_lt},
+            "limit": limit,
+            "starting_after": starting_after,
+        }
+        return await self._request("GET", "/v1/payment_intents", params)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        headers = {}
+        if method == "POST":
+            headers["Idempotency-Key"] = idempotency_key or str(uuid.uuid4())
+        encoded = encode_form(params) if params else None
+        # GET parameters travel in the query string, POST parameters as a form body
+        query, data = (encoded, None) if method == "GET" else (None, encoded)
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._http().request(method, path, params=query, data=data, headers=headers)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise StripeAPIError(f"Could not reach Stripe: {e!r}") from e
+                logger.warning("Stripe %s %s failed (%r); retrying", method, path, e)
+            else:
+                if attempt >= self.max_retries or not self._should_retry(response):
+                    return self._parse(response)
+                logger.warning("Stripe %s %s returned %d; retrying", method, path, response.status_code)
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    @staticmethod
+    def _should_retry(response: httpx.Response) -> bool:
+        should_retry: Optional[str] = response.headers.get("Stripe-Should-Retry")
+        if should_retry is not None:
+            return should_retry == "true"
+        return response.status_code in _RETRYABLE_STATUSES or response.status_code >= 500
+
+    def _delay(self, attempt: int) -> float:
+        delay = min(_MAX_BACKOFF_SECONDS, self.backoff * 2.0**attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> Dict[str, Any]:
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.is_success:
+            return cast(Dict[str, Any], body)
+        error = body.get("error", {}) if isinstance(body, dict) else {}
+        raise StripeAPIError(
+            error.get("message") or f"Stripe returned HTTP {response.status_code}",
+            status_code=response.status_code,
+            code=error.get("code"),
+        )
+
+
+stripe_client = StripeClient()
@@ -0,0 +1,337 @@
+"""Stripe webhook ingestion and the background consumer applying its events.
+
+The webhook endpoint only verifies the signature and records the event in ``stripe_events``
+(``INSERT ... ON CONFLICT DO NOTHING`` on the event id, so redeliveries are free), then
+acknowledges. :class:`StripeEventConsumer` applies recorded events to payments in batches and
+hands newly completed payments to report delivery, off the request path.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union, cast
+
+import stripe
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.models.payment import Payment, PaymentStatus
+from app.models.stripe_event import StripeEvent
+from app.services.report_delivery_service import ReportDeliveryService
+
+logger = logging.getLogger(__name__)
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+_UPSERT_INSERTS: Dict[str, Callable[[Any], Union[postgresql.Insert, sqlite.Insert]]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Event type -> (new payment status, statuses it may replace). Stripe does not guarantee
+# delivery order, so a late payment_failed cannot undo a success, nor a success a refund.
+TRANSITIONS: Dict[str, Tuple[PaymentStatus, FrozenSet[PaymentStatus]]] = {
+    "payment_intent.succeeded": (PaymentStatus.COMPLETED, frozenset({PaymentStatus.PENDING, PaymentStatus.FAILED})),
+    "payment_intent.payment_failed": (PaymentStatus.FAILED, frozenset({PaymentStatus.PENDING})),
+    "payment_intent.canceled": (PaymentStatus.FAILED, frozenset({PaymentStatus.PENDING})),
+    "charge.refunded": (PaymentStatus.REFUNDED, frozenset({PaymentStatus.COMPLETED})),
+}
+
+
+class InvalidWebhookError(AppException):
+    """Raised when a webhook request is not a correctly signed Stripe event."""
+
+    def __init__(self, detail: str = "Invalid webhook signature or payload") -> None:
+        super().__init__(status_code=400, detail=detail)
+
+
+@dataclass
+class ProcessedBatch:
+    """Outcome of one consumer batch."""
+
+    events: int = 0
+    completed_payment_ids: List[int] = field(default_factory=list)
+
+
+def _payment_intent_id(event: StripeEvent) -> Optional[str]:
+    """PaymentIntent an event is about: the object itself, or the charge's intent."""
+    data = event.payload.get("data", {}).get("object", {})
+    if event.type.startswith("payment_intent."):
+        return cast(Optional[str], data.get("id"))
+    # Partial refunds leave the payment COMPLETED
+    if event.type == "charge.refunded" and data.get("refunded"):
+        return cast(Optional[str], data.get("payment_intent"))
+    return None
+
+
+def _prefetch_intent_id(event: StripeEvent) -> Optional[str]:
+    """Like :func:`_payment_intent_id`, but None for malformed payloads; their error is recorded per event."""
+    try:
+        return _payment_intent_id(event)
+    except Exception:
+        return None
+
+
+class StripeWebhookService:
+    """Service for recording and applying Stripe webhook events."""
+
+    @staticmethod
+    def verify(payload: bytes, signature: Optional[str]) -> Dict[str, Any]:
+        """
+        Check the ``Stripe-Signature`` header of a webhook request against STRIPE_WEBHOOK_SECRET.
+
+        Args:
+            payload: Raw request body, exactly as received
+            signature: Value of the Stripe-Signature header
+
+        Returns:
+            The decoded event
+
+        Raises:
+            InvalidWebhookError: If the signature, its timestamp or the payload is invalid
+        """
+        if not signature:
+            raise InvalidWebhookError("Missing Stripe-Signature header")
+        try:
+            stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+            event: Dict[str, Any] = json.loads(payload)
+            return event
+        except (ValueError, stripe.SignatureVerificationError) as e:
+            raise InvalidWebhookError() from e
+
+    @staticmethod
+    def record(db: Session, event: Dict[str, Any]) -> bool:
+        """
+        Store a verified event unless its id was already recorded; the caller commits.
+
+        Args:
+            db: Database session
+            event: Decoded Stripe event
+
+        Returns:
+            True if the event is new, False for a redelivery
+        """
+        insert = _UPSERT_INSERTS[db.get_bind().dialect.name](StripeEvent.__table__)
+        statement = insert.values(
+            id=event["id"], type=event["type"], payload=event, received_at=datetime.utcnow(), attempts=0
+        ).on_conflict_do_nothing(index_elements=["id"])
+        return bool(db.execute(statement).rowcount == 1)
+
+    @staticmethod
+    def process_pending(db: Session, batch_size: Optional[int] = None) -> ProcessedBatch:
+        """
+        Apply the oldest unprocessed events to their payments in one transaction.
+
+        Payments are loaded with one query for the whole batch and updated through the ORM,
+        so payment stats and audit entries follow as for any other status change. Each event
+        is applied inside its own savepoint: an event that fails is rolled back alone, counts
+        an attempt and keeps its error in ``last_error``, and the rest of the batch commits.
+        On PostgreSQL the events are claimed with ``FOR UPDATE SKIP LOCKED``, so several
+        consumers can run side by side.
+
+        Args:
+            db: Database session
+            batch_size: Events per batch (default: STRIPE_EVENT_BATCH_SIZE)
+
+        Returns:
+            Number of events handled and the payments that became COMPLETED
+        """
+        query = (
+            select(StripeEvent)
+            .where(StripeEvent.processed_at.is_(None), StripeEvent.attempts < settings.STRIPE_EVENT_MAX_ATTEMPTS)
+            .order_by(StripeEvent.received_at)
+            .limit(batch_size or settings.STRIPE_EVENT_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        events = db.execute(query).scalars().all()
+        if not events:
+            return ProcessedBatch()
+
+        intent_ids = {intent_id for intent_id in map(_prefetch_intent_id, events) if intent_id}
+        payments = {
+            payment.stripe_payment_id: payment
+            for payment in db.execute(select(Payment).where(Payment.stripe_payment_id.in_(intent_ids))).scalars()
+        }
+
+        result = ProcessedBatch(events=len(events))
+        now = datetime.utcnow()
+        failed = 0
+        for event in events:
+            event.attempts += 1
+            try:
+                with db.begin_nested():
+                    completed = StripeWebhookService._apply(event, payments)
+                    event.processed_at = now
+                    event.last_error = None
+            except Exception as e:
+                logger.exception("Failed to apply Stripe event %s", event.id)
+                event.last_error = str(e)[:1000]
+                failed += 1
+                continue
+            if completed is not None:
+                result.completed_payment_ids.append(completed)
+        db.commit()
+
+        logger.info(
+            "Applied %d Stripe event(s), %d failed; %d payment(s) completed",
+            result.events - failed,
+            failed,
+            len(result.completed_payment_ids),
+        )
+        return result
+
+    @staticmethod
+    def _apply(event: StripeEvent, payments: Dict[str, Payment]) -> Optional[int]:
+        """Apply one event to its payment; returns the payment id if it became COMPLETED."""
+        transition = TRANSITIONS.get(event.type)
+        intent_id = _payment_intent_id(event)
+        if transition is None or intent_id is None:
+            return None
+        payment = payments.get(intent_id)
+        if payment is None:
+            logger.warning("Stripe event %s refers to unknown payment intent %s", event.id, intent_id)
+            return None
+        status, allowed = transition
+        if payment.status not in allowed:
+            return None
+        payment.status = status
+        return payment.id if status == PaymentStatus.COMPLETED else None
+
+
+class StripeEventConsumer:
+    """
+    Background thread draining the stripe_events inbox in batches.
+
+    The webhook endpoint calls :meth:`notify` after recording an event; the thread also wakes
+    every STRIPE_EVENT_POLL_SECONDS to pick up events recorded by other processes or left
+    behind by a failed batch. Reports are generated on a small worker pool so slow report
+    generation does not hold up event processing; every ``redelivery_interval`` seconds the
+    completed payments whose delivery failed are queued on it again.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        report_workers: int,
+        redelivery_interval: float = 0.0,
+        redelivery_delay: int = 0,
+    ) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.report_workers = report_workers
+        self.redelivery_interval = redelivery_interval
+        self.redelivery_delay = redelivery_delay
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reports: Optional[ThreadPoolExecutor] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._lock = threading.Lock()
+        # Payments queued or being delivered on the pool, so a sweep does not queue them twice
+        self._in_flight: Set[int] = set()
+        self._next_sweep = 0.0
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the consumer thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._session_factory = session_factory
+            self._stop.clear()
+            self._reports = ThreadPoolExecutor(max_workers=self.report_workers, thread_name_prefix="report-delivery")
+            self._thread = threading.Thread(target=self._run, name="stripe-event-consumer", daemon=True)
+            self._thread.start()
+
+    def notify(self) -> None:
+        """Wake the consumer: new events were recorded."""
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the consumer thread; queued report deliveries are allowed to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._reports is not None:
+            self._reports.shutdown(wait=True)
+            self._reports = None
+
+    def drain(self) -> int:
+        """Process batches until the inbox is empty; returns the number of events applied."""
+        if self._session_factory is None:
+            raise RuntimeError("Session factory not initialized. Call start() on app startup.")
+        total = 0
+        while not self._stop.is_set():
+            db = self._session_factory()
+            try:
+                batch = StripeWebhookService.process_pending(db, self.batch_size)
+            finally:
+                db.close()
+            for payment_id in batch.completed_payment_ids:
+                self._enqueue_report(payment_id)
+            total += batch.events
+            if batch.events < self.batch_size:
+                return total
+        return total
+
+    def sweep_undelivered(self) -> int:
+        """Queue completed payments whose report delivery failed; returns the number queued."""
+        if self._session_factory is None:
+            raise RuntimeError("Session factory not initialized. Call start() on app startup.")
+        completed_before = datetime.utcnow() - timedelta(seconds=self.redelivery_delay)
+        db = self._session_factory()
+        try:
+            payment_ids = ReportDeliveryService.undelivered_payment_ids(db, completed_before)
+        finally:
+            db.close()
+        return sum(self._enqueue_report(payment_id) for payment_id in payment_ids)
+
+    def _enqueue_report(self, payment_id: int) -> bool:
+        with self._lock:
+            if self._reports is None or payment_id in self._in_flight:
+                return False
+            self._in_flight.add(payment_id)
+            self._reports.submit(self._deliver_report, payment_id)
+        return True
+
+    def _deliver_report(self, payment_id: int) -> None:
+        assert self._session_factory is not None
+        db = self._session_factory()
+        try:
+            ReportDeliveryService.deliver(db, payment_id)
+        finally:
+            db.close()
+            with self._lock:
+                self._in_flight.discard(payment_id)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Failed to apply Stripe events")
+            if self.redelivery_interval > 0 and time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.redelivery_interval
+                try:
+                    self.sweep_undelivered()
+                except Exception:
+                    logger.exception("Failed to queue undelivered reports")
+
+
+stripe_event_consumer = StripeEventConsumer(
+    batch_size=settings.STRIPE_EVENT_BATCH_SIZE,
+    poll_interval=settings.STRIPE_EVENT_POLL_SECONDS,
+    report_workers=settings.REPORT_DELIVERY_WORKERS,
+    redelivery_interval=settings.REPORT_REDELIVERY_INTERVAL_SECONDS,
+    redelivery_delay=settings.REPORT_REDELIVERY_DELAY_SECONDS,
+)
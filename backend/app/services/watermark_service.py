@@ -0,0 +1,27 @@
+"""High-water marks for incremental scheduled jobs."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.analytics import JobWatermark
+
+
+class WatermarkService:
+    """Service for reading and advancing job watermarks."""
+
+    @staticmethod
+    def get(db: Session, name: str) -> Optional[datetime]:
+        """Watermark of job ``name``, or None if it never ran."""
+        row = db.get(JobWatermark, name)
+        return row.watermark if row is not None else None
+
+    @staticmethod
+    def advance(db: Session, name: str, watermark: datetime) -> None:
+        """Move job ``name``'s watermark forward (never backwards); the caller commits."""
+        row = db.get(JobWatermark, name)
+        if row is None:
+            db.add(JobWatermark(name=name, watermark=watermark))
+        elif watermark > row.watermark:
+            row.watermark = watermark
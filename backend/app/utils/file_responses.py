@@ -0,0 +1,106 @@
+"""File responses with conditional and byte-range request support.
+
+Starlette 0.27's ``FileResponse`` always sends the whole file, so downloads that are interrupted
+restart from the first byte. :func:`ranged_file_response` answers a single ``Range`` with 206
+Partial Content streamed in chunks, ``If-None-Match`` with 304 and unsatisfiable ranges with 416.
+Full downloads are still served by ``FileResponse``, which can use the server's zero-copy send.
+"""
+
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header.
+
+    Returns:
+        Inclusive (start, end), or None if the header is malformed or asks for several ranges
+        (the whole file is sent then)
+
+    Raises:
+        ValueError: If the range is well-formed but lies outside the file
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError(header)
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    media_type: str = "application/octet-stream",
+    filename: Optional[str] = None,
+    cache_control: str = "private, max-age=86400",
+) -> Response:
+    """
+    Serve ``path`` honouring ``If-None-Match``, ``Range`` and ``If-Range``.
+
+    Args:
+        request: Incoming request
+        path: File to send
+        etag: Strong validator for the file's content (unquoted)
+        media_type: Content type
+        filename: Download name for ``Content-Disposition``
+        cache_control: ``Cache-Control`` header value
+
+    Returns:
+        200, 206, 304 or 416 response
+    """
+    size = os.path.getsize(path)
+    quoted = f'"{etag}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": quoted, "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or quoted in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == quoted):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+            if filename:
+                headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return StreamingResponse(
+                _iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers
+            )
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Measure per-call Python overhead of repository hot queries.
+
+Compares building a Query on every call against executing the prebuilt statements
+in app.repositories, on an in-memory SQLite database so the numbers are dominated
+by statement construction, caching and ORM overhead rather than I/O.
+
+Usage: python benchmark_queries.py [--calls N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.repositories import PaymentRepository, UserRepository
+
+
+def _setup():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="bench@example.com", hashed_password="hashed")
+    db.add(user)
+    db.flush()
+    payment = Payment(
+        user_id=user.id,
+        stripe_payment_id="pi_bench",
+        amount=499,
+        status=PaymentStatus.COMPLETED,
+        plan_type=PlanType.BASIC,
+        book_title="Bench",
+        book_author="Author",
+    )
+    db.add(payment)
+    db.commit()
+    return db, payment.id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    db, payment_id = _setup()
+    cases = {
+        "user by email": (
+            lambda: db.query(User).filter(User.email == "bench@example.com").first(),
+            lambda: UserRepository.get_by_email(db, "bench@example.com"),
+        ),
+        "payment by id": (
+            lambda: db.query(Payment).filter(Payment.id == payment_id).first(),
+            lambda: PaymentRepository.get_payment(db, payment_id),
+        ),
+        "payment + user by stripe id": (
+            lambda: db.query(Payment)
+            .options(joinedload(Payment.user))
+            .filter(Payment.stripe_payment_id == "pi_bench")
+            .first(),
+            lambda: PaymentRepository.get_payment_by_stripe_id(db, "pi_bench"),
+        ),
+    }
+
+    print(f"{'query':<30}{'per-call Query':>16}{'prebuilt':>12}{'saved':>12}")
+    for name, (legacy, cached) in cases.items():
+        # Warm up the compiled cache for both forms before timing
+        legacy()
+        cached()
+        legacy_us = min(timeit.repeat(legacy, number=args.calls, repeat=3)) / args.calls * 1e6
+        cached_us = min(timeit.repeat(cached, number=args.calls, repeat=3)) / args.calls * 1e6
+        print(f"{name:<30}{legacy_us:>13.1f} µs{cached_us:>9.1f} µs{legacy_us - cached_us:>9.1f} µs")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
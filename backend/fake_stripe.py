@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""In-memory stand-in for the Stripe PaymentIntent API, for offline load tests.
+
+Implements just what app.services.stripe_client uses (create, retrieve and list by creation
+window), plus a confirm endpoint so a load script can drive intents to ``succeeded``.
+Idempotency-Key replays return the first response.
+
+Usage:
+    uvicorn fake_stripe:app --port 12111
+    STRIPE_API_BASE=http://localhost:12111 uvicorn app.main:app
+"""
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Stripe")
+
+_intents: Dict[str, Dict[str, Any]] = {}
+_idempotent_responses: Dict[str, Dict[str, Any]] = {}
+
+
+def _error(status_code: int, message: str, code: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code, content={"error": {"type": "invalid_request_error", "code": code, "message": message}}
+    )
+
+
+def _metadata(form: Any) -> Dict[str, str]:
+    return {key[len("metadata[") : -1]: value for key, value in form.items() if key.startswith("metadata[")}
+
+
+@app.post("/v1/payment_intents")
+async def create_payment_intent(request: Request) -> Any:
+    key = request.headers.get("Idempotency-Key")
+    if key and key in _idempotent_responses:
+        return _idempotent_responses[key]
+
+    form = await request.form()
+    if "amount" not in form or "currency" not in form:
+        return _error(400, "Missing required param: amount or currency.", "parameter_missing")
+    intent_id = f"pi_fake_{secrets.token_hex(12)}"
+    intent = {
+        "id": intent_id,
+        "object": "payment_intent",
+        "amount": int(str(form["amount"])),
+        "currency": form["currency"],
+        "metadata": _metadata(form),
+        "client_secret": f"{intent_id}_secret_{secrets.token_hex(12)}",
+        "status": "requires_payment_method",
+        "created": int(time.time()),
+    }
+    _intents[intent_id] = intent
+    if key:
+        _idempotent_responses[key] = intent
+    return intent
+
+
+@app.get("/v1/payment_intents")
+async def list_payment_intents(request: Request, limit: int = 10, starting_after: Optional[str] = None) -> Any:
+    query = request.query_params
+    gte = int(query.get("created[gte]", 0))
+    lt = int(query.get("created[lt]", 2**63))
+    # Stripe lists newest first; ties keep a stable order by id
+    matches = sorted(
+        (intent for intent in _intents.values() if gte <= intent["created"] < lt),
+        key=lambda intent: (intent["created"], intent["id"]),
+        reverse=True,
+    )
+    if starting_after:
+        ids = [intent["id"] for intent in matches]
+        matches = matches[ids.index(starting_after) + 1 :] if starting_after in ids else []
+    limit = max(1, min(limit, 100))
+    return {"object": "list", "data": matches[:limit], "has_more": len(matches) > limit, "url": "/v1/payment_intents"}
+
+
+@app.get("/v1/payment_intents/{intent_id}")
+async def retrieve_payment_intent(intent_id: str) -> Any:
+    if intent_id not in _intents:
+        return _error(404, f"No such payment_intent: '{intent_id}'", "resource_missing")
+    return _intents[intent_id]
+
+
+@app.post("/v1/payment_intents/{intent_id}/confirm")
+async def confirm_payment_intent(intent_id: str) -> Any:
+    if intent_id not in _intents:
+        return _error(404, f"No such payment_intent: '{intent_id}'", "resource_missing")
+    _intents[intent_id]["status"] = "succeeded"
+    return _intents[intent_id]
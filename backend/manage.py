@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+Maintenance commands for scheduled jobs (cron, Kubernetes CronJobs, ...).
+
+Usage:
+    python manage.py audit-partitions [--months-ahead N]
+    python manage.py audit-archive [--retention-days N] [--archive-dir DIR] [--batch-size N]
+    python manage.py archive-soft-deleted [--grace-days N] [--batch-size N]
+    python manage.py rebuild-payment-stats [--user-id N ...]
+    python manage.py refresh-analytics [--full]
+    python manage.py reconcile-payments [--full]
+    python manage.py redeliver-reports [--delay-seconds N] [--limit N]
+    python manage.py evict-reports [--max-bytes N]
+    python manage.py export-audit-logs [--format csv|ndjson] [--since T] [--until T] [--entity-type T] [-o FILE]
+    python manage.py export-payments [--format csv|ndjson] [--status S] [--since T] [--until T] [-o FILE]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, TextIO
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.models.audit_listeners import audit_writer, register_audit_listeners, set_session_factory
+
+
+def audit_partitions(args: argparse.Namespace) -> None:
+    """Provision upcoming monthly audit_logs partitions (PostgreSQL only)."""
+    from app.services.audit_retention_service import AuditRetentionService
+
+    db = SessionLocal()
+    try:
+        created = AuditRetentionService.ensure_partitions(db, months_ahead=args.months_ahead)
+    finally:
+        db.close()
+    print(f"Created {len(created)} partition(s): {', '.join(created) or '-'}")
+
+
+def audit_archive(args: argparse.Namespace) -> None:
+    """Archive audit entries past the retention window."""
+    from app.services.audit_retention_service import AuditRetentionService
+
+    db = SessionLocal()
+    try:
+        result = AuditRetentionService.archive_expired(
+            db,
+            retention_days=args.retention_days,
+            archive_dir=args.archive_dir,
+            batch_size=args.batch_size,
+        )
+    finally:
+        db.close()
+    print(f"Archived {result.archived_rows} audit entries to {len(result.files)} file(s)")
+    for name in result.dropped_partitions:
+        print(f"  dropped partition {name}")
+
+
+def archive_soft_deleted(args: argparse.Namespace) -> None:
+    """Move users and payments soft-deleted past the grace period into the archive tables."""
+    from app.services.archive_service import ArchiveService
+
+    db = SessionLocal()
+    try:
+        counts = ArchiveService.archive_soft_deleted(db, grace_days=args.grace_days, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Archived {counts['users']} user(s) and {counts['payments']} payment(s)")
+
+
+def rebuild_payment_stats(args: argparse.Namespace) -> None:
+    """Recompute the per-user payment summary from the payments table."""
+    from app.services.payment_stats_service import PaymentStatsService
+
+    db = SessionLocal()
+    try:
+        rebuilt = PaymentStatsService.rebuild(db, user_ids=args.user_id)
+    finally:
+        db.close()
+    print(f"Rebuilt {rebuilt} user payment stats row(s)")
+
+
+def refresh_analytics(args: argparse.Namespace) -> None:
+    """Refresh the daily payment rollups from payments changed since the last run."""
+    from app.services.analytics_service import AnalyticsService
+
+    db = SessionLocal()
+    try:
+        days = AnalyticsService.refresh_daily_rollups(db, full=args.full)
+    finally:
+        db.close()
+    print(f"Refreshed {days} day(s) of payment rollups")
+
+
+def reconcile_payments(args: argparse.Namespace) -> None:
+    """Bring payment statuses in line with Stripe and send reports for newly completed payments."""
+    from app.services.reconciliation_service import ReconciliationService
+    from app.services.report_delivery_service import ReportDeliveryService
+    from app.services.stripe_client import stripe_client
+
+    def deliver(payment_ids: List[int]) -> None:
+        # Per window, so an interrupted run has already sent the reports of the windows it committed
+        for payment_id in payment_ids:
+            ReportDeliveryService.deliver(db, payment_id)
+
+    async def run():  # type: ignore[no-untyped-def]
+        try:
+            return await ReconciliationService.reconcile(db, full=args.full, on_window=deliver)
+        finally:
+            await stripe_client.aclose()
+
+    db = SessionLocal()
+    try:
+        result = asyncio.run(run())
+    finally:
+        db.close()
+    print(
+        f"Reconciled {result.intents} intent(s) with {result.api_calls} API call(s); "
+        f"{result.updated} payment(s) updated"
+    )
+
+
+def redeliver_reports(args: argparse.Namespace) -> None:
+    """Retry report delivery for completed payments whose report was never sent."""
+    from app.services.report_delivery_service import ReportDeliveryService
+
+    db = SessionLocal()
+    try:
+        sent = ReportDeliveryService.redeliver_pending(db, delay_seconds=args.delay_seconds, limit=args.limit)
+    finally:
+        db.close()
+    print(f"Sent {sent} report(s)")
+
+
+def evict_reports(args: argparse.Namespace) -> None:
+    """Evict report cache entries over budget and delete reports whose download links have expired."""
+    from app.services.report_cache_service import ReportCacheService
+
+    db = SessionLocal()
+    try:
+        result = ReportCacheService.evict(db, max_bytes=args.max_bytes)
+        db.commit()
+    finally:
+        db.close()
+    print(
+        f"Evicted {result.entries} cache entries and {result.payments} expired payment report(s); "
+        f"deleted {result.files} file(s), {result.freed_bytes} bytes"
+    )
+
+
+@contextmanager
+def _output(path: str) -> Iterator[TextIO]:
+    if path == "-":
+        yield sys.stdout
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            yield handle
+
+
+def export_audit_logs(args: argparse.Namespace) -> None:
+    """Stream audit log entries to a file or stdout."""
+    from app.services.export_service import ExportService
+
+    chunks = ExportService.stream_audit_logs(
+        args.format, since=args.since, until=args.until, entity_type=args.entity_type, chunk_rows=args.chunk_rows
+    )
+    with _output(args.output) as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+
+def export_payments(args: argparse.Namespace) -> None:
+    """Stream payments to a file or stdout."""
+    from app.models.payment import PaymentStatus
+    from app.services.export_service import ExportService
+
+    chunks = ExportService.stream_payments(
+        args.format,
+        status=PaymentStatus(args.status) if args.status else None,
+        since=args.since,
+        until=args.until,
+        include_deleted=args.include_deleted,
+        chunk_rows=args.chunk_rows,
+    )
+    with _output(args.output) as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+
+def _add_export_arguments(parser: argparse.ArgumentParser, default_format: str) -> None:
+    parser.add_argument("--format", choices=("csv", "ndjson"), default=default_format)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=1000)
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Screendibs maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partitions = commands.add_parser("audit-partitions", help=audit_partitions.__doc__)
+    partitions.add_argument("--months-ahead", type=int, default=None)
+    partitions.set_defaults(handler=audit_partitions)
+
+    archive = commands.add_parser("audit-archive", help=audit_archive.__doc__)
+    archive.add_argument("--retention-days", type=int, default=None)
+    archive.add_argument("--archive-dir", default=None)
+    archive.add_argument("--batch-size", type=int, default=None)
+    archive.set_defaults(handler=audit_archive)
+
+    soft_deleted = commands.add_parser("archive-soft-deleted", help=archive_soft_deleted.__doc__)
+    soft_deleted.add_argument("--grace-days", type=int, default=None)
+    soft_deleted.add_argument("--batch-size", type=int, default=None)
+    soft_deleted.set_defaults(handler=archive_soft_deleted)
+
+    payment_stats = commands.add_parser("rebuild-payment-stats", help=rebuild_payment_stats.__doc__)
+    payment_stats.add_argument("--user-id", type=int, action="append", default=None)
+    payment_stats.set_defaults(handler=rebuild_payment_stats)
+
+    analytics = commands.add_parser("refresh-analytics", help=refresh_analytics.__doc__)
+    analytics.add_argument("--full", action="store_true", help="recompute every day, ignoring the watermark")
+    analytics.set_defaults(handler=refresh_analytics)
+
+    reconcile = commands.add_parser("reconcile-payments", help=reconcile_payments.__doc__)
+    reconcile.add_argument("--full", action="store_true", help="scan the whole lookback period, ignoring the watermark")
+    reconcile.set_defaults(handler=reconcile_payments)
+
+    redeliver = commands.add_parser("redeliver-reports", help=redeliver_reports.__doc__)
+    redeliver.add_argument("--delay-seconds", type=int, default=None)
+    redeliver.add_argument("--limit", type=int, default=None)
+    redeliver.set_defaults(handler=redeliver_reports)
+
+    evict = commands.add_parser("evict-reports", help=evict_reports.__doc__)
+    evict.add_argument("--max-bytes", type=int, default=None)
+    evict.set_defaults(handler=evict_reports)
+
+    audit_export = commands.add_parser("export-audit-logs", help=export_audit_logs.__doc__)
+    _add_export_arguments(audit_export, "ndjson")
+    audit_export.add_argument("--entity-type", default=None)
+    audit_export.set_defaults(handler=export_audit_logs)
+
+    payment_export = commands.add_parser("export-payments", help=export_payments.__doc__)
+    _add_export_arguments(payment_export, "csv")
+    payment_export.add_argument("--status", default=None)
+    payment_export.add_argument("--include-deleted", action="store_true")
+    payment_export.set_defaults(handler=export_payments)
+
+    return parser
+
+
+def main(argv=None) -> None:  # type: ignore[no-untyped-def]
+    args = build_parser().parse_args(argv)
+    # Jobs change users and payments too; audit them as the API does
+    set_session_factory(SessionLocal)
+    register_audit_listeners()
+    try:
+        args.handler(args)
+    finally:
+        audit_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
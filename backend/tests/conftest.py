@@ -5,8 +5,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.core.database import Base, get_db
-from app.utils.auth import get_current_active_user
+from app.core.database import Base, get_db, get_read_db
+from app.utils.auth import get_current_active_reader, get_current_active_user
 from app.models.user import User
 from datetime import datetime
 
@@ -47,7 +47,9 @@ async def mock_get_current_active_user():
 @pytest.fixture
 def client():
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     app.dependency_overrides[get_current_active_user] = mock_get_current_active_user
+    app.dependency_overrides[get_current_active_reader] = mock_get_current_active_user
     with TestClient(app) as client:
         yield client
     app.dependency_overrides = {}
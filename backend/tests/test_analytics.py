@@ -0,0 +1,99 @@
+"""Tests for the daily payment rollups and their refresh job."""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.analytics import PaymentDailyRollup
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.services.analytics_service import ROLLUP_JOB, AnalyticsService
+from app.services.audit_service import AuditService
+from app.services.watermark_service import WatermarkService
+
+DAY = datetime(2024, 3, 10, 12, 0)
+
+
+def _payments(db: Session) -> User:
+    user = User(email="analytics@example.com", hashed_password="hashed")
+    db.add(user)
+    db.commit()
+    rows = [
+        ("pi_a", PlanType.BASIC, PaymentStatus.COMPLETED, 499, DAY),
+        ("pi_b", PlanType.BASIC, PaymentStatus.PENDING, 499, DAY + timedelta(hours=3)),
+        ("pi_c", PlanType.PREMIUM, PaymentStatus.REFUNDED, 2999, DAY),
+        ("pi_d", PlanType.BASIC, PaymentStatus.COMPLETED, 499, DAY + timedelta(days=1)),
+    ]
+    for stripe_id, plan_type, status, amount, created_at in rows:
+        db.add(
+            Payment(
+                user_id=user.id,
+                stripe_payment_id=stripe_id,
+                amount=amount,
+                plan_type=plan_type,
+                status=status,
+                book_title="Book",
+                book_author="Author",
+                created_at=created_at,
+                updated_at=created_at,
+            )
+        )
+    db.commit()
+    return user
+
+
+class TestDailyRollups:
+    """Test rollup computation and the incremental refresh."""
+
+    def test_first_run_builds_all_days(self, db: Session) -> None:
+        """Without a watermark every day is built, and the watermark is set."""
+        _payments(db)
+
+        assert AnalyticsService.refresh_daily_rollups(db) == 2
+
+        revenue = AnalyticsService.get_daily_revenue(db, date(2024, 3, 10), date(2024, 3, 11))
+        assert [(row["plan_type"], row["payments"], row["revenue_cents"]) for row in revenue] == [
+            (PlanType.BASIC, 2, 499),
+            (PlanType.PREMIUM, 1, 0),
+        ]
+        assert revenue[0]["conversion_rate"] == 0.5
+        assert revenue[1]["refunded_cents"] == 2999
+        assert WatermarkService.get(db, ROLLUP_JOB) == DAY + timedelta(days=1)
+
+    def test_incremental_run_only_recomputes_changed_days(self, db: Session, monkeypatch) -> None:
+        """Later runs pick up updates past the watermark, including soft deletes."""
+        monkeypatch.setattr(settings, "ANALYTICS_WATERMARK_OVERLAP_SECONDS", 0)
+        _payments(db)
+        AnalyticsService.refresh_daily_rollups(db)
+        assert AnalyticsService.refresh_daily_rollups(db) == 0
+
+        pending = db.query(Payment).filter(Payment.stripe_payment_id == "pi_b").one()
+        pending.status = PaymentStatus.COMPLETED
+        db.commit()
+        AuditService.soft_delete(db, Payment, db.query(Payment).filter(Payment.stripe_payment_id == "pi_d").one().id)
+
+        assert AnalyticsService.refresh_daily_rollups(db) == 2
+        basic = AnalyticsService.get_daily_revenue(db, date(2024, 3, 10), date(2024, 3, 12), PlanType.BASIC)
+        assert [(row["day"], row["completed"], row["revenue_cents"]) for row in basic] == [(date(2024, 3, 10), 2, 998)]
+
+    def test_full_refresh_clears_purged_days(self, db: Session) -> None:
+        """A full run drops rollups of days whose payments no longer exist."""
+        _payments(db)
+        AnalyticsService.refresh_daily_rollups(db)
+        AuditService.bulk_purge(db, Payment, [p.id for p in db.query(Payment).all() if p.created_at.day == 11])
+
+        AnalyticsService.refresh_daily_rollups(db, full=True)
+
+        assert {row.day for row in db.query(PaymentDailyRollup).all()} == {date(2024, 3, 10)}
+
+
+def test_admin_revenue_endpoint(client, monkeypatch) -> None:
+    """The analytics endpoint is admin-only and validates the window."""
+    params = {"since": "2024-03-01", "until": "2024-04-01"}
+    assert client.get("/api/v1/admin/analytics/revenue", params=params).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+    assert client.get("/api/v1/admin/analytics/revenue", params=params).json() == []
+    response = client.get("/api/v1/admin/analytics/revenue", params={"since": "2024-04-01", "until": "2024-03-01"})
+    assert response.status_code == 400
@@ -0,0 +1,135 @@
+"""Tests for archiving long soft-deleted users and payments."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.archive import payments_archive, users_archive
+from app.models.audit import AuditLog
+from app.models.payment import Payment, PlanType
+from app.models.user import User
+from app.services.archive_service import ArchiveConflictError, ArchiveService
+from app.services.audit_service import AuditService
+
+NOW = datetime(2024, 6, 1)
+
+
+def _user(db: Session, email: str, deleted_at=None) -> User:
+    user = User(email=email, hashed_password="hashed", deleted_at=deleted_at)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _payment(db: Session, user: User, stripe_id: str, deleted_at=None) -> Payment:
+    payment = Payment(
+        user_id=user.id,
+        stripe_payment_id=stripe_id,
+        amount=1000,
+        plan_type=PlanType.BASIC,
+        book_title="Book",
+        book_author="Author",
+        deleted_at=deleted_at,
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+def _archived_ids(db: Session, table) -> list:
+    return sorted(db.execute(select(table.c.id)).scalars())
+
+
+class TestArchiveSoftDeleted:
+    """Test moving expired soft-deleted rows into the archive tables."""
+
+    def test_archives_rows_past_grace_period(self, db: Session) -> None:
+        """Only rows soft-deleted before the cutoff move; recent deletions stay in place."""
+        keeper = _user(db, "keeper@example.com")
+        old = _payment(db, keeper, "pi_old", deleted_at=NOW - timedelta(days=60)).id
+        recent = _payment(db, keeper, "pi_recent", deleted_at=NOW - timedelta(days=5)).id
+        live = _payment(db, keeper, "pi_live").id
+
+        counts = ArchiveService.archive_soft_deleted(db, grace_days=30, batch_size=1, now=NOW)
+
+        assert counts == {"payments": 1, "users": 0}
+        assert _archived_ids(db, payments_archive) == [old]
+        remaining = db.query(Payment).execution_options(include_deleted=True).all()
+        assert sorted(p.id for p in remaining) == sorted([recent, live])
+        archived = db.execute(select(payments_archive).where(payments_archive.c.id == old)).one()
+        assert archived.stripe_payment_id == "pi_old"
+        assert archived.archived_at == NOW
+
+    def test_archived_user_takes_live_payments_along(self, db: Session) -> None:
+        """Payments of an archived user are archived first so no row references a missing user."""
+        user = _user(db, "gone@example.com", deleted_at=NOW - timedelta(days=90))
+        user_id, payment_id = user.id, _payment(db, user, "pi_gone").id
+
+        counts = ArchiveService.archive_soft_deleted(db, grace_days=30, now=NOW)
+
+        assert counts == {"payments": 1, "users": 1}
+        assert _archived_ids(db, users_archive) == [user_id]
+        assert _archived_ids(db, payments_archive) == [payment_id]
+        actions = {(log.entity_type, log.action) for log in db.query(AuditLog).filter(AuditLog.action == "ARCHIVE")}
+        assert actions == {("User", "ARCHIVE"), ("Payment", "ARCHIVE")}
+
+    def test_archived_email_blocks_registration(self, db: Session) -> None:
+        """Archived accounts still own their email."""
+        _user(db, "held@example.com", deleted_at=NOW - timedelta(days=90))
+        ArchiveService.archive_soft_deleted(db, grace_days=30, now=NOW)
+
+        assert ArchiveService.is_email_archived(db, "held@example.com") is True
+        assert ArchiveService.is_email_archived(db, "free@example.com") is False
+
+
+class TestRestoreFromArchive:
+    """Test that AuditService.restore transparently restores archived rows."""
+
+    def test_restore_user_brings_back_payments(self, db: Session) -> None:
+        """Restoring an archived user restores it and the payments archived with it."""
+        user = _user(db, "back@example.com", deleted_at=NOW - timedelta(days=90))
+        user_id = user.id
+        kept = _payment(db, user, "pi_kept").id
+        deleted = _payment(db, user, "pi_deleted", deleted_at=NOW - timedelta(days=90)).id
+        ArchiveService.archive_soft_deleted(db, grace_days=30, now=NOW)
+        db.expunge_all()
+
+        restored = AuditService.restore(db, User, user_id)
+        db.commit()
+
+        assert restored is not None and restored.deleted_at is None
+        assert [p.id for p in db.query(Payment).filter(Payment.user_id == user_id)] == [kept]
+        assert _archived_ids(db, users_archive) == []
+        assert _archived_ids(db, payments_archive) == [deleted]
+
+    def test_restore_payment_brings_back_user(self, db: Session) -> None:
+        """An archived payment cannot come back without its archived user."""
+        user = _user(db, "owner@example.com", deleted_at=NOW - timedelta(days=90))
+        user_id = user.id
+        payment_id = _payment(db, user, "pi_owned", deleted_at=NOW - timedelta(days=90)).id
+        ArchiveService.archive_soft_deleted(db, grace_days=30, now=NOW)
+        db.expunge_all()
+
+        restored = AuditService.restore(db, Payment, payment_id)
+        db.commit()
+
+        assert restored is not None and restored.deleted_at is None
+        owner = db.query(User).execution_options(include_deleted=True).filter(User.id == user_id).one()
+        assert owner.is_deleted
+
+    def test_restore_conflicting_email(self, db: Session) -> None:
+        """A user whose email was taken after archival cannot be restored."""
+        user_id = _user(db, "reused@example.com", deleted_at=NOW - timedelta(days=90)).id
+        ArchiveService.archive_soft_deleted(db, grace_days=30, now=NOW)
+        # Admin-created accounts bypass the registration check
+        _user(db, "reused@example.com")
+
+        with pytest.raises(ArchiveConflictError) as exc_info:
+            AuditService.restore(db, User, user_id)
+        assert exc_info.value.status_code == 409
+
+    def test_restore_unknown_id(self, db: Session) -> None:
+        """Ids that are neither soft-deleted nor archived are not restored."""
+        assert AuditService.restore(db, User, 12345) is None
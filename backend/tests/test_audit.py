@@ -1,12 +1,15 @@
 """Tests for audit logging and soft deletes functionality."""
 
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import cast
 
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, null
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
+from app.core.config import settings
+from app.core.database import Base
 from app.models.audit import AuditLog
 from app.models.payment import Payment
 from app.models.user import User
@@ -129,7 +132,7 @@ class TestAuditLog:
             entity_type="User",
             entity_id=1,
             action="INSERT",
-            changes=json.dumps({"email": "test@example.com"}),
+            changes={"email": "test@example.com"},
             user_id=None,
         )
         db.add(audit)
@@ -148,7 +151,7 @@ class TestAuditLog:
         db.commit()
 
         audit = AuditLog(
-            entity_type="Payment", entity_id=1, action="UPDATE", changes=json.dumps({"status": "completed"}), user_id=cast(int, user.id)
+            entity_type="Payment", entity_id=1, action="UPDATE", changes={"status": "completed"}, user_id=cast(int, user.id)
         )
         db.add(audit)
         db.commit()
@@ -323,3 +326,509 @@ class TestRepositorySoftDeleteFilters:
         # Should not include deleted payment
         assert not any(p.id == payment2.id for p in active_payments)
         assert any(p.id == payment1.id for p in active_payments)
+
+
+class TestAuditPipeline:
+    """Test the batched audit writer."""
+
+    @pytest.fixture
+    def audit_engine(self):
+        """A private in-memory database, so sessions can commit and roll back freely."""
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        yield engine
+        engine.dispose()
+
+    def test_update_written_in_same_transaction(self, db: Session) -> None:
+        """Inserts and updates produce audit rows without a separate session."""
+        user = User(email="pipeline@example.com", hashed_password="hashed", full_name="Before")
+        db.add(user)
+        db.commit()
+        user.full_name = "After"
+        db.commit()
+
+        logs = (
+            db.query(AuditLog)
+            .filter(AuditLog.entity_type == "User", AuditLog.entity_id == user.id)
+            .order_by(AuditLog.id)
+            .all()
+        )
+        assert [log.action for log in logs] == ["INSERT", "UPDATE"]
+        assert logs[1].changes["full_name"]["new"] == "After"
+
+    def test_update_diff_is_typed_and_limited_to_modified_columns(self, db: Session) -> None:
+        """Only modified audited columns appear in the diff, serialized by type."""
+        from app.models.audit_listeners import extract_changes
+        from app.models.payment import PaymentStatus, PlanType
+
+        user = User(email="typed@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+        payment = Payment(
+            user_id=user.id,
+            stripe_payment_id="pi_typed",
+            amount=999,
+            status=PaymentStatus.PENDING,
+            plan_type=PlanType.BASIC,
+            book_title="Book",
+            book_author="Author",
+        )
+        db.add(payment)
+        db.commit()
+        db.refresh(payment)
+
+        payment.status = PaymentStatus.COMPLETED
+        payment.amount = 1999
+        payment.updated_at = datetime(2024, 1, 1)
+
+        assert extract_changes(payment) == {
+            "status": {"old": "pending", "new": "completed"},
+            "amount": {"old": 999, "new": 1999},
+        }
+
+    def test_audited_columns_exclude_bookkeeping(self) -> None:
+        """The audited column set is precomputed without id and timestamps."""
+        from sqlalchemy import inspect
+
+        from app.models.audit_listeners import _audited_attributes
+
+        audited = _audited_attributes[inspect(Payment)]
+        assert "status" in audited
+        assert not {"id", "created_at", "updated_at"} & set(audited.values())
+
+    def test_secret_columns_never_reach_changes(self, db: Session) -> None:
+        """Password hashes and client secrets stay out of INSERT, UPDATE and SNAPSHOT rows."""
+        from app.models.audit_listeners import SECRET_COLUMNS, snapshot_counter
+        from app.models.payment import PaymentStatus, PlanType
+
+        user = User(email="secret@example.com", hashed_password="hashed", full_name="Secret")
+        db.add(user)
+        db.commit()
+        payment = Payment(
+            user_id=user.id,
+            stripe_payment_id="pi_secret",
+            amount=999,
+            status=PaymentStatus.PENDING,
+            plan_type=PlanType.BASIC,
+            book_title="Book",
+            book_author="Author",
+            client_secret="pi_secret_abc",
+        )
+        db.add(payment)
+        db.commit()
+
+        for round_number in range(snapshot_counter.interval + 1):
+            user.hashed_password = f"rehashed-{round_number}"
+            user.full_name = f"Secret {round_number}"
+            payment.client_secret = f"pi_secret_{round_number}"
+            payment.amount = 1000 + round_number
+            db.commit()
+
+        logs = db.query(AuditLog).filter(AuditLog.entity_id.in_([user.id, payment.id])).all()
+        assert {log.action for log in logs} >= {"INSERT", "UPDATE", "SNAPSHOT"}
+        secrets = set().union(*SECRET_COLUMNS.values())
+        for log in logs:
+            assert not secrets & set(log.changes or {})
+
+    def test_write_path_reads_nothing_back(self, audit_engine) -> None:
+        """INSERT state comes from the flush and snapshot counting needs no COUNT over audit_logs."""
+        from sqlalchemy import event, inspect
+
+        from app.models.audit_listeners import entity_state, snapshot_counter
+
+        statements = []
+
+        def record(conn, cursor, sql, *args) -> None:
+            statements.append(sql)
+
+        event.listen(audit_engine, "before_cursor_execute", record)
+        session = sessionmaker(bind=audit_engine)()
+        try:
+            user = User(email="flush-only@example.com", hashed_password="hashed")
+            session.add(user)
+            session.commit()
+            assert not [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+            insert_log = session.query(AuditLog).filter(AuditLog.action == "INSERT").one()
+            current = entity_state(inspect(User), session.connection(), user)
+            assert {name: change["new"] for name, change in insert_log.changes.items()} == current
+
+            snapshot_counter.clear()
+            statements.clear()
+            user.full_name = "Updated"
+            session.commit()
+            assert not [sql for sql in statements if "count(" in sql.lower()]
+        finally:
+            session.close()
+            event.remove(audit_engine, "before_cursor_execute", record)
+
+    def test_rollback_discards_audit_entries(self, audit_engine) -> None:
+        """Entries queued by a rolled-back flush are never written."""
+        session = sessionmaker(bind=audit_engine)()
+        try:
+            session.add(User(email="rollback@example.com", hashed_password="hashed"))
+            session.flush()
+            session.rollback()
+
+            assert session.query(AuditLog).count() == 0
+            assert "audit_pending" not in session.info
+        finally:
+            session.close()
+
+    def test_background_mode_follows_the_outer_transaction(self, audit_engine, monkeypatch) -> None:
+        """Savepoints neither hand entries to the writer early nor drop the outer transaction's."""
+        from app.models.audit_listeners import audit_writer
+
+        queued = []
+        monkeypatch.setattr(settings, "AUDIT_WRITE_MODE", "background")
+        monkeypatch.setattr(audit_writer, "enqueue", queued.extend)
+        session = sessionmaker(bind=audit_engine)()
+        try:
+            session.add(User(email="outer@example.com", hashed_password="hashed"))
+            session.flush()
+            with session.begin_nested():
+                session.add(User(email="released@example.com", hashed_password="hashed"))
+            assert queued == []
+
+            savepoint = session.begin_nested()
+            session.add(User(email="rolled-back@example.com", hashed_password="hashed"))
+            session.flush()
+            savepoint.rollback()
+            session.commit()
+            assert sorted(entry["changes"]["email"]["new"] for entry in queued) == [
+                "outer@example.com",
+                "released@example.com",
+            ]
+
+            queued.clear()
+            with session.begin_nested():
+                session.add(User(email="never-committed@example.com", hashed_password="hashed"))
+            session.rollback()
+            assert queued == []
+        finally:
+            session.close()
+
+    def test_background_writer_flushes_on_stop(self, audit_engine, monkeypatch) -> None:
+        """The background writer batches queued entries and drains them on shutdown."""
+        from app.models import audit_listeners
+        from app.models.audit_listeners import AuditWriter, build_audit_entry
+
+        factory = sessionmaker(bind=audit_engine)
+        monkeypatch.setattr(audit_listeners, "_session_factory", factory)
+
+        writer = AuditWriter(max_entries=2, batch_size=10, flush_interval=60)
+        # three entries into a two-slot queue: the overflow is written synchronously
+        writer.enqueue([build_audit_entry("Payment", i, "UPDATE") for i in range(3)])
+        writer.stop()
+
+        session = factory()
+        try:
+            assert session.query(AuditLog).count() == 3
+        finally:
+            session.close()
+        assert writer.pending() == 0
+
+
+class TestAuditChangeQueries:
+    """Test field-level queries on the JSON changes column."""
+
+    @staticmethod
+    def _log(db: Session, entity_id: int, changes: dict, created_at: datetime) -> None:
+        log = AuditLog(entity_type="Payment", entity_id=entity_id, action="UPDATE", changes=changes)
+        log.created_at = created_at
+        db.add(log)
+
+    def test_find_changes_by_new_value(self, db: Session) -> None:
+        """Only entries that set the field to the value, inside the window, are returned."""
+        refunded = {"status": {"old": "completed", "new": "refunded"}}
+        self._log(db, 1, refunded, datetime(2024, 3, 1))
+        self._log(db, 2, refunded, datetime(2024, 3, 5))
+        self._log(db, 3, {"status": {"old": "pending", "new": "completed"}}, datetime(2024, 3, 6))
+        self._log(db, 4, refunded, datetime(2024, 1, 1))
+        self._log(db, 5, {"amount": {"old": 100, "new": 200}}, datetime(2024, 3, 7))
+        db.commit()
+
+        page = AuditService.find_changes(
+            db, "status", new_value="refunded", entity_type="Payment", since=datetime(2024, 2, 28)
+        )
+
+        assert [log.entity_id for log in page.items] == [2, 1]
+
+    def test_find_changes_by_field_and_numeric_value(self, db: Session) -> None:
+        """Field presence and non-string values are matched in the database."""
+        self._log(db, 1, {"amount": {"old": 100, "new": 200}}, datetime(2024, 3, 1))
+        self._log(db, 2, {"status": {"old": "pending", "new": "completed"}}, datetime(2024, 3, 2))
+        db.commit()
+
+        assert [log.entity_id for log in AuditService.find_changes(db, "amount").items] == [1]
+        assert [log.entity_id for log in AuditService.find_changes(db, "amount", old_value=100).items] == [1]
+        assert AuditService.find_changes(db, "amount", new_value=100).items == []
+
+    def test_status_query_uses_expression_index(self, db: Session) -> None:
+        """On SQLite the status predicate is served by the json_extract expression index."""
+        from sqlalchemy import select
+
+        condition = AuditService._change_condition(db, "status", "new", "refunded")
+        compiled = select(AuditLog.id).where(condition).compile(db.get_bind())
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", ("refunded",)).all()
+
+        assert "ix_audit_logs_status_change" in " ".join(str(row) for row in plan)
+
+    def test_rejects_unsafe_field_names(self, db: Session) -> None:
+        """Field names are spliced into JSON paths, so anything but an identifier is refused."""
+        with pytest.raises(ValueError):
+            AuditService.find_changes(db, "status' OR 1=1 --", new_value="x")
+
+
+class TestPointInTimeReconstruction:
+    """Test rebuilding entity state from snapshots and deltas."""
+
+    @pytest.fixture(autouse=True)
+    def snapshot_every_two_updates(self, monkeypatch):
+        from app.models.audit_listeners import snapshot_counter
+
+        monkeypatch.setattr(snapshot_counter, "interval", 2)
+        snapshot_counter.clear()
+        yield
+        snapshot_counter.clear()
+
+    @staticmethod
+    def _payment_with_history(db: Session) -> tuple:
+        from app.models.payment import PaymentStatus, PlanType
+
+        user = User(email="asof@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+        before_creation = datetime.utcnow()
+        payment = Payment(
+            user_id=user.id,
+            stripe_payment_id="pi_asof",
+            amount=1000,
+            status=PaymentStatus.PENDING,
+            plan_type=PlanType.BASIC,
+            book_title="Book",
+            book_author="Author",
+        )
+        db.add(payment)
+        db.commit()
+        times = [before_creation, datetime.utcnow()]
+        for change in ({"amount": 2000}, {"amount": 3000}, {"status": PaymentStatus.COMPLETED}):
+            db.refresh(payment)  # load committed values so each diff records its old value
+            for field, value in change.items():
+                setattr(payment, field, value)
+            db.commit()
+            times.append(datetime.utcnow())
+        return payment, times
+
+    def test_as_of_replays_from_latest_snapshot(self, db: Session) -> None:
+        """Each point in time sees the values committed before it."""
+        payment, times = self._payment_with_history(db)
+
+        states = [AuditService.get_entity_as_of(db, "Payment", payment.id, at) for at in times]
+
+        assert states[0] is None
+        assert [state["amount"] for state in states[1:]] == [1000, 2000, 3000, 3000]
+        assert states[3]["status"] == "pending"
+        assert states[4]["status"] == "completed"
+        assert states[4]["book_title"] == "Book"
+        snapshots = db.query(AuditLog).filter(AuditLog.action == "SNAPSHOT").all()
+        assert [snapshot.changes["amount"] for snapshot in snapshots] == [3000]
+
+    def test_as_of_without_recorded_state_undoes_later_updates(self, db: Session) -> None:
+        """Entities audited before states were recorded are rebuilt backwards from the current row."""
+        payment, times = self._payment_with_history(db)
+        # Legacy rows: INSERTs without state and no snapshots
+        db.query(AuditLog).filter(AuditLog.action == "INSERT").update(
+            {AuditLog.changes: null()}, synchronize_session=False
+        )
+        db.query(AuditLog).filter(AuditLog.action == "SNAPSHOT").delete()
+        db.commit()
+
+        state = AuditService.get_entity_as_of(db, "Payment", payment.id, times[1])
+
+        assert state is not None
+        assert state["amount"] == 1000
+        assert state["status"] == "pending"
+        assert AuditService.get_entity_as_of(db, "Payment", payment.id, times[0]) is None
+
+
+class TestSoftDeleteCriteria:
+    """Test the automatic soft-delete filter and its opt-outs."""
+
+    @staticmethod
+    def _user_with_payments(db: Session) -> User:
+        from app.models.payment import PlanType
+
+        user = User(email="criteria@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+        for index in range(2):
+            db.add(
+                Payment(
+                    user_id=user.id,
+                    stripe_payment_id=f"pi_criteria_{index}",
+                    amount=1000,
+                    plan_type=PlanType.BASIC,
+                    book_title="Book",
+                    book_author="Author",
+                    deleted_at=datetime.utcnow() if index else None,
+                )
+            )
+        db.commit()
+        return user
+
+    def test_queries_hide_soft_deleted_rows(self, db: Session) -> None:
+        """Plain queries and relationship loads exclude soft-deleted rows."""
+        user_id = self._user_with_payments(db).id
+        db.expunge_all()
+
+        assert [p.stripe_payment_id for p in db.query(Payment).all()] == ["pi_criteria_0"]
+        loaded = db.query(User).filter(User.id == user_id).one()
+        assert [p.stripe_payment_id for p in loaded.payments] == ["pi_criteria_0"]
+
+    def test_include_deleted_opt_out(self, db: Session) -> None:
+        """The include_deleted execution option and session flag both disable the filter."""
+        self._user_with_payments(db)
+
+        assert db.query(Payment).execution_options(include_deleted=True).count() == 2
+        db.info["include_deleted"] = True
+        try:
+            assert db.query(Payment).count() == 2
+        finally:
+            del db.info["include_deleted"]
+
+
+class TestBulkOperations:
+    """Test set-based soft delete, restore and purge."""
+
+    @staticmethod
+    def _users(db: Session, count: int) -> list:
+        users = [User(email=f"bulk{index}@example.com", hashed_password="hashed") for index in range(count)]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+    def test_bulk_soft_delete_in_batches(self, db: Session) -> None:
+        """Every batch is one UPDATE; already deleted and unknown ids are skipped."""
+        ids = self._users(db, 5)
+        AuditService.soft_delete(db, User, ids[0])
+
+        deleted = AuditService.bulk_soft_delete(db, User, ids + [9999], user_id=7, batch_size=2)
+
+        assert deleted == ids[1:]
+        assert db.query(User).count() == 0
+        logs = (
+            db.query(AuditLog)
+            .filter(AuditLog.entity_type == "User", AuditLog.user_id == 7, AuditLog.action == "UPDATE")
+            .all()
+        )
+        assert sorted(log.entity_id for log in logs) == ids[1:]
+        assert all(log.changes["deleted_at"]["old"] is None for log in logs)
+
+    def test_bulk_restore_records_previous_timestamp(self, db: Session) -> None:
+        """Restored rows are visible again and the audit diff keeps the old deleted_at."""
+        ids = self._users(db, 3)
+        AuditService.bulk_soft_delete(db, User, ids[:2])
+
+        restored = AuditService.bulk_restore(db, User, ids)
+
+        assert restored == ids[:2]
+        assert db.query(User).count() == 3
+        log = (
+            db.query(AuditLog)
+            .filter(AuditLog.entity_id == ids[0], AuditLog.entity_type == "User", AuditLog.action == "UPDATE")
+            .order_by(AuditLog.id.desc())
+            .first()
+        )
+        assert log.changes["deleted_at"]["old"] is not None
+        assert log.changes["deleted_at"]["new"] is None
+
+    def test_bulk_soft_delete_syncs_loaded_objects(self, db: Session) -> None:
+        """Objects already in the session reflect the bulk UPDATE."""
+        user = User(email="loaded@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+
+        AuditService.bulk_soft_delete(db, User, [user.id])
+
+        assert user.is_deleted
+
+    def test_bulk_purge_cascades_in_database(self) -> None:
+        """Purging users removes their payments through ON DELETE CASCADE without loading them."""
+        from sqlalchemy import event
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        try:
+            user = User(email="erase@example.com", hashed_password="hashed")
+            session.add(user)
+            session.commit()
+            session.add(
+                Payment(
+                    user_id=user.id,
+                    stripe_payment_id="pi_erase",
+                    amount=1000,
+                    plan_type="basic",
+                    book_title="Book",
+                    book_author="Author",
+                )
+            )
+            session.commit()
+            user_id = user.id
+
+            payment_id = session.query(Payment.id).scalar()
+
+            assert AuditService.bulk_purge(session, User, [user_id]) == [user_id]
+            assert session.query(Payment).execution_options(include_deleted=True).count() == 0
+            logs = session.query(AuditLog).filter(AuditLog.action == "DELETE").all()
+            assert {(log.entity_type, log.entity_id) for log in logs} == {("User", user_id), ("Payment", payment_id)}
+            # INSERT rows held the full state of both entities
+            assert session.query(AuditLog).filter(AuditLog.changes.isnot(None)).count() == 0
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_bulk_purge_removes_archived_rows(self) -> None:
+        """Archived copies of a purged user and its payments are deleted and audited too."""
+        from sqlalchemy import event, func, select
+
+        from app.models.archive import payments_archive, users_archive
+        from app.services.archive_service import ArchiveService
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        try:
+            user = User(email="archived@example.com", hashed_password="hashed", full_name="Archived")
+            session.add(user)
+            session.commit()
+            session.add(
+                Payment(
+                    user_id=user.id,
+                    stripe_payment_id="pi_archived",
+                    amount=1000,
+                    plan_type="basic",
+                    book_title="Book",
+                    book_author="Author",
+                )
+            )
+            session.commit()
+            user_id = user.id
+            payment_id = session.query(Payment.id).scalar()
+            AuditService.soft_delete(session, User, user_id)
+            ArchiveService.archive_soft_deleted(session, grace_days=0, now=datetime.utcnow() + timedelta(days=1))
+            assert session.execute(select(func.count()).select_from(users_archive)).scalar() == 1
+
+            assert AuditService.bulk_purge(session, User, [user_id]) == [user_id]
+
+            for archive in (users_archive, payments_archive):
+                assert session.execute(select(func.count()).select_from(archive)).scalar() == 0
+            deleted = session.query(AuditLog).filter(AuditLog.action == "DELETE").all()
+            assert {(log.entity_type, log.entity_id) for log in deleted} == {("User", user_id), ("Payment", payment_id)}
+            assert session.query(AuditLog).filter(AuditLog.changes.isnot(None)).count() == 0
+        finally:
+            session.close()
+            engine.dispose()
@@ -0,0 +1,126 @@
+"""Tests for audit log retention and archival."""
+
+import gzip
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.models.audit import AuditLog
+from app.services.audit_retention_service import AuditRetentionService, add_months, archive_path
+from app.services.audit_service import AuditService
+
+
+def _audit(db: Session, entity_id: int, created_at: datetime) -> AuditLog:
+    log = AuditLog(entity_type="Payment", entity_id=entity_id, action="UPDATE", created_at=created_at)
+    db.add(log)
+    return log
+
+
+class TestAuditRetention:
+    """Test the rolling-window archival used on SQLite."""
+
+    def test_archive_moves_expired_rows_to_monthly_files(self, db: Session, tmp_path) -> None:
+        """Expired rows are exported per month in batches and deleted from the hot table."""
+        _audit(db, 1, datetime(2024, 1, 5))
+        _audit(db, 2, datetime(2024, 1, 20))
+        _audit(db, 3, datetime(2024, 2, 3))
+        _audit(db, 4, datetime(2024, 6, 1))
+        db.commit()
+
+        result = AuditRetentionService.archive_expired(
+            db, retention_days=30, archive_dir=str(tmp_path), batch_size=1, now=datetime(2024, 6, 10)
+        )
+
+        assert result.archived_rows == 3
+        assert result.files == [
+            archive_path(str(tmp_path), datetime(2024, 1, 1)),
+            archive_path(str(tmp_path), datetime(2024, 2, 1)),
+        ]
+        with gzip.open(result.files[0], "rt") as archive:
+            rows = [json.loads(line) for line in archive]
+        assert [row["entity_id"] for row in rows] == [1, 2]
+        assert rows[0]["created_at"] == "2024-01-05T00:00:00"
+        assert [log.entity_id for log in db.query(AuditLog).all()] == [4]
+
+    def test_archive_appends_to_partially_archived_month(self, db: Session, tmp_path) -> None:
+        """A month archived across two runs stays one readable file."""
+        _audit(db, 1, datetime(2024, 1, 5))
+        _audit(db, 2, datetime(2024, 1, 25))
+        db.commit()
+
+        for now in (datetime(2024, 1, 10), datetime(2024, 2, 1)):
+            AuditRetentionService.archive_expired(db, retention_days=0, archive_dir=str(tmp_path), now=now)
+
+        with gzip.open(archive_path(str(tmp_path), datetime(2024, 1, 1)), "rt") as archive:
+            assert [json.loads(line)["entity_id"] for line in archive] == [1, 2]
+        assert db.query(AuditLog).count() == 0
+
+    def test_nothing_to_archive(self, db: Session, tmp_path) -> None:
+        """A run with no expired rows writes no files."""
+        _audit(db, 1, datetime.utcnow())
+        db.commit()
+
+        result = AuditRetentionService.archive_expired(db, retention_days=30, archive_dir=str(tmp_path))
+
+        assert result.archived_rows == 0
+        assert os.listdir(tmp_path) == []
+
+    def test_partitioning_is_postgres_only(self, db: Session) -> None:
+        """SQLite never reports partitions, so maintenance is a no-op."""
+        assert AuditRetentionService.is_partitioned(db) is False
+        assert AuditRetentionService.ensure_partitions(db) == []
+
+    def test_stranded_default_rows_get_their_own_partition(self, monkeypatch) -> None:
+        """Rows in the default partition are moved out before their month's partition is created."""
+        statements = []
+
+        class RecordingSession:
+            def execute(self, statement):
+                statements.append(str(statement))
+
+            def commit(self):
+                statements.append("COMMIT")
+
+        current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        stranded = add_months(current, -3)
+        monkeypatch.setattr(AuditRetentionService, "is_partitioned", staticmethod(lambda db: True))
+        monkeypatch.setattr(AuditRetentionService, "list_partitions", staticmethod(lambda db: []))
+        monkeypatch.setattr(AuditRetentionService, "default_partition_months", staticmethod(lambda db: [stranded]))
+
+        created = AuditRetentionService.ensure_partitions(RecordingSession(), months_ahead=0)
+
+        assert created == [f"audit_logs_p{stranded:%Y%m}", f"audit_logs_p{current:%Y%m}"]
+        assert statements[0] == "ALTER TABLE audit_logs DETACH PARTITION audit_logs_default"
+        assert statements[1].startswith(f"CREATE TABLE audit_logs_p{stranded:%Y%m} PARTITION OF audit_logs")
+        assert statements[3].startswith("INSERT INTO audit_logs (")
+        assert statements[3].endswith("FROM audit_logs_default")
+        assert statements[4:] == [
+            "DELETE FROM audit_logs_default",
+            "ALTER TABLE audit_logs ATTACH PARTITION audit_logs_default DEFAULT",
+            "COMMIT",
+        ]
+
+    def test_add_months_wraps_years(self) -> None:
+        assert add_months(datetime(2024, 11, 15), 3) == datetime(2025, 2, 1)
+        assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+
+
+class TestAuditHistoryWindow:
+    """Test date-bounded audit history queries."""
+
+    def test_entity_history_respects_window(self, db: Session) -> None:
+        """since/until restrict results to the requested range."""
+        _audit(db, 7, datetime(2024, 1, 1))
+        _audit(db, 7, datetime(2024, 3, 1))
+        _audit(db, 7, datetime(2024, 5, 1))
+        db.commit()
+
+        logs = AuditService.get_entity_audit_history(
+            db, "Payment", 7, since=datetime(2024, 2, 1), until=datetime(2024, 5, 1)
+        )
+        page = AuditService.get_entity_audit_history_page(db, "Payment", 7, since=datetime(2024, 2, 1))
+
+        assert [log.created_at for log in logs] == [datetime(2024, 3, 1)]
+        assert [log.created_at for log in page.items] == [datetime(2024, 5, 1), datetime(2024, 3, 1)]
@@ -0,0 +1,78 @@
+"""Tests for read/write session routing."""
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import database
+from app.core.database import RoutingSession, begin_request_routing, end_request_routing, is_request_pinned_to_primary
+from app.models.user import User
+
+
+def _sqlite_engine():
+    return create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    """Primary and replica engines wired into a RoutingSession factory."""
+    primary = _sqlite_engine()
+    replica = _sqlite_engine()
+    monkeypatch.setattr(database, "_replica_cycle", iter([replica] * 100))
+    factory = sessionmaker(class_=RoutingSession, autoflush=False, bind=primary)
+    return factory, primary, replica
+
+
+class TestRoutingSession:
+    """Test replica routing decisions."""
+
+    def test_read_only_select_uses_replica(self, routing) -> None:
+        """SELECTs from a read-only session go to the replica."""
+        factory, primary, replica = routing
+        session = factory(info={"read_only": True})
+        assert session.get_bind(clause=select(User)) is replica
+
+    def test_default_session_uses_primary(self, routing) -> None:
+        """Sessions not marked read-only never touch the replica."""
+        factory, primary, replica = routing
+        session = factory()
+        assert session.get_bind(clause=select(User)) is primary
+
+    def test_non_select_uses_primary(self, routing) -> None:
+        """Textual and DML statements stay on the primary."""
+        factory, primary, replica = routing
+        session = factory(info={"read_only": True})
+        assert session.get_bind(clause=text("SELECT 1")) is primary
+
+    def test_session_sticks_to_primary_after_write(self, routing) -> None:
+        """A session that flushed a write reads its own writes from the primary."""
+        factory, primary, replica = routing
+        session = factory(info={"read_only": True})
+        session.info["wrote"] = True
+        assert session.get_bind(clause=select(User)) is primary
+
+    def test_request_pinned_after_commit(self, routing) -> None:
+        """Committing a write pins the rest of the request to the primary."""
+        factory, primary, replica = routing
+        token = begin_request_routing()
+        try:
+            writer = factory()
+            writer.info["wrote"] = True
+            database._pin_after_commit(writer)
+            assert is_request_pinned_to_primary()
+
+            reader = factory(info={"read_only": True})
+            assert reader.get_bind(clause=select(User)) is primary
+        finally:
+            end_request_routing(token)
+        assert not is_request_pinned_to_primary()
+
+
+def test_every_sqlite_engine_enforces_foreign_keys() -> None:
+    """Replica engines get the same connect-time pragmas as the primary."""
+    for name in ("primary", "replica0"):
+        created = database._create_engine("sqlite:///:memory:", name)
+        with created.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        created.dispose()
@@ -0,0 +1,110 @@
+"""Tests for streaming exports."""
+
+import csv
+import io
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.main import app
+from app.models.audit import AuditLog
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.routes.admin import get_export_session_factory
+from app.services.export_service import PAYMENT_EXPORT_COLUMNS, ExportService
+
+
+def _factory(db: Session):
+    @contextmanager
+    def session_factory():
+        yield db
+
+    return session_factory
+
+
+def _seed_payments(db: Session) -> User:
+    user = User(email="export@example.com", hashed_password="hashed")
+    db.add(user)
+    db.commit()
+    for index, status in enumerate([PaymentStatus.COMPLETED, PaymentStatus.PENDING, PaymentStatus.COMPLETED]):
+        db.add(
+            Payment(
+                user_id=user.id,
+                stripe_payment_id=f"pi_export_{index}",
+                amount=1000 + index,
+                status=status,
+                plan_type=PlanType.BASIC,
+                book_title=f"Book {index}",
+                book_author="Author",
+            )
+        )
+    db.commit()
+    return user
+
+
+class TestExportService:
+    """Test chunked CSV and NDJSON rendering."""
+
+    def test_payments_csv_streams_in_chunks(self, db: Session) -> None:
+        """A header chunk is followed by one chunk per cursor batch."""
+        _seed_payments(db)
+
+        chunks = list(
+            ExportService.stream_payments(
+                "csv", status=PaymentStatus.COMPLETED, chunk_rows=1, session_factory=_factory(db)
+            )
+        )
+
+        assert len(chunks) == 3
+        rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+        assert [row["stripe_payment_id"] for row in rows] == ["pi_export_0", "pi_export_2"]
+        assert rows[0]["status"] == "completed"
+
+    def test_payments_exclude_secrets(self, db: Session) -> None:
+        """Only allow-listed columns are exported; client secrets and idempotency keys are not."""
+        user = _seed_payments(db)
+        db.query(Payment).filter(Payment.user_id == user.id).update(
+            {Payment.client_secret: "pi_secret_value", Payment.idempotency_key: "checkout-key"}
+        )
+        db.commit()
+
+        text = "".join(ExportService.stream_payments("ndjson", session_factory=_factory(db)))
+        lines = [json.loads(line) for line in text.splitlines()]
+
+        assert list(lines[0]) == list(PAYMENT_EXPORT_COLUMNS)
+        assert "pi_secret_value" not in text and "checkout-key" not in text
+
+    def test_audit_logs_ndjson(self, db: Session) -> None:
+        """Every line is one JSON object with native JSON changes."""
+        db.add(AuditLog(entity_type="Payment", entity_id=1, action="UPDATE", changes={"amount": {"old": 1, "new": 2}}))
+        db.add(AuditLog(entity_type="User", entity_id=1, action="UPDATE", changes={"is_active": {"old": 1, "new": 0}}))
+        db.commit()
+
+        chunks = ExportService.stream_audit_logs("ndjson", entity_type="Payment", session_factory=_factory(db))
+        lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+
+        assert [line["entity_type"] for line in lines] == ["Payment"]
+        assert lines[0]["changes"] == {"amount": {"old": 1, "new": 2}}
+        assert datetime.fromisoformat(lines[0]["created_at"])
+
+    def test_rejects_unknown_format(self) -> None:
+        with pytest.raises(ValueError):
+            ExportService.stream_payments("xml")
+
+
+def test_export_endpoint_streams_csv(client, db: Session, monkeypatch) -> None:
+    """Admins get a CSV attachment."""
+    _seed_payments(db)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+    app.dependency_overrides[get_export_session_factory] = lambda: _factory(db)
+
+    response = client.get("/api/v1/admin/export/payments", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    assert len(list(csv.DictReader(io.StringIO(response.text)))) == 3
@@ -0,0 +1,93 @@
+"""Tests for metrics collection and the /metrics endpoint."""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CHECKOUTS,
+    DB_POOL_SIZE,
+    DB_POOL_UTILIZATION,
+    DB_QUERY_DURATION,
+    REGISTRY,
+    Counter,
+    Histogram,
+    InstrumentedQueuePool,
+    instrument_engine,
+    statement_operation,
+)
+
+
+class TestMetricTypes:
+    """Test the metric primitives and text rendering."""
+
+    def test_counter_renders_labels(self) -> None:
+        """Counters render one sample per label set."""
+        counter = Counter("test_events_total", "Test events.")
+        counter.inc(engine="primary")
+        counter.inc(2, engine="primary")
+        lines = counter.render()
+        assert "# TYPE test_events_total counter" in lines
+        assert 'test_events_total{engine="primary"} 3.0' in lines
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        """Histogram buckets accumulate and include +Inf, _sum and _count."""
+        histogram = Histogram("test_latency_seconds", "Test latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5.0)
+        lines = histogram.render()
+        assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'test_latency_seconds_bucket{le="1.0"} 2' in lines
+        assert 'test_latency_seconds_bucket{le="+Inf"} 3' in lines
+        assert "test_latency_seconds_count 3" in lines
+
+    def test_statement_operation(self) -> None:
+        """Statements are bucketed by their leading keyword."""
+        assert statement_operation("  select 1") == "SELECT"
+        assert statement_operation("INSERT INTO t VALUES (1)") == "INSERT"
+        assert statement_operation("PRAGMA foreign_keys=ON") == "OTHER"
+
+
+class TestEngineInstrumentation:
+    """Test engine event hooks feeding the registry."""
+
+    def test_pool_and_query_metrics(self) -> None:
+        """Checkouts, wait time, query latency and pool gauges are recorded."""
+        engine = create_engine(
+            "sqlite://", poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=1, pool_logging_name="test_pool"
+        )
+        instrument_engine(engine, "test_pool")
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            REGISTRY.render()
+            assert DB_POOL_UTILIZATION.value(engine="test_pool") == 1 / 3
+
+        assert DB_POOL_CHECKOUTS.value(engine="test_pool") >= 1
+        assert DB_POOL_CHECKOUT_WAIT.count(engine="test_pool") >= 1
+        assert DB_QUERY_DURATION.count(engine="test_pool", operation="SELECT") == 1
+        assert DB_POOL_SIZE.value(engine="test_pool") == 2
+
+    def test_failed_statements_leave_no_timing_state(self) -> None:
+        """A statement that raises leaves nothing behind on the pooled connection."""
+        engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_logging_name="test_errors")
+        instrument_engine(engine, "test_errors")
+
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+            assert conn.info == {}
+
+        assert DB_QUERY_DURATION.count(engine="test_errors", operation="SELECT") == 1
+
+
+def test_metrics_endpoint(client) -> None:
+    """/metrics serves Prometheus text."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE db_query_duration_seconds histogram" in response.text
@@ -0,0 +1,158 @@
+"""Tests for keyset pagination and signed cursors."""
+
+from datetime import datetime, timedelta
+from typing import cast
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_condition
+from app.core.query_helpers import QueryHelper
+from app.models.audit import AuditLog
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.schemas import PaymentResponse
+from app.models.user import User
+from app.repositories import PaymentRepository
+from app.services.audit_service import AuditService
+
+
+def _create_payments(db: Session, user: User, count: int, created_at: datetime) -> None:
+    for i in range(count):
+        db.add(
+            Payment(
+                user_id=user.id,
+                stripe_payment_id=f"pi_page_{i}",
+                amount=499,
+                status=PaymentStatus.PENDING,
+                plan_type=PlanType.BASIC,
+                book_title=f"Book {i}",
+                book_author="Author",
+                # pairs of identical timestamps exercise the id tie-breaker
+                created_at=created_at - timedelta(minutes=i // 2),
+            )
+        )
+    db.commit()
+
+
+class TestCursors:
+    """Test cursor encoding and verification."""
+
+    def test_round_trip(self) -> None:
+        """Datetimes and ints survive encoding."""
+        moment = datetime(2024, 5, 1, 12, 30)
+        cursor = encode_cursor([moment, 42], "payments:user:1")
+        assert decode_cursor(cursor, "payments:user:1", 2) == [moment, 42]
+
+    def test_tampered_cursor_rejected(self) -> None:
+        """Changing the payload invalidates the signature."""
+        cursor = encode_cursor([1], "scope")
+        body, signature = cursor.split(".")
+        forged = encode_cursor([999], "scope").split(".")[0] + "." + signature
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(forged, "scope", 1)
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor", "scope", 1)
+
+    def test_cursor_bound_to_scope(self) -> None:
+        """A cursor from one listing cannot be replayed against another."""
+        cursor = encode_cursor([1, 2], "payments:user:1")
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor, "payments:user:2", 2)
+
+
+class TestKeysetCondition:
+    """Test the predicate a cursor turns into."""
+
+    def test_leading_column_has_range_bound(self) -> None:
+        """The OR expansion is guarded by a plain bound on the leading column, for index range scans."""
+        moment = datetime(2024, 5, 1, 12, 30)
+        descending = keyset_condition(((Payment.created_at, True), (Payment.id, True)), (moment, 7))
+        ascending = keyset_condition(((Payment.created_at, False), (Payment.id, False)), (moment, 7))
+
+        assert str(descending).startswith("payments.created_at <= :created_at_1 AND (payments.created_at <")
+        assert str(ascending).startswith("payments.created_at >= :created_at_1 AND (payments.created_at >")
+        assert str(keyset_condition(((Payment.id, False),), (7,))) == "payments.id > :id_1"
+
+
+class TestKeysetPagination:
+    """Test paging through repositories and services."""
+
+    def test_user_payments_pages_cover_all_rows(self, db: Session) -> None:
+        """Walking every page returns each payment exactly once, newest first."""
+        user = User(email="pager@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+        _create_payments(db, user, 7, datetime(2024, 1, 1))
+
+        seen = []
+        cursor = None
+        while True:
+            page = PaymentRepository.get_user_payments_page(db, cast(int, user.id), cursor=cursor, limit=3)
+            seen.extend(page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert len(seen) == 7
+        assert len({p.id for p in seen}) == 7
+        keys = [(p.created_at, p.id) for p in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_history_projection_page(self, db: Session) -> None:
+        """The history read path returns response dicts without loading Payment objects."""
+        user = User(email="projection@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+        _create_payments(db, user, 3, datetime(2024, 1, 1))
+        user_id = cast(int, user.id)
+        db.expunge_all()
+
+        first = PaymentRepository.get_user_payment_history_page(db, user_id, limit=2)
+        rest = PaymentRepository.get_user_payment_history_page(db, user_id, cursor=first.next_cursor)
+
+        assert len(db.identity_map) == 0
+        assert set(first.items[0]) == set(PaymentResponse.model_fields)
+        items = first.items + rest.items
+        # Books 0 and 1 share a timestamp, so the id tie-breaker puts Book 1 first
+        assert [item["book_title"] for item in items] == ["Book 1", "Book 0", "Book 2"]
+        assert PaymentResponse(**items[0]).status == PaymentStatus.PENDING
+
+    def test_query_helper_page(self, db: Session) -> None:
+        """QueryHelper.get_page pages by primary key with filters applied."""
+        db.add_all([User(email=f"qh{i}@example.com", hashed_password="hashed", is_active=i % 2 == 0) for i in range(5)])
+        db.commit()
+
+        first = QueryHelper.get_page(db, User, {"is_active": True}, limit=2)
+        assert len(first.items) == 2
+        second = QueryHelper.get_page(db, User, {"is_active": True}, cursor=first.next_cursor, limit=2)
+        assert len(second.items) == 1
+        assert second.next_cursor is None
+        assert first.items[-1].id < second.items[0].id
+
+    def test_recent_audit_logs_page(self, db: Session) -> None:
+        """Audit log pages follow created_at descending."""
+        now = datetime.utcnow()
+        db.add_all(
+            [
+                AuditLog(entity_type="Report", entity_id=i, action="UPDATE", created_at=now - timedelta(hours=i))
+                for i in range(4)
+            ]
+        )
+        db.commit()
+
+        page = AuditService.get_recent_audit_logs_page(db, days=1, limit=3)
+        rest = AuditService.get_recent_audit_logs_page(db, days=1, cursor=page.next_cursor, limit=3)
+        ids = [log.entity_id for log in page.items + rest.items if log.entity_type == "Report"]
+        assert ids == [0, 1, 2, 3]
+
+
+def test_admin_audit_logs_requires_admin(client, monkeypatch) -> None:
+    """Non-admin users are rejected; admins get a page."""
+    response = client.get("/api/v1/admin/audit-logs")
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+    response = client.get("/api/v1/admin/audit-logs")
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "next_cursor": None}
@@ -0,0 +1,113 @@
+"""Tests for idempotent payment-intent creation."""
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import fake_stripe
+from app.core.database import Base, get_db
+from app.main import app
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.routes import payments
+from app.services.stripe_client import StripeClient
+
+PURCHASE = {"plan_type": "basic", "book_title": "Dune", "book_author": "Frank Herbert"}
+
+
+@pytest.fixture
+def fake_stripe_client(monkeypatch) -> None:
+    client = StripeClient(base_url="http://stripe.test", transport=httpx.ASGITransport(app=fake_stripe.app))
+    monkeypatch.setattr(payments, "stripe_client", client)
+
+
+def _create(client, body: dict = PURCHASE, key: str = None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post("/api/v1/payments/create-payment-intent", json=body, headers=headers)
+
+
+class TestCreatePaymentIntentIdempotency:
+    """Test pending-intent reuse through the route."""
+
+    def test_repeated_purchase_reuses_pending_intent(self, client, fake_stripe_client) -> None:
+        """A reload with the same plan and book returns the first intent without calling Stripe."""
+        intents_before = len(fake_stripe._intents)
+        first = _create(client).json()
+        again = _create(client, {**PURCHASE, "book_title": " dune "}).json()
+
+        assert again == first
+        assert len(fake_stripe._intents) == intents_before + 1
+
+    def test_client_keys(self, client, fake_stripe_client) -> None:
+        """Explicit keys separate purchases and cannot be replayed with another book."""
+        first = _create(client, key="checkout-1").json()
+        second = _create(client, key="checkout-2").json()
+        assert first["paymentId"] != second["paymentId"]
+        assert _create(client, key="checkout-1").json() == first
+
+        response = _create(client, {**PURCHASE, "book_title": "Emma"}, key="checkout-1")
+        assert response.status_code == 409
+
+    def test_stripe_key_scoped_to_pending_attempt(self, client, fake_stripe_client) -> None:
+        """A retry after a lost insert gets the same intent; the next purchase gets a new one."""
+        sessions = app.dependency_overrides[get_db]()
+        db = next(sessions)
+        intents_before = len(fake_stripe._intents)
+
+        first = _create(client, key="checkout-lost").json()
+        lost = db.get(Payment, first["paymentId"])
+        intent_id = lost.stripe_payment_id
+        db.query(Payment).filter(Payment.id == lost.id).delete()
+        db.commit()
+
+        retried = _create(client, key="checkout-lost").json()
+        payment = db.get(Payment, retried["paymentId"])
+        assert payment.stripe_payment_id == intent_id
+        assert len(fake_stripe._intents) == intents_before + 1
+
+        payment.status = PaymentStatus.COMPLETED
+        db.commit()
+        following = db.get(Payment, _create(client, key="checkout-lost").json()["paymentId"])
+        assert following.stripe_payment_id != intent_id
+        assert len(fake_stripe._intents) == intents_before + 2
+        sessions.close()
+
+
+def test_unique_index_covers_pending_payments_only() -> None:
+    """Two pending payments cannot share a key; a completed one frees it for the next purchase."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    user = User(email="idem@example.com", hashed_password="hashed")
+    db.add(user)
+    db.commit()
+
+    def payment(stripe_id: str) -> Payment:
+        return Payment(
+            user_id=user.id,
+            stripe_payment_id=stripe_id,
+            amount=499,
+            plan_type=PlanType.BASIC,
+            book_title="Book",
+            book_author="Author",
+            idempotency_key="key",
+        )
+
+    first = payment("pi_1")
+    db.add(first)
+    db.commit()
+    db.add(payment("pi_2"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    first.status = PaymentStatus.COMPLETED
+    db.add(payment("pi_3"))
+    db.commit()
+    assert db.query(Payment).count() == 2
+    db.close()
+    engine.dispose()
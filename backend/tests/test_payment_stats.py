@@ -0,0 +1,146 @@
+"""Tests for the incrementally maintained per-user payment summary."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.core.query_helpers import QueryHelper
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.payment_stats import UserPaymentStats
+from app.models.user import User
+from app.services.audit_service import AuditService
+from app.services.payment_stats_service import PaymentStatsService
+
+
+def _user(db: Session, email: str = "stats@example.com") -> User:
+    user = User(email=email, hashed_password="hashed")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _payment(db: Session, user: User, stripe_id: str, amount: int = 1000, **values) -> Payment:
+    payment = Payment(
+        user_id=user.id,
+        stripe_payment_id=stripe_id,
+        amount=amount,
+        plan_type=PlanType.BASIC,
+        book_title="Book",
+        book_author="Author",
+        **values,
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+def _stats_row(db: Session, user_id: int) -> tuple:
+    db.expire_all()
+    stats = db.get(UserPaymentStats, user_id)
+    return (stats.pending_count, stats.completed_count, stats.refunded_count, stats.total_cents)
+
+
+class TestIncrementalStats:
+    """Test that payment writes keep the summary row current."""
+
+    def test_insert_and_status_changes(self, db: Session) -> None:
+        """Inserts count per status; completion moves the count and adds the amount."""
+        user = _user(db)
+        first = _payment(db, user, "pi_1", amount=499)
+        _payment(db, user, "pi_2", amount=1499)
+        assert _stats_row(db, user.id) == (2, 0, 0, 0)
+
+        first.status = PaymentStatus.COMPLETED
+        db.commit()
+        assert _stats_row(db, user.id) == (1, 1, 0, 499)
+
+        first.status = PaymentStatus.REFUNDED
+        db.commit()
+        assert _stats_row(db, user.id) == (1, 0, 1, 0)
+        assert db.get(UserPaymentStats, user.id).last_purchase_at == first.created_at
+
+    def test_soft_delete_restore_and_hard_delete(self, db: Session) -> None:
+        """Soft-deleted payments drop out of the summary and come back on restore."""
+        user = _user(db)
+        payment = _payment(db, user, "pi_soft", status=PaymentStatus.COMPLETED)
+        assert _stats_row(db, user.id) == (0, 1, 0, 1000)
+
+        AuditService.soft_delete(db, Payment, payment.id)
+        assert _stats_row(db, user.id) == (0, 0, 0, 0)
+
+        AuditService.restore(db, Payment, payment.id)
+        assert _stats_row(db, user.id) == (0, 1, 0, 1000)
+
+        db.delete(payment)
+        db.commit()
+        assert _stats_row(db, user.id) == (0, 0, 0, 0)
+
+    def test_last_purchase_only_moves_forward(self, db: Session) -> None:
+        """Completing an older payment keeps the newer last purchase time."""
+        user = _user(db)
+        now = datetime.utcnow()
+        _payment(db, user, "pi_new", status=PaymentStatus.COMPLETED, created_at=now)
+        old = _payment(db, user, "pi_old", created_at=now - timedelta(days=3))
+
+        old.status = PaymentStatus.COMPLETED
+        db.commit()
+
+        db.expire_all()
+        assert db.get(UserPaymentStats, user.id).last_purchase_at == now
+
+
+class TestStatsReadsAndRebuild:
+    """Test the single-row reads and drift repair."""
+
+    def test_get_for_user_defaults_to_zero(self, db: Session) -> None:
+        user = _user(db)
+
+        summary = PaymentStatsService.get_for_user(db, user.id)
+
+        assert summary["total"] == 0 and summary["completed"] == 0 and summary["last_purchase_at"] is None
+
+    def test_bulk_writes_keep_stats_current(self, db: Session) -> None:
+        """Bulk statements bypass the listeners, so they rebuild the affected users' rows."""
+        user = _user(db)
+        _payment(db, user, "pi_tracked", status=PaymentStatus.COMPLETED)
+        row = {"user_id": user.id, "amount": 250, "plan_type": PlanType.BASIC, "book_title": "B", "book_author": "A"}
+        ids = QueryHelper.bulk_create(
+            db,
+            Payment,
+            [{**row, "stripe_payment_id": f"pi_bulk_{index}", "status": PaymentStatus.COMPLETED} for index in range(3)],
+        )
+        assert _stats_row(db, user.id) == (0, 4, 0, 1750)
+
+        QueryHelper.bulk_update(db, Payment, [{"id": ids[0], "status": PaymentStatus.REFUNDED}])
+        assert _stats_row(db, user.id) == (0, 3, 1, 1500)
+
+        AuditService.bulk_soft_delete(db, Payment, ids[1:])
+        assert _stats_row(db, user.id) == (0, 1, 1, 1000)
+
+        AuditService.bulk_restore(db, Payment, ids[1:2])
+        assert _stats_row(db, user.id) == (0, 2, 1, 1250)
+
+        AuditService.bulk_purge(db, Payment, ids[1:2])
+        assert _stats_row(db, user.id) == (0, 1, 1, 1000)
+
+    def test_rebuild_repairs_drift(self, db: Session) -> None:
+        """A rebuild recomputes the row from payments after writes outside the ORM."""
+        user = _user(db)
+        payment = _payment(db, user, "pi_drift", status=PaymentStatus.COMPLETED)
+        db.execute(Payment.__table__.update().where(Payment.__table__.c.id == payment.id).values(amount=250))
+        db.commit()
+        assert _stats_row(db, user.id) == (0, 1, 0, 1000)
+
+        assert PaymentStatsService.rebuild(db, user_ids=[user.id]) == 1
+
+        assert _stats_row(db, user.id) == (0, 1, 0, 250)
+        summary = PaymentStatsService.get_for_user(db, user.id)
+        assert summary["total"] == 1 and summary["total_cents"] == 250
+
+
+def test_payment_stats_endpoint(client) -> None:
+    """The account page reads the summary of the current user."""
+    response = client.get("/api/v1/payments/stats")
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
@@ -0,0 +1,231 @@
+"""Tests for the bulk write helpers of QueryHelper."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.query_helpers import QueryHelper
+from app.models.audit import AuditLog
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.repositories import PaymentRepository, UserRepository
+
+
+def _user_rows(count: int, prefix: str = "bulk") -> list:
+    return [
+        {"email": f"{prefix}{index}@example.com", "hashed_password": "hashed", "full_name": f"User {index}"}
+        for index in range(count)
+    ]
+
+
+class TestBulkCreate:
+    """Test executemany INSERT ... RETURNING."""
+
+    def test_returns_ids_in_order_and_applies_defaults(self, db: Session) -> None:
+        """Batches preserve row order and Python-side column defaults still apply."""
+        ids = QueryHelper.bulk_create(db, User, _user_rows(5), batch_size=2)
+
+        assert len(ids) == 5
+        users = {user.id: user for user in db.query(User).all()}
+        assert [users[user_id].email for user_id in ids] == [f"bulk{index}@example.com" for index in range(5)]
+        assert all(user.is_active and user.created_at is not None for user in users.values())
+
+    def test_writes_insert_audit_entries(self, db: Session) -> None:
+        """Audited models get one INSERT entry per row, as with single inserts."""
+        ids = QueryHelper.bulk_create(db, User, _user_rows(3))
+
+        logs = db.query(AuditLog).filter(AuditLog.entity_type == "User", AuditLog.action == "INSERT").all()
+        assert sorted(log.entity_id for log in logs) == sorted(ids)
+        assert logs[0].changes["email"]["old"] is None
+
+    def test_empty_input(self, db: Session) -> None:
+        assert QueryHelper.bulk_create(db, User, []) == []
+
+
+class TestBulkUpdate:
+    """Test executemany UPDATE by primary key."""
+
+    def test_updates_rows_and_audits_diffs(self, db: Session) -> None:
+        """Only real changes are audited, with the previous values read in one query."""
+        ids = QueryHelper.bulk_create(db, User, _user_rows(3))
+
+        updated = QueryHelper.bulk_update(
+            db,
+            User,
+            [
+                {"id": ids[0], "full_name": "Renamed"},
+                {"id": ids[1], "full_name": "User 1"},
+                {"id": 9999, "full_name": "Missing"},
+            ],
+        )
+
+        assert updated == 2
+        db.expire_all()
+        assert db.get(User, ids[0]).full_name == "Renamed"
+        logs = db.query(AuditLog).filter(AuditLog.action == "UPDATE").all()
+        assert [(log.entity_id, log.changes) for log in logs] == [
+            (ids[0], {"full_name": {"old": "User 0", "new": "Renamed"}})
+        ]
+
+
+class TestUpsert:
+    """Test INSERT ... ON CONFLICT DO UPDATE."""
+
+    def test_inserts_new_and_updates_existing(self, db: Session) -> None:
+        """Existing rows are matched on the conflict columns and updated in place."""
+        existing = QueryHelper.bulk_create(db, User, _user_rows(1))[0]
+
+        ids = QueryHelper.upsert(
+            db,
+            User,
+            [
+                {"email": "bulk0@example.com", "full_name": "Updated", "hashed_password": "hashed"},
+                {"email": "new@example.com", "full_name": "New", "hashed_password": "hashed"},
+            ],
+            conflict_columns=["email"],
+            update_columns=["full_name"],
+        )
+
+        assert ids[0] == existing
+        db.expire_all()
+        assert db.get(User, existing).full_name == "Updated"
+        assert db.query(User).count() == 2
+        snapshots = db.query(AuditLog).filter(AuditLog.action == "SNAPSHOT").all()
+        assert sorted(log.entity_id for log in snapshots) == sorted(ids)
+
+    def test_upsert_payments_by_stripe_id(self, db: Session) -> None:
+        """Enum columns round-trip through the ON CONFLICT update."""
+        user_id = QueryHelper.bulk_create(db, User, _user_rows(1))[0]
+        row = {
+            "user_id": user_id,
+            "stripe_payment_id": "pi_upsert",
+            "amount": 1000,
+            "plan_type": PlanType.BASIC,
+            "book_title": "Book",
+            "book_author": "Author",
+            "status": PaymentStatus.PENDING,
+        }
+        first = QueryHelper.upsert(db, Payment, [row], conflict_columns=["stripe_payment_id"])
+        second = QueryHelper.upsert(
+            db, Payment, [{**row, "status": PaymentStatus.COMPLETED}], conflict_columns=["stripe_payment_id"]
+        )
+
+        assert first == second
+        db.expire_all()
+        assert db.get(Payment, first[0]).status == PaymentStatus.COMPLETED
+
+    def test_unsupported_dialect_is_rejected(self, db: Session, monkeypatch) -> None:
+        """Databases without ON CONFLICT raise ValueError before anything is written."""
+        from types import SimpleNamespace
+
+        monkeypatch.setattr(
+            db, "get_bind", lambda *args, **kwargs: SimpleNamespace(dialect=SimpleNamespace(name="mysql"))
+        )
+
+        with pytest.raises(ValueError):
+            QueryHelper.upsert(db, User, _user_rows(1), conflict_columns=["email"])
+
+
+class TestCounts:
+    """Test direct and approximate counting."""
+
+    def test_count_is_a_direct_select(self, db: Session) -> None:
+        """Counts are one SELECT count(*) without a wrapping subquery and skip soft-deleted rows."""
+        QueryHelper.bulk_create(db, User, _user_rows(3))
+        QueryHelper.bulk_create(db, User, [{"email": "gone@example.com", "deleted_at": datetime.utcnow()}])
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            assert QueryHelper.count(db, User) == 3
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        assert statements[0].lower().count("select") == 1
+        assert QueryHelper.count(db, User, {"email": "bulk1@example.com"}) == 1
+        assert QueryHelper.count_where(db, User, include_deleted=True) == 4
+
+    def test_approximate_falls_back_to_exact(self, db: Session) -> None:
+        """Without planner statistics (SQLite) the approximate mode returns the exact count."""
+        QueryHelper.bulk_create(db, User, _user_rows(2))
+
+        assert QueryHelper.estimate_count(db, User) is None
+        assert QueryHelper.count(db, User, approximate=True) == 2
+
+    def test_repository_counts(self, db: Session) -> None:
+        """PaymentRepository counts through the same direct query, filters included."""
+        user_id = QueryHelper.bulk_create(db, User, _user_rows(1))[0]
+        payment = {
+            "user_id": user_id,
+            "amount": 100,
+            "plan_type": PlanType.BASIC,
+            "book_title": "Book",
+            "book_author": "Author",
+        }
+        QueryHelper.bulk_create(
+            db,
+            Payment,
+            [
+                {**payment, "stripe_payment_id": "pi_1", "status": PaymentStatus.COMPLETED},
+                {**payment, "stripe_payment_id": "pi_2", "status": PaymentStatus.PENDING},
+            ],
+        )
+
+        assert PaymentRepository.count_user_payments(db, user_id) == 2
+        assert PaymentRepository.count_user_payments(db, user_id, PaymentStatus.COMPLETED) == 1
+
+
+class TestPrebuiltLookups:
+    """Test the repository lookups backed by prebuilt statements."""
+
+    def test_user_by_email_respects_soft_delete(self, db: Session) -> None:
+        """Parameters are bound per call and the soft-delete filter still applies."""
+        QueryHelper.bulk_create(db, User, _user_rows(2))
+        QueryHelper.bulk_create(db, User, [{"email": "gone@example.com", "deleted_at": datetime.utcnow()}])
+
+        assert UserRepository.get_by_email(db, "bulk0@example.com").email == "bulk0@example.com"
+        assert UserRepository.get_by_email(db, "bulk1@example.com").email == "bulk1@example.com"
+        assert UserRepository.get_by_email(db, "gone@example.com") is None
+        assert UserRepository.get_by_email(db, "gone@example.com", include_deleted=True) is not None
+
+    def test_payment_lookups_load_user(self, db: Session) -> None:
+        """Payment lookups by id and Stripe id return the payment with its user loaded."""
+        user_id = QueryHelper.bulk_create(db, User, _user_rows(1))[0]
+        payment_id = QueryHelper.bulk_create(
+            db,
+            Payment,
+            [
+                {
+                    "user_id": user_id,
+                    "stripe_payment_id": "pi_lookup",
+                    "amount": 100,
+                    "status": PaymentStatus.PENDING,
+                    "plan_type": PlanType.BASIC,
+                    "book_title": "Book",
+                    "book_author": "Author",
+                }
+            ],
+        )[0]
+
+        payment = PaymentRepository.get_payment_by_stripe_id(db, "pi_lookup")
+        assert payment is not None and payment.id == payment_id
+        assert "user" in payment.__dict__
+        assert PaymentRepository.get_payment_with_user(db, payment_id).user.id == user_id
+        assert PaymentRepository.get_payment(db, payment_id) is payment
+        assert PaymentRepository.get_payment_by_stripe_id(db, "pi_missing") is None
+
+
+def test_admin_stats(client, monkeypatch) -> None:
+    """The stats endpoint reports totals and whether they are estimates."""
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+
+    response = client.get("/api/v1/admin/stats", params={"exact": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["approximate"] is False
+    assert set(body) >= {"users", "deleted_users", "payments", "deleted_payments", "audit_logs"}
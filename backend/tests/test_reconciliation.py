@@ -0,0 +1,129 @@
+"""Tests for the batch payment reconciliation job."""
+
+import calendar
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy.orm import Session
+
+import fake_stripe
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.services.reconciliation_service import RECONCILE_JOB, ReconciliationService
+from app.services.stripe_client import StripeClient
+from app.services.watermark_service import WatermarkService
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+class CountingTransport(httpx.ASGITransport):
+    """ASGI transport to the fake Stripe app that counts requests."""
+
+    def __init__(self) -> None:
+        super().__init__(app=fake_stripe.app)
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return await super().handle_async_request(request)
+
+
+@pytest.fixture
+def transport():
+    created = []
+
+    def add_intent(intent_id: str, status: str, created_at: datetime) -> None:
+        fake_stripe._intents[intent_id] = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "status": status,
+            "created": calendar.timegm(created_at.utctimetuple()),
+        }
+        created.append(intent_id)
+
+    counting = CountingTransport()
+    counting.add_intent = add_intent  # type: ignore[attr-defined]
+    yield counting
+    for intent_id in created:
+        fake_stripe._intents.pop(intent_id, None)
+
+
+def _payments(db: Session, count: int, created_at: datetime, prefix: str) -> list:
+    user = db.query(User).first()
+    if user is None:
+        user = User(email="reconcile@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+    rows = [
+        Payment(
+            user_id=user.id,
+            stripe_payment_id=f"{prefix}_{index}",
+            amount=499,
+            status=PaymentStatus.PENDING,
+            plan_type=PlanType.BASIC,
+            book_title="Book",
+            book_author="Author",
+            created_at=created_at,
+        )
+        for index in range(count)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+class TestReconcile:
+    """Test paging, bulk matching and the watermark."""
+
+    async def test_pages_and_applies_statuses(self, db: Session, transport) -> None:
+        """Hundreds of payments are reconciled with a few list calls, not one retrieve each."""
+        created_at = NOW - timedelta(hours=30)
+        rows = _payments(db, 250, created_at, "pi_rec")
+        for index in range(250):
+            status = "succeeded" if index % 5 else "canceled"
+            transport.add_intent(f"pi_rec_{index}", status, created_at + timedelta(seconds=index))
+        transport.add_intent("pi_elsewhere", "succeeded", created_at)
+        client = StripeClient(base_url="http://stripe.test", transport=transport)
+
+        try:
+            result = await ReconciliationService.reconcile(db, client=client, now=NOW)
+        finally:
+            await client.aclose()
+
+        assert result.intents == 251
+        assert result.updated == 250
+        assert len(result.completed_payment_ids) == 200
+        assert transport.requests == result.api_calls <= 5
+        db.expire_all()
+        assert {row.status for row in rows[1:5]} == {PaymentStatus.COMPLETED}
+        assert rows[0].status == PaymentStatus.FAILED
+        assert WatermarkService.get(db, RECONCILE_JOB) == NOW
+
+    async def test_resumes_from_watermark(self, db: Session, transport) -> None:
+        """A later run only lists the windows after the watermark, plus older PENDING payments."""
+        WatermarkService.advance(db, RECONCILE_JOB, NOW - timedelta(hours=2))
+        db.commit()
+
+        assert ReconciliationService.window_start(db, NOW) == NOW - timedelta(hours=2, minutes=10)
+
+        # An abandoned checkout older than RECONCILE_PENDING_MAX_AGE_HOURS does not hold the window back
+        _payments(db, 1, NOW - timedelta(days=10), "pi_abandoned")
+        assert ReconciliationService.window_start(db, NOW) == NOW - timedelta(hours=2, minutes=10)
+
+        stale = _payments(db, 1, NOW - timedelta(days=3), "pi_stale")[0]
+        transport.add_intent("pi_stale_0", "succeeded", NOW - timedelta(days=3))
+        assert ReconciliationService.window_start(db, NOW) == NOW - timedelta(days=3, minutes=10)
+        # Beyond the lookback period a PENDING payment no longer holds the window back
+        assert ReconciliationService.window_start(db, NOW + timedelta(days=60)) == NOW + timedelta(days=30)
+
+        client = StripeClient(base_url="http://stripe.test", transport=transport)
+        windows: list = []
+        try:
+            result = await ReconciliationService.reconcile(db, client=client, now=NOW, on_window=windows.append)
+        finally:
+            await client.aclose()
+
+        assert result.windows == 4
+        assert result.completed_payment_ids == [stale.id]
+        assert windows == [[stale.id]]
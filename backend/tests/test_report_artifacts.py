@@ -0,0 +1,198 @@
+"""Tests for the report artifact store and report download endpoints."""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.main import app
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.user import User
+from app.services.artifact_store import ArtifactStore, report_store
+from app.services.report_delivery_service import ReportDeliveryService
+
+CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch) -> ArtifactStore:
+    monkeypatch.setattr(report_store, "root", str(tmp_path / "reports"))
+    return report_store
+
+
+@pytest.fixture
+def session(client):
+    """Session on the database the client's requests use; unlike ``db`` it survives several requests."""
+    sessions = app.dependency_overrides[get_db]()
+    yield next(sessions)
+    sessions.close()
+
+
+def _write(tmp_path, name: str, content: bytes = CONTENT) -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def _payment(db: Session, store: ArtifactStore, tmp_path, user_id: int = 1, **overrides) -> Payment:
+    if db.get(User, user_id) is None:
+        db.add(User(id=user_id, email=f"reader{user_id}@example.com", hashed_password="hashed"))
+    values = dict(
+        user_id=user_id,
+        stripe_payment_id=f"pi_report_{user_id}_{len(overrides)}",
+        amount=499,
+        status=PaymentStatus.COMPLETED,
+        plan_type=PlanType.BASIC,
+        book_title="Pride & Prejudice",
+        book_author="Jane Austen",
+        report_sha256=store.put_file(_write(tmp_path, "report.pdf")),
+    )
+    values.update(overrides)
+    payment = Payment(**values)
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+class TestArtifactStore:
+    """Test content addressing and deduplication."""
+
+    def test_put_file_moves_and_dedupes(self, store: ArtifactStore, tmp_path) -> None:
+        """Identical content is stored once under its SHA-256; the source file is consumed."""
+        first = _write(tmp_path, "a.pdf")
+        second = _write(tmp_path, "b.pdf")
+
+        digest = store.put_file(first)
+
+        assert digest == hashlib.sha256(CONTENT).hexdigest()
+        assert store.put_file(second) == digest
+        assert not os.path.exists(first) and not os.path.exists(second)
+        assert store.path(digest).endswith(os.path.join(digest[:2], digest + ".pdf"))
+        with open(store.path(digest), "rb") as handle:
+            assert handle.read() == CONTENT
+        assert [name for name in os.listdir(store.root) if name.endswith(".tmp")] == []
+
+    def test_rejects_non_digests(self, store: ArtifactStore) -> None:
+        """Paths are only built from hex digests, so tokens cannot point outside the store."""
+        with pytest.raises(ValueError):
+            store.path("../../etc/passwd")
+        assert store.exists(None) is False
+        assert store.exists("0" * 64) is False
+
+
+class TestReportDownloads:
+    """Test the owner and signed-link endpoints, ranges and conditional requests."""
+
+    def test_owner_download_with_range(self, client, session: Session, store: ArtifactStore, tmp_path) -> None:
+        """The owner gets the whole file, a 206 slice, a 416 or a 304 depending on the headers."""
+        payment = _payment(session, store, tmp_path)
+        url = f"/api/v1/payments/{payment.id}/report"
+
+        full = client.get(url)
+        assert full.status_code == 200
+        assert full.content == CONTENT
+        assert full.headers["etag"] == f'"{payment.report_sha256}"'
+        assert full.headers["accept-ranges"] == "bytes"
+        assert "Pride_Prejudice_basic_report.pdf" in full.headers["content-disposition"]
+
+        partial = client.get(url, headers={"Range": "bytes=100-"})
+        assert partial.status_code == 206
+        assert partial.content == CONTENT[100:]
+        assert partial.headers["content-range"] == f"bytes 100-{len(CONTENT) - 1}/{len(CONTENT)}"
+
+        suffix = client.get(url, headers={"Range": "bytes=-10"})
+        assert suffix.status_code == 206
+        assert suffix.content == CONTENT[-10:]
+
+        unsatisfiable = client.get(url, headers={"Range": f"bytes={len(CONTENT)}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+        stale_if_range = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        assert stale_if_range.status_code == 200
+
+        cached = client.get(url, headers={"If-None-Match": full.headers["etag"]})
+        assert cached.status_code == 304
+
+    def test_owner_download_requires_ownership(self, client, session: Session, store: ArtifactStore, tmp_path) -> None:
+        """Other users' reports and reports not generated yet are not found."""
+        other = _payment(session, store, tmp_path, user_id=2)
+        missing = _payment(session, store, tmp_path, report_sha256=None)
+
+        assert client.get(f"/api/v1/payments/{other.id}/report").status_code == 404
+        assert client.get(f"/api/v1/payments/{missing.id}/report").status_code == 404
+
+    def test_signed_link(self, client, session: Session, store: ArtifactStore, tmp_path) -> None:
+        """Signed links work without login until they expire or the payment stops being completed."""
+        payment = _payment(session, store, tmp_path, user_id=2)
+        url = ReportDeliveryService.download_url(payment)
+        path = url[url.index("/api/v1/") :]
+
+        response = client.get(path, headers={"Range": "bytes=0-8"})
+        assert response.status_code == 206
+        assert response.content == CONTENT[:9]
+
+        assert client.get(path[:-2] + "xx").status_code == 404
+
+        expired = ReportDeliveryService.download_token(payment, now=datetime.utcnow() - timedelta(days=30))
+        assert client.get(f"/api/v1/payments/reports/{expired}").status_code == 404
+
+        payment.status = PaymentStatus.REFUNDED
+        session.commit()
+        assert client.get(path).status_code == 404
+
+
+class TestDelivery:
+    """Test that delivery stores the report once and emails a link."""
+
+    def test_deliver_reuses_stored_report(self, db: Session, store: ArtifactStore, tmp_path, monkeypatch) -> None:
+        """A stored report is not generated again, and the email carries a download link."""
+        payment = _payment(db, store, tmp_path)
+        sent = []
+
+        class FakeEmailService:
+            def send_report_email(self, **kwargs) -> None:
+                sent.append(kwargs)
+
+        def fail_generation(*args, **kwargs):
+            raise AssertionError("report generated again")
+
+        monkeypatch.setattr("app.services.report_delivery_service.EmailService", FakeEmailService)
+        monkeypatch.setattr("app.services.report_delivery_service.ReportGeneratorService", fail_generation)
+
+        assert ReportDeliveryService.deliver(db, payment.id) is True
+
+        assert payment.pdf_sent is True
+        assert "/api/v1/payments/reports/" in sent[0]["download_url"]
+        token = sent[0]["download_url"].rsplit("/", 1)[1]
+        assert ReportDeliveryService.resolve_token(db, token) is payment
+
+    def test_failed_delivery_is_retried(self, session: Session, store: ArtifactStore, tmp_path, monkeypatch) -> None:
+        """A payment whose email failed stays unsent and is picked up by the redelivery sweep."""
+        db = session  # a failed delivery rolls back, which the ``db`` fixture's outer transaction cannot survive
+        payment = _payment(db, store, tmp_path)
+        sent = []
+
+        class BrokenEmailService:
+            def send_report_email(self, **kwargs) -> None:
+                raise RuntimeError("SMTP down")
+
+        class FakeEmailService:
+            def send_report_email(self, **kwargs) -> None:
+                sent.append(kwargs)
+
+        monkeypatch.setattr("app.services.report_delivery_service.EmailService", BrokenEmailService)
+        assert ReportDeliveryService.deliver(db, payment.id) is False
+        assert ReportDeliveryService.undelivered_payment_ids(db) == [payment.id]
+        # Too recent for the default delay, which leaves room for the first attempt to finish
+        assert ReportDeliveryService.redeliver_pending(db) == 0
+
+        monkeypatch.setattr("app.services.report_delivery_service.EmailService", FakeEmailService)
+        assert ReportDeliveryService.redeliver_pending(db, delay_seconds=0) == 1
+
+        assert payment.pdf_sent is True
+        assert len(sent) == 1
+        assert ReportDeliveryService.undelivered_payment_ids(db) == []
@@ -0,0 +1,177 @@
+"""Tests for the rendered report cache."""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.report_cache import ReportCacheEntry
+from app.models.user import User
+from app.services.artifact_store import ArtifactStore, report_store
+from app.services.report_cache_service import ReportCacheService
+from app.services.report_delivery_service import ReportDeliveryService
+
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch) -> ArtifactStore:
+    monkeypatch.setattr(report_store, "root", str(tmp_path / "reports"))
+    return report_store
+
+
+@pytest.fixture
+def renders(monkeypatch) -> list:
+    """Replace the LLM/reportlab generator with one recording what it renders."""
+    calls = []
+
+    class FakeReportGenerator:
+        def generate_report(self, book: str, author: str, plan_type: PlanType) -> str:
+            calls.append((book, author, plan_type))
+            handle, path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(handle, "wb") as pdf:
+                pdf.write(f"%PDF {book} {author} {plan_type.value} {len(calls)}".encode() * 50)
+            return path
+
+    monkeypatch.setattr("app.services.report_delivery_service.ReportGeneratorService", FakeReportGenerator)
+    return calls
+
+
+def _stored(store: ArtifactStore, tmp_path, content: bytes) -> str:
+    path = tmp_path / "render.pdf"
+    path.write_bytes(content)
+    return store.put_file(str(path))
+
+
+def _payment(db: Session, book: str, author: str = "Frank Herbert", plan_type: PlanType = PlanType.BASIC) -> Payment:
+    user = User(email=f"buyer{db.query(User).count()}@example.com", hashed_password="hashed")
+    db.add(user)
+    db.flush()
+    payment = Payment(
+        user_id=user.id,
+        stripe_payment_id=f"pi_cache_{user.id}",
+        amount=499,
+        status=PaymentStatus.COMPLETED,
+        plan_type=plan_type,
+        book_title=book,
+        book_author=author,
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+class TestCacheKey:
+    """Test what makes two reports the same."""
+
+    def test_normalized_identity(self) -> None:
+        """Case and whitespace do not matter; plan and template version do."""
+        key = ReportCacheService.cache_key("Dune", "Frank Herbert", PlanType.BASIC)
+
+        assert ReportCacheService.cache_key("  DUNE ", "frank   herbert", PlanType.BASIC) == key
+        assert ReportCacheService.cache_key("Dune", "Frank Herbert", PlanType.PREMIUM) != key
+        assert ReportCacheService.cache_key("Dune", "Frank Herbert", PlanType.BASIC, template_version=0) != key
+        assert ReportCacheService.cache_key("Dune Messiah", "Frank Herbert", PlanType.BASIC) != key
+
+
+class TestReuse:
+    """Test that deliveries render each book and plan once."""
+
+    def test_second_buyer_reuses_render(self, db: Session, store: ArtifactStore, renders: list) -> None:
+        """Buyers of the same book share one rendered PDF; another plan renders its own."""
+        first = _payment(db, "Dune")
+        second = _payment(db, "dune ")
+        premium = _payment(db, "Dune", plan_type=PlanType.PREMIUM)
+
+        for payment in (first, second, premium):
+            ReportDeliveryService.store_report(db, payment)
+            db.commit()
+
+        assert len(renders) == 2
+        assert second.report_sha256 == first.report_sha256 != premium.report_sha256
+        entry = db.get(ReportCacheEntry, ReportCacheService.cache_key("Dune", "Frank Herbert", PlanType.BASIC))
+        assert entry.hits == 1
+
+    def test_expired_entry_is_rendered_again(self, db: Session, store: ArtifactStore, tmp_path) -> None:
+        """Entries past the TTL are misses and are replaced by the next render."""
+        old = _stored(store, tmp_path, b"old render")
+        ReportCacheService.store(db, "Dune", "Frank Herbert", PlanType.BASIC, old, now=NOW)
+        db.commit()
+
+        later = NOW + timedelta(days=settings.REPORT_CACHE_TTL_DAYS - 1)
+        assert ReportCacheService.lookup(db, "Dune", "Frank Herbert", PlanType.BASIC, now=later) == old
+        expired = NOW + timedelta(days=settings.REPORT_CACHE_TTL_DAYS + 1)
+        assert ReportCacheService.lookup(db, "Dune", "Frank Herbert", PlanType.BASIC, now=expired) is None
+
+        new = _stored(store, tmp_path, b"new render")
+        ReportCacheService.store(db, "Dune", "Frank Herbert", PlanType.BASIC, new, now=expired)
+        db.commit()
+
+        assert ReportCacheService.lookup(db, "Dune", "Frank Herbert", PlanType.BASIC, now=expired) == new
+        # Nobody bought the old render, so its file went with the entry
+        assert not store.exists(old)
+
+    def test_disabled_without_budget(self, db: Session, store: ArtifactStore, renders: list, monkeypatch) -> None:
+        """REPORT_CACHE_MAX_BYTES=0 renders every report."""
+        monkeypatch.setattr(settings, "REPORT_CACHE_MAX_BYTES", 0)
+        for book in ("Dune", "Dune"):
+            ReportDeliveryService.store_report(db, _payment(db, book))
+            db.commit()
+
+        assert len(renders) == 2
+        assert db.query(ReportCacheEntry).count() == 0
+
+
+class TestEviction:
+    """Test the size budget."""
+
+    def test_least_recently_used_evicted_first(self, db: Session, store: ArtifactStore, tmp_path) -> None:
+        """Entries go least recently used first; files a payment still links to are kept."""
+        digests = {}
+        for minute, book in enumerate(("Dune", "Emma", "Ulysses")):
+            digests[book] = _stored(store, tmp_path, book.encode() * 100)
+            stored_at = NOW + timedelta(minutes=minute)
+            ReportCacheService.store(db, book, "Author", PlanType.BASIC, digests[book], now=stored_at)
+        assert ReportCacheService.lookup(db, "Dune", "Author", PlanType.BASIC, now=NOW + timedelta(minutes=5))
+        bought = _payment(db, "Emma", author="Author")
+        bought.report_sha256 = digests["Emma"]
+        db.commit()
+
+        result = ReportCacheService.evict(db, max_bytes=store.size(digests["Dune"]) + 1, now=NOW + timedelta(minutes=6))
+        db.commit()
+
+        remaining = {entry.report_sha256 for entry in db.query(ReportCacheEntry)}
+        assert remaining == {digests["Dune"]}
+        assert result.entries == 2 and result.files == 1
+        assert store.exists(digests["Emma"])
+        assert not store.exists(digests["Ulysses"])
+
+    def test_delivered_reports_expire_with_their_links(
+        self, db: Session, store: ArtifactStore, renders: list, monkeypatch
+    ) -> None:
+        """Once a buyer's link has expired, an evicted render's file is deleted instead of pinned forever."""
+        delivered = _payment(db, "Dune")
+        ReportDeliveryService.store_report(db, delivered)
+        db.commit()
+        dune = delivered.report_sha256
+        monkeypatch.setattr(settings, "REPORT_CACHE_MAX_BYTES", store.size(dune) + 1)
+        delivered.pdf_sent = True
+        delivered.updated_at = datetime.utcnow() - timedelta(hours=settings.REPORT_LINK_TTL_HOURS + 1)
+        db.commit()
+
+        pending = _payment(db, "Emma")
+        ReportDeliveryService.store_report(db, pending)
+        db.commit()
+
+        assert not store.exists(dune)
+        assert delivered.report_sha256 is None
+        assert store.exists(pending.report_sha256)
+        assert sum(len(files) for _, _, files in os.walk(store.root)) == 1
+        # A redelivery renders the report again
+        ReportDeliveryService.store_report(db, delivered)
+        db.commit()
+        assert len(renders) == 3 and store.exists(delivered.report_sha256)
@@ -66,16 +66,15 @@ class TestEmailService:
         mock_sg.mail.send.return_value = mock_response
         
         try:
-            # This might fail due to missing file, which is okay for this test
             result = service.send_report_email(
                 to_email="test@example.com",
                 book_title="Test Book",
                 author="Test Author",
-                pdf_path="nonexistent.pdf",
+                download_url="http://localhost:8000/api/v1/payments/reports/token",
                 plan_type="basic"
             )
         except Exception:
-            pass  # Expected due to nonexistent PDF
+            pass
     
     @patch('app.services.email_service.sg')
     def test_send_welcome_email(self, mock_sg):
@@ -0,0 +1,97 @@
+"""Tests for the slow-query recorder."""
+
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+
+from app.core.slow_query import (
+    SlowQueryRecorder,
+    normalize_sql,
+    redact_parameters,
+    reset_current_route,
+    set_current_route,
+)
+
+
+class TestNormalization:
+    """Test statement normalization and parameter redaction."""
+
+    def test_normalize_collapses_literals_and_in_lists(self) -> None:
+        """Literals, bind markers and IN lists collapse to one shape."""
+        first = normalize_sql("SELECT * FROM payments\n  WHERE id IN (?, ?, ?) AND book_title = 'Dune'")
+        second = normalize_sql("SELECT * FROM payments WHERE id IN (%(id_1)s) AND book_title = 'Emma'")
+        assert first == second == "SELECT * FROM payments WHERE id IN (...) AND book_title = ?"
+
+    def test_normalize_keeps_identifiers(self) -> None:
+        """Digits inside identifiers are not treated as literals."""
+        assert normalize_sql("SELECT anon_1.id FROM t1 LIMIT 10") == "SELECT anon_1.id FROM t1 LIMIT ?"
+
+    def test_redact_parameters(self) -> None:
+        """Bound values are replaced with their type names."""
+        assert redact_parameters({"email": "a@b.c", "id": 3}) == {"email": "str", "id": "int"}
+        assert redact_parameters(("secret", 1)) == ["str", "int"]
+        assert redact_parameters([("a",), ("b",)], executemany=True) == {"rows": 2, "first": ["str"]}
+
+
+class TestSlowQueryRecorder:
+    """Test recording and plan capture."""
+
+    def test_records_slow_query_with_route_and_plan(self) -> None:
+        """Queries over the threshold are recorded once with their plan."""
+        recorder = SlowQueryRecorder(threshold_ms=0.000001, explain=True)
+        engine = create_engine("sqlite://")
+        recorder.install(engine)
+
+        token = set_current_route("GET /payments/history")
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": 1})
+        finally:
+            reset_current_route(token)
+
+        select_records = [r for r in recorder.recent() if r["sql"].startswith("SELECT")]
+        assert len(select_records) == 1
+        record = select_records[0]
+        assert record["route"] == "GET /payments/history"
+        assert record["parameters"] == ["int"]
+        plan = recorder.plan_for(record["fingerprint"])
+        assert plan is not None
+        assert "items" in plan["plan"]
+
+    def test_fast_queries_are_ignored(self) -> None:
+        """Queries under the threshold are not recorded."""
+        recorder = SlowQueryRecorder(threshold_ms=60000)
+        engine = create_engine("sqlite://")
+        recorder.install(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert recorder.recent() == []
+
+    def test_failed_explain_is_not_retried(self) -> None:
+        """A statement shape whose EXPLAIN fails is only tried once."""
+        recorder = SlowQueryRecorder(threshold_ms=0.000001, explain=True)
+        attempts = []
+
+        class FailingCursor:
+            def execute(self, statement, parameters=None):
+                attempts.append(statement)
+                raise RuntimeError("cannot explain")
+
+            def close(self):
+                pass
+
+        class Context:
+            pass
+
+        conn = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+        cursor = SimpleNamespace(connection=SimpleNamespace(cursor=FailingCursor))
+        for _ in range(3):
+            context = Context()
+            recorder._before_execute(conn, cursor, "SELECT 1", (), context, False)
+            recorder._after_execute(conn, cursor, "SELECT 1", (), context, False)
+
+        assert len(attempts) == 1
+        assert len(recorder.recent()) == 3
+        plan = recorder.plan_for(recorder.recent()[0]["fingerprint"])
+        assert plan is not None and plan["plan"] is None and plan["error"] == "cannot explain"
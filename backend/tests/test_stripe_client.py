@@ -0,0 +1,132 @@
+"""Tests for the async Stripe client, against the in-repo fake and scripted transports."""
+
+from typing import Callable, List
+
+import httpx
+import pytest
+
+import fake_stripe
+from app.routes import payments
+from app.services.stripe_client import StripeAPIError, StripeClient, encode_form
+
+
+def _scripted(responses: List[Callable[[httpx.Request], httpx.Response]], seen: List[httpx.Request]) -> StripeClient:
+    """Client whose nth request is answered by the nth callable."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return responses[min(len(seen), len(responses)) - 1](request)
+
+    transport = httpx.MockTransport(handler)
+    return StripeClient(base_url="http://stripe.test", api_key="sk_test", max_retries=2, backoff=0, transport=transport)
+
+
+def _ok(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"id": "pi_1", "status": "succeeded"})
+
+
+def _unavailable(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(503, json={"error": {"message": "Try again"}})
+
+
+def test_encode_form_flattens_metadata() -> None:
+    assert encode_form({"amount": 499, "metadata": {"user_id": 1, "empty": None}}) == {
+        "amount": "499",
+        "metadata[user_id]": "1",
+    }
+
+
+class TestAgainstFake:
+    """Round trips through the fake Stripe app."""
+
+    async def test_create_and_retrieve(self) -> None:
+        client = StripeClient(base_url="http://stripe.test", transport=httpx.ASGITransport(app=fake_stripe.app))
+        try:
+            intent = await client.create_payment_intent(499, "usd", {"user_id": "7"}, idempotency_key="key-1")
+            replay = await client.create_payment_intent(499, "usd", {"user_id": "7"}, idempotency_key="key-1")
+            fetched = await client.retrieve_payment_intent(intent["id"])
+        finally:
+            await client.aclose()
+
+        assert replay["id"] == intent["id"]
+        assert fetched["metadata"] == {"user_id": "7"}
+        assert fetched["client_secret"].startswith(intent["id"])
+
+    async def test_missing_intent_raises(self) -> None:
+        client = StripeClient(base_url="http://stripe.test", transport=httpx.ASGITransport(app=fake_stripe.app))
+        try:
+            with pytest.raises(StripeAPIError) as error:
+                await client.retrieve_payment_intent("pi_missing")
+        finally:
+            await client.aclose()
+        assert error.value.status_code == 404
+        assert error.value.code == "resource_missing"
+
+
+class TestRetries:
+    """Test the retry budget."""
+
+    async def test_retries_server_errors_with_same_idempotency_key(self) -> None:
+        seen: List[httpx.Request] = []
+        client = _scripted([_unavailable, _unavailable, _ok], seen)
+        try:
+            assert (await client.create_payment_intent(499, "usd"))["id"] == "pi_1"
+        finally:
+            await client.aclose()
+
+        assert len(seen) == 3
+        assert len({request.headers["Idempotency-Key"] for request in seen}) == 1
+
+    async def test_budget_exhausted(self) -> None:
+        seen: List[httpx.Request] = []
+        client = _scripted([_unavailable], seen)
+        try:
+            with pytest.raises(StripeAPIError) as error:
+                await client.retrieve_payment_intent("pi_1")
+        finally:
+            await client.aclose()
+
+        assert error.value.status_code == 503
+        assert len(seen) == 3
+
+    async def test_client_errors_and_should_retry_header_are_final(self) -> None:
+        """4xx responses are not retried, nor errors Stripe marks Stripe-Should-Retry: false."""
+        for response in (
+            httpx.Response(400, json={"error": {"message": "Bad amount"}}),
+            httpx.Response(500, headers={"Stripe-Should-Retry": "false"}, json={}),
+        ):
+            seen: List[httpx.Request] = []
+            client = _scripted([lambda request: response], seen)
+            try:
+                with pytest.raises(StripeAPIError):
+                    await client.create_payment_intent(1, "usd")
+            finally:
+                await client.aclose()
+            assert len(seen) == 1
+
+    async def test_connection_errors_are_retried(self) -> None:
+        seen: List[httpx.Request] = []
+
+        def refuse(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+
+        client = _scripted([refuse, _ok], seen)
+        try:
+            assert (await client.retrieve_payment_intent("pi_1"))["status"] == "succeeded"
+        finally:
+            await client.aclose()
+        assert len(seen) == 2
+
+
+def test_create_payment_intent_route_uses_client(client, monkeypatch) -> None:
+    """The payment route creates intents through the async client."""
+    fake = StripeClient(base_url="http://stripe.test", transport=httpx.ASGITransport(app=fake_stripe.app))
+    monkeypatch.setattr(payments, "stripe_client", fake)
+
+    response = client.post(
+        "/api/v1/payments/create-payment-intent",
+        json={"plan_type": "basic", "book_title": "Book", "book_author": "Author"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["clientSecret"].startswith("pi_fake_")
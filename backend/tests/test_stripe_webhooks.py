@@ -0,0 +1,205 @@
+"""Tests for Stripe webhook ingestion and the batch consumer."""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.payment import Payment, PaymentStatus, PlanType
+from app.models.stripe_event import StripeEvent
+from app.models.user import User
+from app.services.report_delivery_service import ReportDeliveryService
+from app.services.stripe_webhook_service import InvalidWebhookError, StripeEventConsumer, StripeWebhookService
+
+SECRET = "whsec_test"
+
+
+def _event(event_id: str, event_type: str, obj: dict) -> dict:
+    return {"id": event_id, "object": "event", "type": event_type, "data": {"object": obj}}
+
+
+def _signed(event: dict, secret: str = SECRET) -> tuple:
+    payload = json.dumps(event).encode()
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return payload, f"t={timestamp},v1={signature}"
+
+
+def _payment(db: Session, stripe_id: str, status: PaymentStatus = PaymentStatus.PENDING) -> Payment:
+    user = db.query(User).filter(User.email == "buyer@example.com").first()
+    if user is None:
+        user = User(email="buyer@example.com", hashed_password="hashed")
+        db.add(user)
+        db.commit()
+    payment = Payment(
+        user_id=user.id,
+        stripe_payment_id=stripe_id,
+        amount=499,
+        status=status,
+        plan_type=PlanType.BASIC,
+        book_title="Book",
+        book_author="Author",
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+def _record(db: Session, event: dict) -> bool:
+    created = StripeWebhookService.record(db, event)
+    db.commit()
+    return created
+
+
+@pytest.fixture
+def webhook_secret(monkeypatch) -> str:
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", SECRET)
+    return SECRET
+
+
+class TestVerifyAndRecord:
+    """Test signature checks and event deduplication."""
+
+    def test_verify_accepts_signed_payload(self, webhook_secret) -> None:
+        event = _event("evt_1", "payment_intent.succeeded", {"id": "pi_1"})
+        payload, signature = _signed(event)
+        assert StripeWebhookService.verify(payload, signature) == event
+
+    def test_verify_rejects_bad_signature(self, webhook_secret) -> None:
+        """Wrong secrets, tampered payloads and missing headers are all rejected."""
+        event = _event("evt_1", "payment_intent.succeeded", {"id": "pi_1"})
+        payload, signature = _signed(event, secret="whsec_other")
+        with pytest.raises(InvalidWebhookError):
+            StripeWebhookService.verify(payload, signature)
+        payload, signature = _signed(event)
+        with pytest.raises(InvalidWebhookError):
+            StripeWebhookService.verify(payload.replace(b"pi_1", b"pi_2"), signature)
+        with pytest.raises(InvalidWebhookError):
+            StripeWebhookService.verify(payload, None)
+
+    def test_record_deduplicates_on_event_id(self, db: Session) -> None:
+        event = _event("evt_dup", "payment_intent.succeeded", {"id": "pi_1"})
+        assert _record(db, event) is True
+        assert _record(db, event) is False
+        stored = db.query(StripeEvent).one()
+        assert stored.payload == event
+        assert stored.processed_at is None
+
+
+class TestProcessPending:
+    """Test applying recorded events to payments."""
+
+    def test_succeeded_completes_payment(self, db: Session) -> None:
+        """Completed payments are reported for report delivery and events marked processed."""
+        payment = _payment(db, "pi_ok")
+        _record(db, _event("evt_1", "payment_intent.succeeded", {"id": "pi_ok"}))
+
+        batch = StripeWebhookService.process_pending(db)
+
+        assert batch.events == 1
+        assert batch.completed_payment_ids == [payment.id]
+        db.expire_all()
+        assert payment.status == PaymentStatus.COMPLETED
+        assert db.query(StripeEvent).one().processed_at is not None
+        assert StripeWebhookService.process_pending(db).events == 0
+
+    def test_batches_and_transitions(self, db: Session) -> None:
+        """Out-of-order and unrelated events cannot move a payment backwards."""
+        paid = _payment(db, "pi_paid")
+        failed = _payment(db, "pi_failed")
+        refunded = _payment(db, "pi_refunded", PaymentStatus.COMPLETED)
+        for index, (event_type, obj) in enumerate(
+            [
+                ("payment_intent.succeeded", {"id": "pi_paid"}),
+                ("payment_intent.payment_failed", {"id": "pi_paid"}),
+                ("payment_intent.payment_failed", {"id": "pi_failed"}),
+                ("charge.refunded", {"id": "ch_1", "payment_intent": "pi_refunded", "refunded": True}),
+                ("charge.refunded", {"id": "ch_2", "payment_intent": "pi_paid", "refunded": False}),
+                ("payment_intent.succeeded", {"id": "pi_unknown"}),
+                ("customer.created", {"id": "cus_1"}),
+            ]
+        ):
+            _record(db, _event(f"evt_{index}", event_type, obj))
+
+        first = StripeWebhookService.process_pending(db, batch_size=4)
+        second = StripeWebhookService.process_pending(db, batch_size=4)
+
+        assert (first.events, second.events) == (4, 3)
+        assert first.completed_payment_ids == [paid.id]
+        db.expire_all()
+        assert paid.status == PaymentStatus.COMPLETED
+        assert failed.status == PaymentStatus.FAILED
+        assert refunded.status == PaymentStatus.REFUNDED
+        assert db.query(StripeEvent).filter(StripeEvent.processed_at.is_(None)).count() == 0
+
+    def test_failing_event_does_not_roll_back_the_batch(self, db: Session) -> None:
+        """A malformed event counts its own attempt; the rest of the batch is applied."""
+        payment = _payment(db, "pi_good")
+        _record(db, {"id": "evt_bad", "type": "payment_intent.succeeded", "data": {"object": ["not", "a", "dict"]}})
+        _record(db, _event("evt_good", "payment_intent.succeeded", {"id": "pi_good"}))
+
+        batch = StripeWebhookService.process_pending(db)
+
+        assert batch.completed_payment_ids == [payment.id]
+        db.expire_all()
+        assert payment.status == PaymentStatus.COMPLETED
+        good, bad = db.get(StripeEvent, "evt_good"), db.get(StripeEvent, "evt_bad")
+        assert (good.attempts, good.processed_at is not None, good.last_error) == (1, True, None)
+        assert (bad.attempts, bad.processed_at) == (1, None)
+        assert "get" in bad.last_error
+
+
+def test_sweep_queues_each_undelivered_payment_once(db: Session, monkeypatch) -> None:
+    """A sweep skips payments still queued or being delivered from an earlier sweep."""
+    release = threading.Event()
+    delivered = []
+
+    def deliver(session: Session, payment_id: int) -> bool:
+        release.wait(5)
+        delivered.append(payment_id)
+        return True
+
+    monkeypatch.setattr(ReportDeliveryService, "undelivered_payment_ids", staticmethod(lambda *args: [7, 8]))
+    monkeypatch.setattr(ReportDeliveryService, "deliver", staticmethod(deliver))
+    consumer = StripeEventConsumer(batch_size=10, poll_interval=60, report_workers=1)
+    consumer._session_factory = lambda: db
+    consumer._reports = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(db, "close", lambda: None)
+
+    assert consumer.sweep_undelivered() == 2
+    assert consumer.sweep_undelivered() == 0
+    release.set()
+    consumer.stop()
+
+    assert sorted(delivered) == [7, 8]
+    assert consumer._in_flight == set()
+
+
+def _post_webhook(client, event: dict, signature: Optional[str] = None):
+    payload, valid_signature = _signed(event)
+    return client.post(
+        "/api/v1/payments/webhook", content=payload, headers={"Stripe-Signature": signature or valid_signature}
+    )
+
+
+def test_webhook_endpoint_records_once(client, webhook_secret) -> None:
+    """The endpoint acknowledges valid events, flags redeliveries and rejects bad signatures."""
+    event = _event("evt_endpoint", "payment_intent.succeeded", {"id": "pi_endpoint"})
+
+    assert _post_webhook(client, event).json() == {"received": True, "duplicate": False}
+    assert _post_webhook(client, event).json() == {"received": True, "duplicate": True}
+    response = _post_webhook(client, event, signature="t=1,v1=bad")
+    assert response.status_code == 400
+
+
+def test_webhook_endpoint_requires_configuration(client, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", None)
+    response = _post_webhook(client, _event("evt_x", "payment_intent.succeeded", {"id": "pi_x"}))
+    assert response.status_code == 503